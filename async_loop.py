@@ -0,0 +1,123 @@
+import asyncio
+
+
+class AsyncGameLoop:
+    # Runs a CatchAndShootGame on asyncio instead of CatchAndShootGame.run's
+    # blocking loop. Three coroutines share the event loop:
+    #
+    #   simulate  fixed physics ticks, each draining the input queue once
+    #   render    frames at render_hz, interpolated between the last two ticks
+    #   input     lets the renderer deliver key presses at input_hz, so a key is
+    #             queued within a couple of milliseconds rather than once a frame
+    #
+    # Each runs on absolute deadlines (start + k * period on the loop's monotonic
+    # clock), so lateness in one wakeup is not carried into the next. The loop is
+    # free to run other tasks alongside; run() returns when the game ends or the
+    # window is closed.
+    #
+    # The level timer stays part of the tick (CatchAndShootGame.step), counted in
+    # physics time, so games played here replay exactly like any other.
+    def __init__(self, game, input_hz=250):
+        self.game = game
+        self.input_hz = input_hz
+        self.last_tick_time = None  # Deadline of the most recent tick
+        self.ticks = 0
+        self.frames = 0
+        self.dropped_ticks = 0  # Ticks skipped after falling too far behind
+        self.stopped = None
+
+    def finished(self):
+        return self.game.game_over or self.game.renderer.closed
+
+    def stop(self):
+        if self.stopped is not None:
+            self.stopped.set()
+
+    async def run(self):
+        game = self.game
+        self.stopped = asyncio.Event()
+        game.renderer.bind_keys(game)
+        tasks = [asyncio.create_task(self.simulate()),
+                 asyncio.create_task(self.render()),
+                 asyncio.create_task(self.pump_input())]
+        try:
+            await self.stopped.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            game.renderer.close()
+
+    async def simulate(self):
+        game = self.game
+        loop = asyncio.get_running_loop()
+        profiler = game.profiler
+        dt = game.physics_dt
+        deadline = loop.time()
+        while not self.finished():
+            now = loop.time()
+            if now < deadline:
+                await asyncio.sleep(deadline - now)
+                continue
+            if profiler is not None:
+                profiler.mark("sleep")
+
+            # Run every tick that is due. Past max_ticks_per_frame, drop the backlog
+            # rather than spiralling.
+            due = int((now - deadline) / dt) + 1
+            if due > game.max_ticks_per_frame:
+                skipped = due - game.max_ticks_per_frame
+                self.dropped_ticks += skipped
+                deadline += skipped * dt
+                due = game.max_ticks_per_frame
+            for _ in range(due):
+                game.tick()
+                self.ticks += 1
+                self.last_tick_time = deadline
+                deadline += dt
+                if game.game_over:
+                    break
+        self.stop()
+
+    async def render(self):
+        game = self.game
+        loop = asyncio.get_running_loop()
+        profiler = game.profiler
+        period = 1.0 / game.render_hz
+        start = loop.time()
+        frame = 0
+        while not self.finished():
+            deadline = start + frame * period
+            now = loop.time()
+            if now < deadline:
+                await asyncio.sleep(deadline - now)
+                continue
+            # Skip frames that are already late, rather than drawing them back to back
+            frame = int((now - start) / period) + 1
+            if profiler is not None:
+                profiler.mark("sleep")
+                profiler.end_frame()
+                profiler.begin_frame()
+
+            alpha = 1.0
+            if self.last_tick_time is not None:
+                alpha = min(1.0, max(0.0, (loop.time() - self.last_tick_time) / game.physics_dt))
+            game._redraw(alpha)
+            if profiler is not None:
+                profiler.mark("redraw")
+            game.renderer.update()
+            if profiler is not None:
+                profiler.mark("present")
+            self.frames += 1
+        self.stop()
+
+    async def pump_input(self):
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.input_hz
+        start = loop.time()
+        k = 0
+        while not self.finished():
+            k = max(k + 1, int((loop.time() - start) / period) + 1)
+            await asyncio.sleep(max(0.0, start + k * period - loop.time()))
+            self.game.renderer.poll_events()
+        self.stop()
@@ -1,9 +1,13 @@
-import turtle
 import math
+from collision import contact_normal, reflect, sweep_circle
+from world import DEFAULT_ARENA
 
 
 class Ball:
-    def __init__(self, size, x, y, vx, vy, color, ball_type=None, check_miss_callback=None):
+    __slots__ = ("size", "x", "y", "vx", "vy", "color", "ball_type", "mass", "count", "arena",
+                 "check_miss_callback")
+
+    def __init__(self, size, x, y, vx, vy, color, ball_type=None, check_miss_callback=None, arena=None):
         self.size = size
         self.x = x
         self.y = y
@@ -13,20 +17,16 @@ class Ball:
         self.ball_type = ball_type
         self.mass = 100 * size**2
         self.count = 0
-        self.canvas_width = turtle.screensize()[0]
-        self.canvas_height = turtle.screensize()[1]
+        self.arena = arena if arena is not None else DEFAULT_ARENA
         self.check_miss_callback = check_miss_callback
 
-    def draw(self):
-        # draw a circle of radius equals to size centered at (x, y) and paint it with color
-        turtle.penup()
-        turtle.color(self.color)
-        turtle.fillcolor(self.color)
-        turtle.goto(self.x, self.y-self.size)
-        turtle.pendown()
-        turtle.begin_fill()
-        turtle.circle(self.size)
-        turtle.end_fill()
+    @property
+    def canvas_width(self):
+        return self.arena.width
+
+    @property
+    def canvas_height(self):
+        return self.arena.height
 
     def bounce_off_vertical_wall(self):
         self.vx = -self.vx
@@ -73,7 +73,9 @@ class Ball:
     def move(self, dt):
         self.x += self.vx * dt
         self.y += self.vy * dt
+        self.check_walls()
 
+    def check_walls(self):
         # Check for vertical wall collisions and bounce if needed
         if self.x - self.size <= -self.canvas_width or self.x + self.size >= self.canvas_width:
             self.bounce_off_vertical_wall()
@@ -122,34 +124,33 @@ class Ball:
         return t
 
     def time_to_hit_vertical_wall(self):
-        self.update_canvas_dimensions()
+        # A ball already touching the wall and still heading out hits it right away
         if self.vx > 0:
-            return (self.canvas_width - self.x - self.size) / self.vx
+            return max(0.0, (self.canvas_width - self.x - self.size) / self.vx)
         elif self.vx < 0:
-            return (-self.canvas_width - self.x + self.size) / abs(self.vx)
+            return max(0.0, (-self.canvas_width - self.x + self.size) / self.vx)
         else:
             return math.inf
 
     def time_to_hit_horizontal_wall(self):
-        self.update_canvas_dimensions()
         if self.vy > 0:
-            return (self.canvas_height - self.y - self.size) / self.vy
+            return max(0.0, (self.canvas_height - self.y - self.size) / self.vy)
         elif self.vy < 0:
-            return (-self.canvas_height - self.y + self.size) / abs(self.vy)
+            return max(0.0, (-self.canvas_height - self.y + self.size) / self.vy)
         else:
             return math.inf
 
     def time_to_hit_paddle(self, paddle):
-        if self.vy == 0:  # Prevent division by zero
+        if self.vy >= 0:  # Only a falling ball can land on the paddle
             return float('inf')
 
-        # Calculate time for vertical alignment with the paddle
-        dt = (paddle.location[1] - self.y - self.size -
-              paddle.height / 2) / abs(self.vy)
+        # Calculate time for the bottom of the ball to reach the top of the paddle
+        dt = (self.y - self.size - paddle.y -
+              paddle.height / 2) / -self.vy
 
         # Check if the ball's horizontal position will be within the paddle's width
-        paddle_left_edge = paddle.location[0] - paddle.width / 2
-        paddle_right_edge = paddle.location[0] + paddle.width / 2
+        paddle_left_edge = paddle.x - paddle.width / 2
+        paddle_right_edge = paddle.x + paddle.width / 2
         future_x = self.x + self.vx * dt
 
         if paddle_left_edge - self.size <= future_x <= paddle_right_edge + self.size and dt >= 0:
@@ -165,34 +166,34 @@ class Ball:
         self.vy = -self.vy
         self.count += 1
 
-    def update_canvas_dimensions(self):
-        screen = turtle.Screen()
-        self.canvas_width = screen.window_width() // 2
-        self.canvas_height = screen.window_height() // 2
+    def time_to_hit_obstacle(self, obstacle):
+        # Time until the ball first touches the (moving) obstacle, box or polygon
+        hit = sweep_circle(self.x, self.y, self.size, self.vx, self.vy, obstacle)
+        if hit is None:
+            return math.inf
+        return hit[0]
+
+    def bounce_off_obstacle(self, obstacle):
+        # Reflect off the face or corner of the obstacle the ball is touching. This is
+        # done in the obstacle's frame, so an obstacle moving into the ball pushes it
+        # away instead of hitting it again straight after the bounce.
+        nx, ny = contact_normal(self.x, self.y, obstacle)
+        self.vx, self.vy = reflect(self.vx, self.vy, obstacle, nx, ny)
+        self.count += 1
 
     def check_collision_with_obstacle(self, obstacle):
-        # Check if the ball's bounding box overlaps with the obstacle's bounding box
-        ball_left = self.x - self.size
-        ball_right = self.x + self.size
-        ball_top = self.y + self.size
-        ball_bottom = self.y - self.size
-
-        obstacle_left = obstacle.x - obstacle.width / 2
-        obstacle_right = obstacle.x + obstacle.width / 2
-        obstacle_top = obstacle.y + obstacle.height / 2
-        obstacle_bottom = obstacle.y - obstacle.height / 2
-
-        # Check for collision
-        if (ball_right > obstacle_left and
-                ball_left < obstacle_right and
-                ball_top > obstacle_bottom and
-                ball_bottom < obstacle_top):
-            # Handle the collision: reverse ball's velocity
-            self.vx = -self.vx
-            self.vy = -self.vy
-            return True  # Collision occurred
-
-        return False  # No collision
+        # If the ball is touching the obstacle (box or polygon) and moving into it,
+        # reflect it about the contact normal, as bounce_off_obstacle does.
+        # Returns whether it bounced.
+        if (abs(self.x - obstacle.x) > obstacle.width / 2 + self.size or
+                abs(self.y - obstacle.y) > obstacle.height / 2 + self.size):
+            return False  # Not even within its bounding box
+        hit = sweep_circle(self.x, self.y, self.size, self.vx, self.vy, obstacle, 0.0)
+        if hit is None:
+            return False
+        self.vx, self.vy = reflect(self.vx, self.vy, obstacle, hit[1], hit[2])
+        self.count += 1
+        return True
 
     def __str__(self):
         return str(self.x) + ":" + str(self.y) + ":" + str(self.vx) + ":" + str(self.vy) + ":" + str(self.count) + str(self.id)
@@ -0,0 +1,228 @@
+import numpy as np
+from ball import Ball
+from world import DEFAULT_ARENA
+
+
+def _column(name):
+    # Property that reads and writes one row of a BallArray column, so that a
+    # BallView can be used anywhere a Ball is expected
+    def get(self):
+        return getattr(self.array, name)[self.index]
+
+    def set(self, value):
+        getattr(self.array, name)[self.index] = value
+
+    return property(get, set)
+
+
+class BallView(Ball):
+    # A Ball whose state lives in row `index` of a BallArray. Writing to it writes
+    # the array, and batched updates on the array show up here.
+    __slots__ = ("array", "index")
+    x = _column("x")
+    y = _column("y")
+    vx = _column("vx")
+    vy = _column("vy")
+    size = _column("size")
+    mass = _column("mass")
+    count = _column("count")
+
+    def __init__(self, array, index):
+        self.array = array
+        self.index = index
+        self.check_miss_callback = None
+        self.arena = array.arena
+
+    @property
+    def color(self):
+        return self.array.colors[self.index]
+
+    @color.setter
+    def color(self, value):
+        self.array.colors[self.index] = value
+
+    @property
+    def ball_type(self):
+        return self.array.ball_types[self.index]
+
+    @ball_type.setter
+    def ball_type(self, value):
+        self.array.ball_types[self.index] = value
+        self.array.bounce_bottom[self.index] = value != "shooter"
+
+
+class BallArray:
+    # Structure-of-arrays store for many balls. Each attribute of Ball is a contiguous
+    # NumPy column and move / wall bounces / ball-ball impulses run over all rows at
+    # once. Use array[i] to get a Ball-compatible view of one row.
+    def __init__(self, capacity=16, arena=None):
+        self.arena = arena if arena is not None else DEFAULT_ARENA
+        self.n = 0
+        self.colors = []
+        self.ball_types = []
+        self._allocate(max(1, capacity))
+
+    def _allocate(self, capacity):
+        old_n = self.n
+        columns = {}
+        for name, dtype in (("x", np.float64), ("y", np.float64), ("vx", np.float64),
+                            ("vy", np.float64), ("size", np.float64), ("mass", np.float64),
+                            ("count", np.int64), ("bounce_bottom", np.bool_)):
+            column = np.zeros(capacity, dtype=dtype)
+            if old_n:
+                column[:old_n] = getattr(self, name)[:old_n]
+            columns[name] = column
+        for name, column in columns.items():
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    @classmethod
+    def from_balls(cls, balls, arena=None):
+        array = cls(len(balls), arena)
+        for b in balls:
+            array.add(b.size, b.x, b.y, b.vx, b.vy, b.color, b.ball_type)
+        return array
+
+    def add(self, size, x, y, vx, vy, color, ball_type=None):
+        if self.n == self.capacity:
+            self._allocate(2 * self.capacity)
+        i = self.n
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = vx
+        self.vy[i] = vy
+        self.size[i] = size
+        self.mass[i] = 100 * size**2
+        self.count[i] = 0
+        self.bounce_bottom[i] = ball_type != "shooter"
+        self.colors.append(color)
+        self.ball_types.append(ball_type)
+        self.n += 1
+        return BallView(self, i)
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, index):
+        if not -self.n <= index < self.n:
+            raise IndexError("ball index out of range")
+        return BallView(self, index % self.n)
+
+    def __iter__(self):
+        for i in range(self.n):
+            yield BallView(self, i)
+
+    def move(self, dt):
+        n = self.n
+        move(self.x[:n], self.y[:n], self.vx[:n], self.vy[:n], dt)
+
+    def bounce_off_walls(self):
+        # Reflect balls touching a wall and still heading into it, like Ball.move.
+        # Shooters do not bounce off the bottom; the indices of those that reached it
+        # are returned so the caller can count the miss.
+        n = self.n
+        return bounce_off_walls(self.x[:n], self.y[:n], self.vx[:n], self.vy[:n], self.size[:n],
+                                self.count[:n], self.bounce_bottom[:n], self.arena.width, self.arena.height)
+
+    def overlapping_pairs(self):
+        n = self.n
+        return overlapping_pairs(self.x[:n], self.y[:n], self.size[:n])
+
+    def resolve_collisions(self):
+        # Apply the Ball.bounce_off impulse to every touching pair that is still
+        # approaching. A ball touching several others gets the sum of the impulses.
+        # Returns the number of pairs resolved.
+        n = self.n
+        return resolve_collisions(self.x[:n], self.y[:n], self.vx[:n], self.vy[:n], self.mass[:n],
+                                  self.size[:n], self.count[:n])
+
+    def __str__(self):
+        return "BallArray(" + str(self.n) + " balls)"
+
+
+# The batched updates work on plain columns, so they can also run on part of a
+# scene (see parallel.py). Columns are updated in place.
+
+def move(x, y, vx, vy, dt):
+    x += vx * dt
+    y += vy * dt
+
+
+def bounce_off_walls(x, y, vx, vy, size, count, bounce_bottom, width, height):
+    hit = ((x - size <= -width) & (vx < 0)) | ((x + size >= width) & (vx > 0))
+    vx[hit] = -vx[hit]
+    count[hit] += 1
+
+    at_bottom = (y - size <= -height) & (vy < 0)
+    hit = ((y + size >= height) & (vy > 0)) | (at_bottom & bounce_bottom)
+    vy[hit] = -vy[hit]
+    count[hit] += 1
+
+    return np.flatnonzero(at_bottom & ~bounce_bottom)
+
+
+def overlapping_pairs(x, y, size):
+    # Sort-and-sweep along x: compare each ball with its k-th neighbour in x order
+    # for k = 1, 2, ... until no neighbour that far away can still overlap. Pairs
+    # come back as (i, j) with i < j, sorted, so the order impulses are summed in
+    # does not depend on how the balls happened to be sorted.
+    n = len(x)
+    empty = np.empty(0, dtype=np.intp)
+    if n < 2:
+        return empty, empty
+    order = np.argsort(x, kind="stable")
+    xs = x[order]
+    reach = 2 * size.max()
+    firsts = []
+    seconds = []
+    for k in range(1, n):
+        near = xs[k:] - xs[:-k] <= reach
+        if not near.any():
+            break
+        i = order[:-k][near]
+        j = order[k:][near]
+        sigma = size[i] + size[j]
+        dx = x[j] - x[i]
+        dy = y[j] - y[i]
+        touching = dx*dx + dy*dy <= sigma*sigma
+        firsts.append(i[touching])
+        seconds.append(j[touching])
+    if not firsts:
+        return empty, empty
+    i = np.concatenate(firsts)
+    j = np.concatenate(seconds)
+    i, j = np.minimum(i, j), np.maximum(i, j)
+    order = np.lexsort((j, i))
+    return i[order], j[order]
+
+
+def resolve_collisions(x, y, vx, vy, mass, size, count, pairs=None):
+    i, j = overlapping_pairs(x, y, size) if pairs is None else pairs
+
+    dx = x[j] - x[i]
+    dy = y[j] - y[i]
+    dvx = vx[j] - vx[i]
+    dvy = vy[j] - vy[i]
+    dvdr = dx*dvx + dy*dvy  # dv dot dr
+    approaching = dvdr < 0
+    i, j = i[approaching], j[approaching]
+    dx, dy, dvdr = dx[approaching], dy[approaching], dvdr[approaching]
+    dist = size[i] + size[j]   # distance between particle centers at collison
+
+    # magnitude of normal force
+    magnitude = 2 * mass[i] * mass[j] * dvdr / ((mass[i] + mass[j]) * dist)
+
+    # normal force, and in x and y directions
+    fx = magnitude * dx / dist
+    fy = magnitude * dy / dist
+
+    # update velocities according to normal force
+    np.add.at(vx, i, fx / mass[i])
+    np.add.at(vy, i, fy / mass[i])
+    np.add.at(vx, j, -fx / mass[j])
+    np.add.at(vy, j, -fy / mass[j])
+
+    # update collision counts
+    np.add.at(count, i, 1)
+    np.add.at(count, j, 1)
+    return len(i)
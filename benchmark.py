@@ -0,0 +1,405 @@
+import argparse
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import types
+
+import ball
+import intercept
+from paddle import Paddle
+from bvh import BVH
+from run_ball import SNAPSHOT_SIZE, CatchAndShootGame, Obstacle, Polygon
+from vector_env import VectorEnv
+
+SIZES = (1, 10, 100, 1000)
+
+
+def make_stub_turtle():
+    # A turtle module whose every call is a no-op, so _redraw can be timed without Tk
+    stub = types.ModuleType("turtle")
+
+    class Terminator(Exception):
+        pass
+
+    class StubTurtle:
+        def __getattr__(self, name):
+            return _noop
+
+    def _noop(*args, **kwargs):
+        return None
+
+    stub.Terminator = Terminator
+    stub.Turtle = StubTurtle
+    stub.Screen = StubTurtle
+    stub.screensize = lambda *args: (400, 300)
+    stub.__getattr__ = lambda name: _noop
+    return stub
+
+
+def stub_renderer():
+    saved = sys.modules.get("turtle")
+    sys.modules["turtle"] = make_stub_turtle()
+    try:
+        sys.modules.pop("renderer", None)
+        import renderer
+        return renderer.TurtleRenderer()
+    finally:
+        sys.modules.pop("renderer", None)
+        if saved is not None:
+            sys.modules["turtle"] = saved
+        else:
+            sys.modules.pop("turtle", None)
+
+
+def make_balls(n, rng):
+    return [ball.Ball(rng.uniform(5, 15), rng.uniform(-380, 380), rng.uniform(-280, 280),
+                      rng.uniform(-100, 100), rng.uniform(-100, 100), (0, 0, 0), ball_type="target")
+            for _ in range(n)]
+
+
+def make_obstacles(n, rng, arena=None):
+    return [Obstacle(50, 20, rng.uniform(-350, 350), rng.uniform(-250, 250),
+                     rng.choice([-50, 50]), rng.choice([-30, 30]), (0, 0, 255), arena=arena)
+            for _ in range(n)]
+
+
+def make_segments(n, rng):
+    # Corners of n short line segments at random angles, as level geometry
+    segments = []
+    for _ in range(n):
+        x = rng.uniform(-380, 380)
+        y = rng.uniform(-280, 280)
+        angle = rng.uniform(0, math.pi)
+        length = rng.uniform(10, 40)
+        segments.append([[x, y], [x + length * math.cos(angle), y + length * math.sin(angle)]])
+    return segments
+
+
+def make_game(n, rng, renderer=None):
+    game = CatchAndShootGame(renderer=renderer, seed=rng.randrange(2**32))
+    for obstacle in make_obstacles(n, rng, game.arena):
+        game.add_obstacle(obstacle)
+    game.shoot()
+    return game
+
+
+# Each case builds a scene of n entities and returns a function doing one pass over it
+def case_ball_move(n, rng):
+    balls = make_balls(n, rng)
+
+    def run():
+        for b in balls:
+            b.move(1 / 120)
+    return run
+
+
+def case_ball_time_to_hit(n, rng):
+    balls = make_balls(n, rng)
+    pairs = [(balls[i], balls[(i + 1) % n]) for i in range(n)]
+
+    def run():
+        for a, b in pairs:
+            a.time_to_hit(b)
+    return run
+
+
+def case_ball_bounce_off(n, rng):
+    balls = make_balls(n + 1, rng)
+    pairs = [(balls[i], balls[i + 1]) for i in range(n)]
+
+    def run():
+        for a, b in pairs:
+            a.bounce_off(b)
+    return run
+
+
+def case_ball_check_collision_with_obstacle(n, rng):
+    shooter = make_balls(1, rng)[0]
+    obstacles = make_obstacles(n, rng)
+
+    def run():
+        for obstacle in obstacles:
+            shooter.check_collision_with_obstacle(obstacle)
+    return run
+
+
+def case_level_update(n, rng):
+    game = make_game(n, rng)
+
+    def run():
+        game.current_level.update(1 / 120)
+    return run
+
+
+def case_check_obstacle_collision(n, rng):
+    game = make_game(n, rng)
+
+    def run():
+        game._check_obstacle_collision(1 / 120)
+    return run
+
+
+def case_redraw(n, rng):
+    game = make_game(n, rng, stub_renderer())
+
+    def run():
+        game._redraw()
+    return run
+
+
+def case_vector_env_step(n, rng):
+    env = VectorEnv(n)
+    env.reset(rng.randrange(2**32))
+    actions = [rng.randrange(4) for _ in range(n)]
+
+    def run():
+        env.step(actions)
+    return run
+
+
+def case_snapshot_restore(n, rng):
+    # Round trip n games through one shared buffer, as a search over branches would
+    games = [make_game(3, rng) for _ in range(n)]
+    buffer = memoryview(bytearray(n * SNAPSHOT_SIZE))
+    slots = [buffer[i * SNAPSHOT_SIZE:(i + 1) * SNAPSHOT_SIZE] for i in range(n)]
+
+    def run():
+        for game, slot in zip(games, slots):
+            game.snapshot(slot)
+            game.restore(slot)
+    return run
+
+
+def case_intercept_solve(n, rng):
+    # Aim at n moving targets past three moving obstacles, as bots or the aim assist would
+    game = CatchAndShootGame(seed=rng.randrange(2**32))
+    for obstacle in make_obstacles(3, rng, game.arena):
+        game.add_obstacle(obstacle)
+    targets = make_balls(n, rng)
+    paddle = game.my_paddle
+    launch_y = paddle.y + paddle.height + game.shooter.size
+
+    def run():
+        for target in targets:
+            intercept.solve(target, game.arena, paddle.x, launch_y, game.shooter.size,
+                            paddle.width, game.obstacles)
+    return run
+
+
+def case_move_shooter_geometry(n, rng):
+    # One tick of the shot's sweep through n segments of level geometry, found
+    # through the BVH
+    game = CatchAndShootGame(seed=rng.randrange(2**32), config={"geometry": make_segments(n, rng)})
+    shooter = game.shooter
+    start = (rng.uniform(-300, 300), rng.uniform(-200, 200), rng.uniform(-300, 300), 500)
+
+    def run():
+        shooter.x, shooter.y, shooter.vx, shooter.vy = start
+        game._move_shooter(1 / 120)
+    return run
+
+
+def case_bvh_refit(n, rng):
+    # Move n segments and refit the tree around them, then look along a shot's path
+    polygons = [Polygon(points, rng.uniform(-50, 50), rng.uniform(-50, 50)) for points in make_segments(n, rng)]
+    tree = BVH(polygons)
+
+    def run():
+        for polygon in polygons:
+            polygon.move(1 / 120)
+        tree.refit()
+        tree.query(-10, -300, 10, 300)
+    return run
+
+
+CASES = {
+    "Ball.move": case_ball_move,
+    "Ball.time_to_hit": case_ball_time_to_hit,
+    "Ball.bounce_off": case_ball_bounce_off,
+    "Ball.check_collision_with_obstacle": case_ball_check_collision_with_obstacle,
+    "Level.update": case_level_update,
+    "CatchAndShootGame._check_obstacle_collision": case_check_obstacle_collision,
+    "CatchAndShootGame._redraw": case_redraw,
+    "VectorEnv.step": case_vector_env_step,
+    "CatchAndShootGame.snapshot+restore": case_snapshot_restore,
+    "intercept.solve": case_intercept_solve,
+    "CatchAndShootGame._move_shooter+geometry": case_move_shooter_geometry,
+    "BVH.refit+query": case_bvh_refit,
+}
+
+
+# Memory and attribute access of the entity classes, against the layout they had
+# before they were slotted: a plain object with an attribute dict, and the paddle
+# position as an [x, y] list replaced on every move
+MEMORY_COUNT = 100_000
+
+
+def _unslotted(entity, cls):
+    old = cls()
+    for name in type(entity).__slots__:
+        setattr(old, name, getattr(entity, name))
+    if isinstance(entity, Paddle):
+        del old.x, old.y
+        old.location = [entity.x, entity.y]
+    return old
+
+
+def _make_entities(kind, n, rng):
+    if kind == "Ball":
+        return make_balls(n, rng)
+    if kind == "Obstacle":
+        return make_obstacles(n, rng)
+    paddles = []
+    for _ in range(n):
+        paddle = Paddle(100, 25, (255, 0, 0))
+        paddle.set_location((rng.uniform(-350, 350), -240.0))
+        paddles.append(paddle)
+    return paddles
+
+
+def _access(kind, entities, old):
+    # One pass of the attribute traffic each entity sees in a tick
+    if kind == "Paddle":
+        if old:
+            for p in entities:
+                p.location = [p.location[0] + 20, p.location[1]]
+        else:
+            for p in entities:
+                p.x += 20
+        return
+    for e in entities:
+        e.x += e.vx * (1 / 120)
+        e.y += e.vy * (1 / 120)
+
+
+def measure_memory(n=MEMORY_COUNT, seed=0, repeats=5):
+    results = {}
+    for kind in ("Ball", "Obstacle", "Paddle"):
+        for old in (False, True):
+            rng = random.Random(seed)
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            entities = _make_entities(kind, n, rng)
+            if old:
+                # A class of its own per kind, so that instances share dict keys as they did
+                cls = type(kind, (), {})
+                entities = [_unslotted(e, cls) for e in entities]
+            size = tracemalloc.get_traced_memory()[0] - before
+            tracemalloc.stop()
+            samples = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                _access(kind, entities, old)
+                samples.append(time.perf_counter() - start)
+            results[kind + (" (unslotted)" if old else "")] = {
+                "n": n,
+                "bytes": size,
+                "access_s": statistics.median(samples),
+            }
+            del entities
+    return results
+
+
+def time_case(run, min_time=0.05, repeats=7):
+    # Calibrate a loop count that takes at least min_time, then take `repeats`
+    # samples of the per-call time
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        samples.append((time.perf_counter() - start) / loops)
+    return samples
+
+
+def run_benchmarks(names=None, sizes=SIZES, seed=0, min_time=0.05, repeats=7):
+    results = {}
+    for name, case in CASES.items():
+        if names and name not in names:
+            continue
+        for n in sizes:
+            rng = random.Random(seed)
+            samples = time_case(case(n, rng), min_time, repeats)
+            results[f"{name}[{n}]"] = {
+                "n": n,
+                "median_s": statistics.median(samples),
+                "min_s": min(samples),
+                "per_entity_s": statistics.median(samples) / n,
+            }
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    # Benchmarks whose median got slower than baseline by more than `threshold`
+    # (0.2 = 20%), as (name, baseline seconds, current seconds)
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is not None and result["median_s"] > base["median_s"] * (1 + threshold):
+            regressions.append((name, base["median_s"], result["median_s"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation and rendering hot paths")
+    parser.add_argument("--output", "-o", help="write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown before a benchmark counts as a regression")
+    parser.add_argument("--only", action="append", choices=sorted(CASES), help="run only this benchmark")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="entity counts to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per timing sample")
+    parser.add_argument("--memory", action="store_true",
+                        help=f"report memory and attribute access of {MEMORY_COUNT} of each entity instead")
+    args = parser.parse_args()
+
+    if args.memory:
+        for name, result in measure_memory(seed=args.seed).items():
+            print(f"{name:22s} {result['bytes'] / 2**20:8.2f} MiB  ({result['bytes'] / result['n']:6.1f} B/entity)"
+                  f"  access {result['access_s'] * 1e3:7.2f} ms")
+        return
+
+    sizes = tuple(int(size) for size in args.sizes.split(","))
+    current = run_benchmarks(args.only, sizes, args.seed, args.min_time)
+    for name, result in current["results"].items():
+        print(f"{name:55s} {result['median_s'] * 1e6:12.2f} us  ({result['per_entity_s'] * 1e9:10.1f} ns/entity)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1e6:.2f} us -> {after * 1e6:.2f} us")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+class BVH:
+    # Bounding-volume hierarchy broad phase: a binary tree of bounding boxes over
+    # items with x, y (centre), width and height, like Obstacle and Polygon. A query
+    # only goes down into the boxes it overlaps, so finding what lies along a ball's
+    # path among n items takes about log n box tests instead of n. It suits level
+    # geometry of hundreds of line segments, which a uniform grid would either file
+    # in many cells each or check many at a time.
+    #
+    # build() makes the tree, splitting each node's items in half at the median of
+    # the longer side of their box. Items that move keep their place in the tree, and
+    # refit() grows and shrinks the boxes to where they are now. That is one pass
+    # over the nodes, but the tree gets looser the further things travel, so call
+    # build() again after large moves.
+    def __init__(self, items=(), leaf_size=4):
+        self.leaf_size = leaf_size
+        self.items = list(items)
+
+        # Nodes, as parallel lists indexed by node number. Children always come after
+        # their parent, so refit() can go backwards. A leaf has no children and holds
+        # order[start:end]; an inner node has children first and first + 1.
+        self.boxes = []  # [left, bottom, right, top]
+        self.first = []  # First child, or -1 for a leaf
+        self.spans = []  # (start, end) into order, for leaves
+        self.order = []
+
+        # Broad-phase statistics, as for SpatialHash
+        self.pairs_considered = 0
+        self.pairs_tested = 0
+
+        self.build()
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item):
+        self.items.append(item)
+        self.build()
+
+    def remove(self, item):
+        self.items.remove(item)
+        self.build()
+
+    def clear(self):
+        self.items = []
+        self.build()
+
+    @staticmethod
+    def _box(item):
+        hw = item.width / 2
+        hh = item.height / 2
+        return [item.x - hw, item.y - hh, item.x + hw, item.y + hh]
+
+    def build(self):
+        self.order = list(self.items)
+        self.boxes = []
+        self.first = []
+        self.spans = []
+        if self.order:
+            self._allocate(1)
+            self._build(0, 0, len(self.order))
+
+    def _allocate(self, count):
+        # count new node slots at the end; returns the first
+        node = len(self.boxes)
+        self.boxes += [None] * count
+        self.first += [-1] * count
+        self.spans += [None] * count
+        return node
+
+    def _build(self, node, start, end):
+        items = self.order
+        box = self._box(items[start])
+        for k in range(start + 1, end):
+            left, bottom, right, top = self._box(items[k])
+            box[0] = min(box[0], left)
+            box[1] = min(box[1], bottom)
+            box[2] = max(box[2], right)
+            box[3] = max(box[3], top)
+        self.boxes[node] = box
+        if end - start <= self.leaf_size:
+            self.spans[node] = (start, end)
+            return
+
+        # Split at the median centre along the longer side; the two children sit
+        # next to each other, after every node made so far
+        if box[2] - box[0] >= box[3] - box[1]:
+            items[start:end] = sorted(items[start:end], key=lambda item: item.x)
+        else:
+            items[start:end] = sorted(items[start:end], key=lambda item: item.y)
+        middle = (start + end) // 2
+        first = self._allocate(2)
+        self.first[node] = first
+        self._build(first, start, middle)
+        self._build(first + 1, middle, end)
+
+    def refit(self):
+        # Fit every box to where the items are now, children before parents
+        boxes = self.boxes
+        first = self.first
+        spans = self.spans
+        order = self.order
+        for node in range(len(boxes) - 1, -1, -1):
+            child = first[node]
+            if child < 0:
+                start, end = spans[node]
+                box = self._box(order[start])
+                for k in range(start + 1, end):
+                    left, bottom, right, top = self._box(order[k])
+                    box[0] = min(box[0], left)
+                    box[1] = min(box[1], bottom)
+                    box[2] = max(box[2], right)
+                    box[3] = max(box[3], top)
+            else:
+                a = boxes[child]
+                b = boxes[child + 1]
+                box = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+            boxes[node] = box
+
+    def query(self, left, bottom, right, top):
+        # Items whose bounding boxes overlap the box, each listed once
+        found = []
+        if self.boxes:
+            boxes = self.boxes
+            first = self.first
+            spans = self.spans
+            order = self.order
+            stack = [0]
+            while stack:
+                node = stack.pop()
+                box = boxes[node]
+                if box[0] > right or box[2] < left or box[1] > top or box[3] < bottom:
+                    continue
+                child = first[node]
+                if child >= 0:
+                    stack.append(child + 1)
+                    stack.append(child)
+                    continue
+                start, end = spans[node]
+                for k in range(start, end):
+                    item = order[k]
+                    hw = item.width / 2
+                    hh = item.height / 2
+                    if (item.x - hw <= right and item.x + hw >= left and
+                            item.y - hh <= top and item.y + hh >= bottom):
+                        found.append(item)
+        self.pairs_considered += len(self.items)
+        self.pairs_tested += len(found)
+        return found
+
+    def query_ball(self, b):
+        return self.query(b.x - b.size, b.y - b.size, b.x + b.size, b.y + b.size)
+
+    def stats(self):
+        return {"pairs_considered": self.pairs_considered, "pairs_tested": self.pairs_tested}
+
+    def reset_stats(self):
+        self.pairs_considered = 0
+        self.pairs_tested = 0
@@ -0,0 +1,301 @@
+import math
+
+# Continuous collision between a moving circle and a moving axis-aligned box or
+# convex polygon. Boxes are anything with x, y (centre), width, height, vx and vy,
+# like Obstacle; polygons are run_ball.Polygon, which also have their edges and
+# edge normals worked out ahead of time. sweep_circle() and contact_normal() take
+# either, and tell them apart by normals, which is None for a box.
+#
+# Working in the body's frame, the circle becomes a point moving with the relative
+# velocity and the body grows by the circle's radius (a box into a rounded
+# rectangle). The time of impact is where that ray first meets the grown body; the
+# normal comes from the face or the corner arc it meets.
+
+
+def _box_at(box, t):
+    return box.x + box.vx * t, box.y + box.vy * t
+
+
+def contact_normal(x, y, body, body_time=0.0):
+    # Outward normal of a box or polygon at the point closest to (x, y)
+    if body.normals is not None:
+        return polygon_contact(x, y, body, body_time)[1:]
+    return box_normal(x, y, body, body_time)
+
+
+def box_normal(x, y, box, box_time=0.0):
+    # Outward normal of the box at the point closest to (x, y)
+    bx, by = _box_at(box, box_time)
+    px = x - bx
+    py = y - by
+    hw = box.width / 2
+    hh = box.height / 2
+    cx = min(max(px, -hw), hw)
+    cy = min(max(py, -hh), hh)
+    if cx == px and cy == py:
+        # Centre inside the box: push out through the nearest face
+        if hw - abs(px) < hh - abs(py):
+            return (1.0 if px >= 0 else -1.0), 0.0
+        return 0.0, (1.0 if py >= 0 else -1.0)
+    nx = px - cx
+    ny = py - cy
+    length = math.hypot(nx, ny)
+    return nx / length, ny / length
+
+
+def sweep_circle_box(x, y, r, vx, vy, box, horizon=math.inf, box_time=0.0):
+    # First contact within `horizon` seconds of a circle at (x, y) with radius r
+    # moving at (vx, vy) and a box whose position is box.x/y advanced by box_time.
+    # Returns (t, nx, ny) with the box's outward normal at the contact, or None.
+    # A circle already touching the box only counts if it is moving further in.
+    bx, by = _box_at(box, box_time)
+    px = x - bx
+    py = y - by
+    dx = vx - box.vx
+    dy = vy - box.vy
+    hw = box.width / 2
+    hh = box.height / 2
+
+    # Already touching or overlapping
+    cx = min(max(px, -hw), hw)
+    cy = min(max(py, -hh), hh)
+    if (px - cx)**2 + (py - cy)**2 <= r * r:
+        nx, ny = box_normal(x, y, box, box_time)
+        if dx * nx + dy * ny < 0:
+            return 0.0, nx, ny
+        return None
+
+    # Ray against the box grown by r on every side
+    ex = hw + r
+    ey = hh + r
+    if dx == 0:
+        if abs(px) > ex:
+            return None
+        tx_enter, tx_exit = -math.inf, math.inf
+    else:
+        t1 = (-ex - px) / dx
+        t2 = (ex - px) / dx
+        tx_enter, tx_exit = min(t1, t2), max(t1, t2)
+    if dy == 0:
+        if abs(py) > ey:
+            return None
+        ty_enter, ty_exit = -math.inf, math.inf
+    else:
+        t1 = (-ey - py) / dy
+        t2 = (ey - py) / dy
+        ty_enter, ty_exit = min(t1, t2), max(t1, t2)
+    t_enter = max(tx_enter, ty_enter, 0.0)
+    t_exit = min(tx_exit, ty_exit)
+    if t_enter > t_exit or t_enter > horizon:
+        return None
+
+    qx = px + dx * t_enter
+    qy = py + dy * t_enter
+    if abs(qx) <= hw:  # top or bottom face
+        return t_enter, 0.0, (1.0 if qy > 0 else -1.0)
+    if abs(qy) <= hh:  # left or right face
+        return t_enter, (1.0 if qx > 0 else -1.0), 0.0
+
+    # Corner region: hit the quarter circle around the box corner, or miss entirely
+    mx = px - math.copysign(hw, qx)
+    my = py - math.copysign(hh, qy)
+    a = dx * dx + dy * dy
+    b = mx * dx + my * dy
+    c = mx * mx + my * my - r * r
+    disc = b * b - a * c
+    if disc < 0:
+        return None
+    t = (-b - math.sqrt(disc)) / a
+    if t < 0 or t > horizon:
+        return None
+    return t, (mx + dx * t) / r, (my + dy * t) / r
+
+
+def polygon_contact(x, y, poly, poly_time=0.0):
+    # Squared distance from (x, y) to the polygon and the polygon's outward normal at
+    # the closest point. A point inside is at distance 0 and pushed out through the
+    # nearest face; a line segment has no inside, only its two sides.
+    px = x - poly.x - poly.vx * poly_time
+    py = y - poly.y - poly.vy * poly_time
+    inside = True
+    depth = -math.inf
+    face = None
+    nearest = math.inf
+    ox = oy = 0.0
+    for ax, ay, ex, ey, length_sq, nx, ny in poly.edges:
+        wx = px - ax
+        wy = py - ay
+        separation = wx * nx + wy * ny
+        if separation > 0:
+            inside = False
+        if separation > depth:
+            depth = separation
+            face = nx, ny
+        s = min(max((wx * ex + wy * ey) / length_sq, 0.0), 1.0)
+        dx = wx - s * ex
+        dy = wy - s * ey
+        d = dx * dx + dy * dy
+        if d < nearest:
+            nearest = d
+            ox = dx
+            oy = dy
+    if nearest > 0 and (not inside or len(poly.points) == 2):
+        length = math.sqrt(nearest)
+        return nearest, ox / length, oy / length
+    return 0.0, face[0], face[1]
+
+
+def sweep_circle_polygon(x, y, r, vx, vy, poly, horizon=math.inf, poly_time=0.0):
+    # sweep_circle_box for a convex polygon or line segment. The ray is tested
+    # against each edge pushed out by r along its normal, and against a circle of
+    # radius r around each corner; the earliest of those is the first contact.
+    px = x - poly.x - poly.vx * poly_time
+    py = y - poly.y - poly.vy * poly_time
+    dx = vx - poly.vx
+    dy = vy - poly.vy
+
+    # Already touching or overlapping
+    d, nx, ny = polygon_contact(x, y, poly, poly_time)
+    if d <= r * r:
+        if dx * nx + dy * ny < 0:
+            return 0.0, nx, ny
+        return None
+
+    best = None
+    first = horizon
+    for ax, ay, ex, ey, length_sq, nx, ny in poly.edges:
+        speed = dx * nx + dy * ny
+        if speed >= 0:
+            continue  # Moving along or away from this face
+        gap = (px - ax) * nx + (py - ay) * ny - r
+        if gap < 0:
+            continue  # Behind the face; the ray can only leave through it
+        t = gap / -speed
+        if t > first:
+            continue
+        s = ((px + dx * t - ax) * ex + (py + dy * t - ay) * ey) / length_sq
+        if 0 <= s <= 1:
+            first = t
+            best = (t, nx, ny)
+
+    a = dx * dx + dy * dy
+    for cx, cy in poly.points:
+        mx = px - cx
+        my = py - cy
+        b = mx * dx + my * dy
+        if b >= 0:
+            continue  # Not closing on this corner
+        disc = b * b - a * (mx * mx + my * my - r * r)
+        if disc < 0:
+            continue
+        t = (-b - math.sqrt(disc)) / a
+        if 0 <= t <= first:
+            first = t
+            best = (t, (mx + dx * t) / r, (my + dy * t) / r)
+    return best
+
+
+def sweep_circle(x, y, r, vx, vy, body, horizon=math.inf, body_time=0.0):
+    # sweep_circle_box or sweep_circle_polygon, whichever body is
+    if body.normals is not None:
+        return sweep_circle_polygon(x, y, r, vx, vy, body, horizon, body_time)
+    return sweep_circle_box(x, y, r, vx, vy, body, horizon, body_time)
+
+
+def reflect(vx, vy, box, nx, ny):
+    # Reflect the circle's velocity relative to the box about the contact normal.
+    # Only a circle moving into the box is changed.
+    dot = (vx - box.vx) * nx + (vy - box.vy) * ny
+    if dot >= 0:
+        return vx, vy
+    return vx - 2 * dot * nx, vy - 2 * dot * ny
+
+
+def release_squeeze(b, box, nx, ny, box_time=0.0, others=()):
+    # A ball pinned between a box and a wall, or between two boxes, would be hit
+    # again and again with no time passing. If the box is closing on the wall or
+    # other box behind the ball and the gap is too narrow for the ball, whatever is
+    # closing in bounces back instead. Returns the boxes that bounced.
+    bx, by = _box_at(box, box_time)
+    arena = box.arena
+    room = 2 * b.size + 1
+    if abs(nx) >= abs(ny):
+        if nx > 0 and box.vx > 0 and arena.width - (bx + box.width / 2) <= room:
+            box.bounce_off_vertical_wall()
+            return [box]
+        if nx < 0 and box.vx < 0 and (bx - box.width / 2) + arena.width <= room:
+            box.bounce_off_vertical_wall()
+            return [box]
+    else:
+        if ny > 0 and box.vy > 0 and arena.height - (by + box.height / 2) <= room:
+            box.bounce_off_horizontal_wall()
+            return [box]
+        if ny < 0 and box.vy < 0 and (by - box.height / 2) + arena.height <= room:
+            box.bounce_off_horizontal_wall()
+            return [box]
+
+    # The same along the normal's axis, with another box on the far side of the
+    # ball in place of the wall
+    horizontal = abs(nx) >= abs(ny)
+    side = 1 if (nx if horizontal else ny) > 0 else -1
+    bounced = []
+    for other in others:
+        if other is box:
+            continue
+        ox, oy = _box_at(other, box_time)
+        if horizontal:
+            if abs(b.y - oy) >= other.height / 2 + b.size:
+                continue  # Not level with the ball
+            gap = side * (ox - bx) - (other.width + box.width) / 2
+            closing = side * (box.vx - other.vx)
+            behind = side * (ox - b.x) > 0
+        else:
+            if abs(b.x - ox) >= other.width / 2 + b.size:
+                continue
+            gap = side * (oy - by) - (other.height + box.height) / 2
+            closing = side * (box.vy - other.vy)
+            behind = side * (oy - b.y) > 0
+        if not behind or gap > room or closing <= 0:
+            continue
+        for body, velocity, toward in ((box, box.vx if horizontal else box.vy, side),
+                                       (other, other.vx if horizontal else other.vy, -side)):
+            if velocity * toward > 0 and body not in bounced:
+                if horizontal:
+                    body.bounce_off_vertical_wall()
+                else:
+                    body.bounce_off_horizontal_wall()
+                bounced.append(body)
+    return bounced
+
+
+def advance_ball(b, obstacles, dt, max_substeps=4):
+    # Move ball b through dt seconds, bouncing off the moving obstacles at their
+    # exact times of impact instead of testing for overlap afterwards. Obstacles are
+    # taken at their positions at the start of the step. Returns the obstacles hit.
+    #
+    # If the ball is still colliding after max_substeps bounces (wedged between
+    # obstacles) it stops for the rest of the step rather than tunnelling.
+    hits = []
+    elapsed = 0.0
+    remaining = dt
+    for _ in range(max_substeps):
+        best = None
+        for obstacle in obstacles:
+            hit = sweep_circle(b.x, b.y, b.size, b.vx, b.vy, obstacle, remaining, elapsed)
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = (hit[0], hit[1], hit[2], obstacle)
+        if best is None:
+            b.x += b.vx * remaining
+            b.y += b.vy * remaining
+            return hits
+
+        t, nx, ny, obstacle = best
+        b.x += b.vx * t
+        b.y += b.vy * t
+        elapsed += t
+        remaining -= t
+        b.vx, b.vy = reflect(b.vx, b.vy, obstacle, nx, ny)
+        b.count += 1
+        release_squeeze(b, obstacle, nx, ny, elapsed, obstacles)
+        hits.append(obstacle)
+    return hits
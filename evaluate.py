@@ -0,0 +1,233 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+from intercept import PADDLE_STEP, solve_for_game
+from run_ball import CatchAndShootGame
+
+Z95 = 1.959964  # Two-sided 95% normal quantile
+
+
+class ScriptedPlayer:
+    # A simple bot: line the paddle up under where the target will be when the
+    # shot arrives, then fire. aim_error adds Gaussian noise (in pixels) to the aim
+    # point, and the bot only acts every reaction_ticks ticks, like key repeat.
+    def __init__(self, seed=0, aim_error=8.0, reaction_ticks=6):
+        self.rng = random.Random(seed)
+        self.aim_error = aim_error
+        self.reaction_ticks = reaction_ticks
+        self.aim_x = None
+
+    def aim_point(self, game):
+        target = game.target
+        paddle = game.my_paddle
+        start_y = paddle.y + paddle.height + game.shooter.size
+        flight = max(0.0, (target.y - start_y) / 500)  # shooter travels straight up at vy = 500
+        x = target.x + target.vx * flight
+
+        # Fold the predicted x back into the arena, as the walls would
+        width = game.canvas_width - target.size
+        if width > 0:
+            period = 4 * width
+            x = (x + width) % period
+            x = x - width if x <= 2 * width else 3 * width - x
+        return x + self.rng.gauss(0, self.aim_error)
+
+    def decide(self, game):
+        if not game.shooter_ready or game.tick_count % self.reaction_ticks:
+            return None
+        if self.aim_x is None:
+            self.aim_x = self.aim_point(game)
+        paddle_x = game.my_paddle.x
+        if paddle_x < self.aim_x - 10:
+            return "right"
+        if paddle_x > self.aim_x + 10:
+            return "left"
+        self.aim_x = None
+        return "shoot"
+
+
+class InterceptPlayer:
+    # A near-perfect bot for comparison: re-solves the exact intercept every tick
+    # (intercept.py), so obstacles and bounces are planned for and redirects are
+    # caught as soon as they happen. Moves at the same key rate as ScriptedPlayer.
+    def __init__(self, seed=0, reaction_ticks=6):
+        self.reaction_ticks = reaction_ticks
+
+    def decide(self, game):
+        paddle_speed = PADDLE_STEP / (self.reaction_ticks * game.physics_dt)
+        plan = solve_for_game(game, paddle_speed)
+        if plan is None:
+            return None
+        paddle_x = game.my_paddle.x
+        if plan.paddle_x != paddle_x:
+            if game.tick_count % self.reaction_ticks:
+                return None
+            return "right" if plan.paddle_x > paddle_x else "left"
+        if plan.fire_time <= game.physics_dt / 2:
+            return "shoot"
+        return None
+
+
+PLAYERS = {"scripted": ScriptedPlayer, "intercept": InterceptPlayer}
+
+
+def play_game(config, seed, max_seconds=300, mode="poll", player="scripted"):
+    # Play one headless game with a bot from PLAYERS and return its statistics
+    game = CatchAndShootGame(seed=seed, config=config, mode=mode)
+    player = PLAYERS[player](seed)
+    max_ticks = int(max_seconds * game.physics_hz)
+    while not game.game_over and game.tick_count < max_ticks:
+        action = player.decide(game)
+        if action is not None:
+            game.queue_input(action)
+        game.tick()
+    return {
+        "seed": seed,
+        "shots": game.shots,
+        "hits": game.hits,
+        "won": game.won,
+        "time": game.tick_count * game.physics_dt,
+        "lives_lost": 3 - max(game.lives, 0),
+        "level": type(game.current_level).__name__,
+    }
+
+
+def _play_batch(config, seeds, max_seconds, mode, player):
+    return [play_game(config, seed, max_seconds, mode, player) for seed in seeds]
+
+
+def wilson_interval(successes, trials):
+    # 95% Wilson score interval for a proportion
+    if trials == 0:
+        return (math.nan, math.nan)
+    p = successes / trials
+    denominator = 1 + Z95**2 / trials
+    centre = (p + Z95**2 / (2 * trials)) / denominator
+    half = Z95 * math.sqrt(p * (1 - p) / trials + Z95**2 / (4 * trials**2)) / denominator
+    return (centre - half, centre + half)
+
+
+def mean_interval(values):
+    # Mean with a 95% normal-approximation interval
+    if not values:
+        return {"mean": math.nan, "ci": (math.nan, math.nan), "n": 0}
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return {"mean": mean, "ci": (math.nan, math.nan), "n": len(values)}
+    half = Z95 * statistics.stdev(values) / math.sqrt(len(values))
+    return {"mean": mean, "ci": (mean - half, mean + half), "n": len(values)}
+
+
+def summarize(results):
+    shots = sum(r["shots"] for r in results)
+    hits = sum(r["hits"] for r in results)
+    wins = [r for r in results if r["won"]]
+    lives_lost = {}
+    for lost in range(4):
+        count = sum(1 for r in results if r["lives_lost"] == lost)
+        lives_lost[lost] = {"share": count / len(results), "ci": wilson_interval(count, len(results))}
+    return {
+        "games": len(results),
+        "hit_rate": {"mean": hits / shots if shots else math.nan, "ci": wilson_interval(hits, shots)},
+        "shots_per_hit": mean_interval([r["shots"] / r["hits"] for r in results if r["hits"]]),
+        "clear_rate": {"mean": len(wins) / len(results), "ci": wilson_interval(len(wins), len(results))},
+        "time_to_clear": mean_interval([r["time"] for r in wins]),
+        "lives_lost": lives_lost,
+    }
+
+
+def sweep(base_config, grid, games=100, seed=0, workers=None, max_seconds=300, mode="poll", player="scripted"):
+    # Evaluate every combination of the values in grid, which maps "Level2.target_size"
+    # style keys to lists of values, on top of base_config. Every parameter set is
+    # played with the same seeds, and all games share one process pool.
+    keys = list(grid)
+    combos = list(itertools.product(*(grid[key] for key in keys))) if keys else [()]
+    workers = workers or os.cpu_count() or 1
+    seeds = list(range(seed, seed + games))
+    chunk = max(1, math.ceil(games / (4 * workers)))
+
+    configs = []
+    for values in combos:
+        config = {name: dict(value) if isinstance(value, dict) else value for name, value in base_config.items()}
+        for key, value in zip(keys, values):
+            level, name = key.split(".", 1)
+            config.setdefault(level, {})[name] = value
+        configs.append((dict(zip(keys, values)), config))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for _, config in configs:
+            futures.append([pool.submit(_play_batch, config, seeds[i:i + chunk], max_seconds, mode, player)
+                            for i in range(0, games, chunk)])
+        reports = []
+        for (params, config), batches in zip(configs, futures):
+            results = [r for f in batches for r in f.result()]
+            report = summarize(results)
+            report["params"] = params
+            report["config"] = config
+            reports.append(report)
+    return reports
+
+
+def evaluate(config=None, games=100, seed=0, workers=None, max_seconds=300, mode="poll", player="scripted"):
+    return sweep(config or {}, {}, games, seed, workers, max_seconds, mode, player)[0]
+
+
+def _parse_value(text):
+    value = float(text)
+    return int(value) if value.is_integer() and "." not in text else value
+
+
+def _format(stat):
+    low, high = stat["ci"]
+    return f"{stat['mean']:.3f} [{low:.3f}, {high:.3f}]"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo difficulty evaluation with a scripted player")
+    parser.add_argument("--games", type=int, default=100, help="games per parameter set")
+    parser.add_argument("--seed", type=int, default=0, help="first game seed")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--max-seconds", type=float, default=300, help="cap on simulated game length")
+    parser.add_argument("--mode", choices=("poll", "event"), default="poll")
+    parser.add_argument("--player", choices=sorted(PLAYERS), default="scripted",
+                        help="bot to play with; intercept aims exactly, for an upper bound")
+    parser.add_argument("--set", action="append", default=[], metavar="LEVEL.PARAM=VALUE",
+                        help="fixed parameter override, e.g. Level2.target_size=0.03")
+    parser.add_argument("--sweep", action="append", default=[], metavar="LEVEL.PARAM=V1,V2,...",
+                        help="parameter to sweep, e.g. Level3.target_speed=50,100,150")
+    parser.add_argument("--json", help="write the full report to this file")
+    args = parser.parse_args()
+
+    base = {}
+    for item in args.set:
+        key, value = item.split("=", 1)
+        level, name = key.split(".", 1)
+        base.setdefault(level, {})[name] = _parse_value(value)
+    grid = {}
+    for item in args.sweep:
+        key, values = item.split("=", 1)
+        grid[key] = [_parse_value(v) for v in values.split(",")]
+
+    reports = sweep(base, grid, args.games, args.seed, args.workers, args.max_seconds, args.mode, args.player)
+    for report in reports:
+        print(report["params"] or "defaults")
+        print("  hit rate       ", _format(report["hit_rate"]))
+        print("  shots per hit  ", _format(report["shots_per_hit"]))
+        print("  clear rate     ", _format(report["clear_rate"]))
+        print("  time to clear  ", _format(report["time_to_clear"]))
+        print("  lives lost     ", ", ".join(f"{lost}: {stat['share']:.2f}"
+                                              for lost, stat in report["lives_lost"].items()))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
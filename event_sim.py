@@ -0,0 +1,261 @@
+import heapq
+import math
+from collision import contact_normal, release_squeeze
+
+
+# Every kind of event, in a fixed order so an event can be stored as a small number
+KINDS = ("ball", "vertical_wall", "horizontal_wall", "paddle", "obstacle", "obstacle_vertical_wall",
+         "obstacle_horizontal_wall")
+
+
+class Event:
+    # A predicted collision at time t between a and b. b is None for wall hits.
+    # The counts are copied at prediction time; if either body has collided or been
+    # moved since then, its count no longer matches and the event is stale.
+    # Events at the same time are handled in the order they were predicted (seq),
+    # so the order never depends on how the heap happens to be laid out.
+    def __init__(self, t, kind, a, b=None, seq=0):
+        self.time = t
+        self.kind = kind
+        self.a = a
+        self.b = b
+        self.seq = seq
+        self.count_a = a.count
+        self.count_b = b.count if b is not None else -1
+
+    def __lt__(self, that):
+        return (self.time, self.seq) < (that.time, that.seq)
+
+    def is_valid(self):
+        if self.a.count != self.count_a:
+            return False
+        if self.b is not None and self.b.count != self.count_b:
+            return False
+        return True
+
+
+class EventSimulation:
+    # Priority-queue collision system in the style of the classic bouncing-particles
+    # simulation: instead of testing every pair every frame, predict the next
+    # collision of each body and jump straight to it.
+    #
+    # The callbacks let the game turn collisions into gameplay. Without them balls
+    # bounce off each other, the paddle and every wall.
+    #
+    # resting(b) tells whether ball b is being held in place by the game (the shot
+    # waiting on the paddle, which moves with the paddle instead). A resting ball
+    # only collides with other balls; it has no wall, paddle or obstacle events.
+    def __init__(self, world, on_ball_hit=None, on_paddle_hit=None, on_miss=None, on_obstacle_hit=None,
+                 resting=None, max_events_per_advance=10000):
+        self.world = world
+        # A body colliding over and over without time passing would hang advance().
+        # That is a bug, so past this many events in one call it raises instead.
+        self.max_events_per_advance = max_events_per_advance
+        self.resting = resting
+        self.on_ball_hit = on_ball_hit
+        self.on_paddle_hit = on_paddle_hit
+        self.on_miss = on_miss
+        self.on_obstacle_hit = on_obstacle_hit
+        self.t = 0.0
+        self.pq = []
+        self.dirty = []
+        self.seq = 0  # Sequence number of the next prediction
+
+        # Work counters, for comparing against per-frame polling
+        self.predictions = 0
+        self.events = 0
+        self.stale = 0
+
+        self.reset()
+
+    def reset(self):
+        # Throw away every prediction and start over from the current world state
+        self.pq = []
+        self.dirty = []
+        for b in self.world.balls():
+            self._predict_ball(b)
+        for obstacle in self.world.obstacles:
+            self._predict_obstacle_walls(obstacle)
+
+    def pending(self):
+        # The events still to come, without the stale ones, in the order they will
+        # be handled
+        return sorted(event for event in self.pq if event.is_valid())
+
+    def load(self, t, events):
+        # Replace the queue with (time, kind, a, b) predictions, such as pending()
+        # from a saved state once its bodies have been put back, in that order.
+        # Continuing from these reproduces the saved run exactly, where reset() would
+        # predict anew: they are numbered in order, ahead of every later prediction,
+        # so ties between them and with new events break the same way as before.
+        self.t = t
+        self.dirty = []
+        self.pq = [Event(time, kind, a, b, seq) for seq, (time, kind, a, b) in enumerate(events)]
+        self.seq = len(self.pq)
+        heapq.heapify(self.pq)
+
+    def invalidate(self, body):
+        # Called whenever something outside the simulation changes a body's position
+        # or velocity (a keypress, a respawn, a level change). Bumping the count makes
+        # its pending events stale; it is re-predicted before time moves on.
+        body.count += 1
+        if body not in self.dirty:
+            self.dirty.append(body)
+
+    def advance(self, dt):
+        end = self.t + dt
+        self._flush()
+        handled = 0
+        while self.pq and self.pq[0].time <= end:
+            event = heapq.heappop(self.pq)
+            if not event.is_valid():
+                self.stale += 1
+                continue
+            if handled == self.max_events_per_advance:
+                raise RuntimeError(f"{handled} events within {dt} s, stuck at a {event.kind!r} event at t={event.time}")
+            self._move_all(event.time - self.t)
+            self.t = max(self.t, event.time)
+            self.events += 1
+            handled += 1
+            self._handle(event)
+            self._flush()
+        self._move_all(end - self.t)
+        self.t = end
+
+    def _handle(self, event):
+        a = event.a
+        b = event.b
+        if event.kind == "ball":
+            if self.on_ball_hit:
+                self.on_ball_hit(a, b)
+            else:
+                a.bounce_off(b)
+            self.invalidate(a)
+            self.invalidate(b)
+        elif event.kind == "vertical_wall":
+            a.bounce_off_vertical_wall()
+            self.invalidate(a)
+        elif event.kind == "horizontal_wall":
+            # Shooters are not caught by the bottom wall; falling through it is a miss
+            if a.ball_type == "shooter" and a.vy < 0 and self.on_miss:
+                self.on_miss(a)
+            else:
+                a.bounce_off_horizontal_wall()
+            self.invalidate(a)
+        elif event.kind == "paddle":
+            if self.on_paddle_hit:
+                count = a.count
+                self.on_paddle_hit(a)
+                if a.count == count:
+                    return  # Nothing changed, so predicting again would find this same event
+            else:
+                a.bounce_off_paddle()
+            self.invalidate(a)
+        elif event.kind == "obstacle":
+            nx, ny = contact_normal(a.x, a.y, b)
+            a.bounce_off_obstacle(b)
+            self.invalidate(a)
+            for body in release_squeeze(a, b, nx, ny, others=self._near(a)):
+                self.invalidate(body)
+            if self.on_obstacle_hit:
+                self.on_obstacle_hit(a, b)
+        elif event.kind == "obstacle_vertical_wall":
+            a.bounce_off_vertical_wall()
+            self.invalidate(a)
+        elif event.kind == "obstacle_horizontal_wall":
+            a.bounce_off_horizontal_wall()
+            self.invalidate(a)
+
+    def _flush(self):
+        dirty = self.dirty
+        self.dirty = []
+        for body in dirty:
+            if body is self.world.paddle:
+                for b in self.world.balls():
+                    self._predict_paddle(b)
+            elif body in self.world.obstacles:
+                self._predict_obstacle_walls(body)
+                for b in self.world.balls():
+                    self._predict_obstacle(b, body)
+            else:
+                self._predict_ball(body)
+
+    def _move_all(self, dt):
+        if dt <= 0:
+            return
+        for b in self.world.balls():
+            b.x += b.vx * dt
+            b.y += b.vy * dt
+        for obstacle in self.world.obstacles:
+            obstacle.move(dt)
+
+    def _push(self, dt, kind, a, b=None):
+        self.predictions += 1
+        if dt != math.inf:
+            heapq.heappush(self.pq, Event(self.t + dt, kind, a, b, self.seq))
+            self.seq += 1
+
+    def _near(self, a):
+        # Obstacles and level geometry that could be on the far side of ball a
+        near = list(self.world.obstacles)
+        if self.world.geometry:
+            reach = 3 * a.size + 1
+            near += self.world.geometry.query(a.x - reach, a.y - reach, a.x + reach, a.y + reach)
+        return near
+
+    def _is_resting(self, a):
+        return self.resting is not None and self.resting(a)
+
+    def _predict_ball(self, a):
+        for b in self.world.balls():
+            if b is not a:
+                self._push(a.time_to_hit(b), "ball", a, b)
+        if self._is_resting(a):
+            return
+        self._push(a.time_to_hit_vertical_wall(), "vertical_wall", a)
+        self._push(a.time_to_hit_horizontal_wall(), "horizontal_wall", a)
+        self._predict_paddle(a)
+        for obstacle in self.world.obstacles:
+            self._predict_obstacle(a, obstacle)
+        self._predict_geometry(a)
+
+    def _predict_paddle(self, a):
+        # Only the shooter is caught by the paddle, as in the polled game
+        if a.ball_type == "shooter" and self.world.paddle is not None and not self._is_resting(a):
+            self._push(a.time_to_hit_paddle(self.world.paddle), "paddle", a, self.world.paddle)
+
+    def _predict_obstacle(self, a, obstacle):
+        # Targets pass through obstacles, as in the polled game
+        if a.ball_type != "target" and not self._is_resting(a):
+            self._push(a.time_to_hit_obstacle(obstacle), "obstacle", a, obstacle)
+
+    def _predict_geometry(self, a):
+        # The level geometry does not move, so a ball can only reach the pieces along
+        # its straight path to the next wall; the tree finds those, and only the
+        # first one hit is queued
+        geometry = self.world.geometry
+        if a.ball_type == "target" or not geometry or self._is_resting(a):
+            return
+        horizon = min(a.time_to_hit_vertical_wall(), a.time_to_hit_horizontal_wall())
+        if horizon == math.inf:
+            return  # Not moving
+        end_x = a.x + a.vx * horizon
+        end_y = a.y + a.vy * horizon
+        first = math.inf
+        hit = None
+        for body in geometry.query(min(a.x, end_x) - a.size, min(a.y, end_y) - a.size,
+                                   max(a.x, end_x) + a.size, max(a.y, end_y) + a.size):
+            t = a.time_to_hit_obstacle(body)
+            if t < first:
+                first = t
+                hit = body
+        if hit is not None:
+            self._push(first, "obstacle", a, hit)
+
+    def _predict_obstacle_walls(self, obstacle):
+        self._push(obstacle.time_to_hit_vertical_wall(), "obstacle_vertical_wall", obstacle)
+        self._push(obstacle.time_to_hit_horizontal_wall(), "obstacle_horizontal_wall", obstacle)
+
+    def __str__(self):
+        return "t=" + str(self.t) + " events=" + str(self.events) + " stale=" + str(self.stale) + \
+            " predictions=" + str(self.predictions)
@@ -0,0 +1,224 @@
+import math
+import paddle
+from collision import sweep_circle
+
+# Closed-form aiming. Between Level3's random redirects the target moves in straight
+# lines, reflecting off the walls, and a shot goes straight up at SHOT_SPEED. Mirror
+# the arena at every wall and a reflecting path becomes one straight line; folding
+# that line back gives the position at any time directly (fold()). The solver walks
+# the target's path one straight piece at a time (between bounces, a handful per
+# query at most) and on each piece solves linear inequalities for the earliest
+# moment it can be hit. The cost does not grow with how far ahead the hit is.
+
+SHOT_SPEED = 500  # CatchAndShootGame.shoot fires straight up at this speed
+PADDLE_STEP = 20  # Each left / right press moves the paddle this far
+PADDLE_SPEED = paddle.SPEED  # A press every 6 ticks at 120 Hz, like ScriptedPlayer, or a held key
+MAX_SEGMENTS = 64  # Straight pieces of the target's path looked at per query
+MAX_RETRIES = 20  # Later hits tried after the shot to one is blocked by an obstacle
+RETRY_STEP = 0.1  # Seconds to look past a blocked hit before trying again
+
+
+def fold(p, v, t, lo, hi):
+    # Position and velocity at time t of a point starting at p with velocity v that
+    # bounces between lo and hi. Unfolded, the path is p + v * t; every 2 * (hi - lo)
+    # of it is one trip there and back.
+    span = hi - lo
+    if span <= 0:
+        return (lo + hi) / 2, 0.0
+    u = (p - lo + v * t) % (2 * span)
+    if u < span:
+        return lo + u, v
+    return lo + 2 * span - u, -v
+
+
+def time_to_wall(p, v, lo, hi):
+    # Time until a point at p moving at v reaches lo or hi
+    if v > 0:
+        return max(0.0, (hi - p) / v)
+    if v < 0:
+        return max(0.0, (lo - p) / v)
+    return math.inf
+
+
+class Intercept:
+    # A way to hit the target: move the paddle to paddle_x, fire fire_time seconds
+    # from now, and the shot meets the target hit_time seconds from now at (x, y)
+    def __init__(self, paddle_x, fire_time, hit_time, x, y):
+        self.paddle_x = paddle_x
+        self.fire_time = fire_time
+        self.hit_time = hit_time
+        self.x = x
+        self.y = y
+
+    def label(self):
+        # Short text for the aim assist overlay
+        return "FIRE" if self.fire_time < 0.05 else f"fire in {self.fire_time:.1f}s"
+
+    def __str__(self):
+        return (f"paddle {self.paddle_x} fire in {self.fire_time:.3f}s hit in {self.hit_time:.3f}s "
+                f"at ({self.x:.1f}, {self.y:.1f})")
+
+
+class _Moved:
+    # An obstacle, box or polygon, as it will be at some time, for sweep_circle
+    def __init__(self, obstacle, x, y, vx, vy):
+        self.x = x
+        self.y = y
+        self.vx = vx
+        self.vy = vy
+        self.width = obstacle.width
+        self.height = obstacle.height
+        self.normals = obstacle.normals
+        if obstacle.normals is not None:
+            self.points = obstacle.points
+            self.edges = obstacle.edges
+
+
+def _linear_range(c0, c1, t0, lo, hi):
+    # The part of [lo, hi] where c0 + c1 * (t - t0) >= 0, or None
+    if c1 == 0:
+        return (lo, hi) if c0 >= 0 else None
+    root = t0 - c0 / c1
+    if c1 > 0:
+        lo = max(lo, root)
+    else:
+        hi = min(hi, root)
+    return (lo, hi) if lo <= hi else None
+
+
+def blocked(obstacles, arena, x, y, radius, fire_time, flight, geometry=None):
+    # Whether a shot from (x, y) fired fire_time from now hits any obstacle in its
+    # first `flight` seconds. Each obstacle is folded forward to the moment of
+    # firing, and its path is split at its wall bounces into straight pieces.
+    # geometry is the game's fixed level geometry (a BVH), which only needs
+    # looking at along the shot's column.
+    if geometry:
+        top = y + SHOT_SPEED * flight + radius
+        for body in geometry.query(x - radius, y - radius, x + radius, top):
+            if sweep_circle(x, y, radius, 0, SHOT_SPEED, body, flight) is not None:
+                return True
+    for obstacle in obstacles:
+        hw = obstacle.width / 2
+        hh = obstacle.height / 2
+        bx, vx = fold(obstacle.x, obstacle.vx, fire_time, -arena.width + hw, arena.width - hw)
+        by, vy = fold(obstacle.y, obstacle.vy, fire_time, -arena.height + hh, arena.height - hh)
+        t = 0.0
+        for _ in range(8):  # A second or so of flight crosses a wall once or twice at most
+            to_x = time_to_wall(bx, vx, -arena.width + hw, arena.width - hw)
+            to_y = time_to_wall(by, vy, -arena.height + hh, arena.height - hh)
+            piece = min(flight - t, to_x, to_y)
+            moved = _Moved(obstacle, bx, by, vx, vy)
+            if sweep_circle(x, y + SHOT_SPEED * t, radius, 0, SHOT_SPEED, moved, piece) is not None:
+                return True
+            t += piece
+            if t >= flight:
+                break
+            bx += vx * piece
+            by += vy * piece
+            if piece == to_x:
+                vx = -vx
+            if piece == to_y:
+                vy = -vy
+    return False
+
+
+def solve(target, arena, paddle_x, launch_y, shooter_size, paddle_width=100, obstacles=(),
+          paddle_speed=PADDLE_SPEED, paddle_step=PADDLE_STEP, horizon=10.0, start=0.0, geometry=None):
+    # Earliest way to hit target (anything with x, y, vx, vy and size) with a shot
+    # from a paddle now at paddle_x that moves paddle_step at a time at up to
+    # paddle_speed. launch_y is where CatchAndShootGame.shoot puts the shot. Only
+    # hits at least `start` seconds from now and within horizon seconds are
+    # considered. A shot blocked by an obstacle, or by the level geometry (a BVH
+    # of Polygons), does not count. Returns an Intercept, or None if there is no
+    # clear shot.
+    s = target.size
+    x_lo, x_hi = -arena.width + s, arena.width - s
+    y_lo, y_hi = -arena.height + s, arena.height - s
+    reach = s + shooter_size  # Centres this close together count as a hit
+
+    # Paddle positions the keys can reach, and how far from one the target may be
+    steps_left = math.floor((paddle_x - (-arena.width + paddle_width / 2)) / paddle_step + 1e-9)
+    steps_right = math.floor((arena.width - paddle_width / 2 - paddle_x) / paddle_step + 1e-9)
+    column_lo = paddle_x - steps_left * paddle_step
+    column_hi = paddle_x + steps_right * paddle_step
+    slack = min(reach / 2, paddle_step / 2)
+
+    t = start
+    retries = 0
+    for _ in range(MAX_SEGMENTS):
+        if t > horizon:
+            return None
+        x, _ = fold(target.x, target.vx, t, x_lo, x_hi)
+        y, _ = fold(target.y, target.vy, t, y_lo, y_hi)
+        # Direction of travel on this piece; at a bounce, fold() at t would give the
+        # direction before it
+        _, vx = fold(target.x, target.vx, t + 1e-6, x_lo, x_hi)
+        _, vy = fold(target.y, target.vy, t + 1e-6, y_lo, y_hi)
+
+        # The piece ends at the next bounce, or where the target enters or leaves the
+        # band of x the paddle can already hit from where it is
+        end = t + min(time_to_wall(x, vx, x_lo, x_hi), time_to_wall(y, vy, y_lo, y_hi), horizon - t)
+        for edge in (paddle_x - slack, paddle_x + slack):
+            if (edge - x) * vx > 0:
+                end = min(end, t + (edge - x) / vx)
+        offset = x + vx * (end - t) / 2 - paddle_x
+        side = 0 if abs(offset) <= slack else (1 if offset > 0 else -1)
+
+        # Earliest time on [t, end] that is hittable. For a hit at time h the shot
+        # must be fired at h - (Y(h) - launch_y) / SHOT_SPEED, late enough for the
+        # paddle to get within slack of X(h). Every condition is linear in h on this
+        # piece.
+        window = (t, end)
+        conditions = (
+            # The target is above the launch point, and below where the shot would
+            # bounce off the ceiling
+            (y - launch_y, vy),
+            (arena.height - shooter_size - y, -vy),
+            # A paddle position is close enough to X(h)
+            (x - (column_lo - slack), vx),
+            ((column_hi + slack) - x, -vx),
+            # Firing time minus the time to walk the paddle over
+            (t - (y - launch_y) / SHOT_SPEED - max(0.0, side * (x - paddle_x) - slack) / paddle_speed,
+             1 - vy / SHOT_SPEED - side * vx / paddle_speed),
+        )
+        for c0, c1 in conditions:
+            window = _linear_range(c0, c1, t, *window) if window is not None else None
+        if window is None:
+            t = max(end, t + 1e-9)
+            continue
+
+        hit = window[0]
+        hx = x + vx * (hit - t)
+        hy = y + vy * (hit - t)
+        # The paddle position nearest to where it is now that is within slack of hx
+        steps = math.ceil((abs(hx - paddle_x) - slack) / paddle_step - 1e-9)
+        column = paddle_x + paddle_step * max(0, steps) * (1 if hx > paddle_x else -1)
+        column = min(max(column, column_lo), column_hi)
+        fire = hit - (hy - launch_y) / SHOT_SPEED
+        late = abs(column - paddle_x) / paddle_speed - fire
+        if late > 1e-9:
+            # The paddle moves in whole steps, so can take a little longer; look later
+            retries += 1
+            if retries > MAX_RETRIES:
+                return None
+            t = hit + late
+            continue
+        if blocked(obstacles, arena, column, launch_y, shooter_size, fire, hit - fire, geometry):
+            retries += 1
+            if retries > MAX_RETRIES:
+                return None
+            t = hit + RETRY_STEP
+            continue
+        return Intercept(column, fire, hit, hx, hy)
+    return None
+
+
+def solve_for_game(game, paddle_speed=PADDLE_SPEED, horizon=10.0):
+    # solve() for the current state of a CatchAndShootGame. None while the shot is
+    # already in the air.
+    if not game.shooter_ready:
+        return None
+    paddle = game.my_paddle
+    launch_y = paddle.y + paddle.height + game.shooter.size
+    return solve(game.target, game.arena, paddle.x, launch_y, game.shooter.size, paddle.width,
+                 game.obstacles, paddle_speed, PADDLE_STEP, horizon, geometry=game.geometry)
@@ -0,0 +1,155 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from evaluate import InterceptPlayer
+from run_ball import SNAPSHOT_OBSTACLES, CatchAndShootGame, level_class
+from streams import LAYOUT, Stream
+from world import Arena
+
+# Level layouts made ahead of time. A layout is where the target starts and how it
+# moves, and where every obstacle is, for one level of one game. It comes from a
+# layout stream of its own (streams.py), keyed by the game's seed, the level
+# number and the attempt, so
+# it is the same whether it was made in the background or on the spot, and
+# replays reproduce it.
+#
+# Each candidate layout is played headless by the intercept bot (evaluate.py)
+# from the start of the level. If the bot cannot clear it in time, for example
+# because the obstacles keep blocking every shot, the layout is thrown away and
+# another one drawn.
+#
+# A game's config turns this on with a "levels" section, e.g.
+# {"levels": {"last": 6, "checks": 2, "attempts": 8}}: play up to Level6, and try
+# up to 8 candidates per level, each in 2 test games.
+
+CHECKS = 2  # Test games per candidate, with different respawns; all must clear it
+ATTEMPTS = 8  # Candidates tried before settling for the best one
+
+
+class Layout:
+    def __init__(self, number, target, obstacles, attempt=0):
+        self.number = number
+        self.target = target  # x, y, vx, vy, size
+        self.obstacles = obstacles  # (width, height, x, y, vx, vy) for each
+        self.attempt = attempt  # Candidates thrown away before this one
+        self.valid = False  # Whether the bot cleared it in every test game
+        self.clear_times = []  # Seconds the bot took in each test game that it cleared
+
+    def __str__(self):
+        return (f"Level{self.number} layout, attempt {self.attempt}, {len(self.obstacles)} obstacles, "
+                f"{'valid' if self.valid else 'not valid'}")
+
+
+def _test_config(config):
+    # The game's config without its "levels" section, so test games stop after the
+    # level they test and do not plan levels of their own
+    return {name: value for name, value in config.items() if name != "levels"}
+
+
+def generate(level, obstacle_count, arena_size, rng):
+    # One candidate layout for `level` with obstacle_count obstacles, at most
+    # SNAPSHOT_OBSTACLES. The target is placed as configure_target() does.
+    width, height = arena_size
+    size = level.target_size * width
+    vx = rng.uniform(-level.target_speed, level.target_speed)
+    vy = rng.uniform(-level.target_speed, level.target_speed)
+    target = (rng.randint(-width // 2, width // 2), rng.randint(0, height // 2), vx, vy, size)
+
+    obstacles = []
+    for _ in range(min(obstacle_count, SNAPSHOT_OBSTACLES)):
+        x = rng.randint(-width // 2 + 50, width // 2 - 50)
+        y = rng.randint(-height // 2 + 20, height // 2 - 20)
+        obstacles.append((50, 20, x, y, rng.choice([-level.obstacle_vx, level.obstacle_vx]),
+                          rng.choice([-level.obstacle_vy, level.obstacle_vy])))
+    return Layout(level.number, target, obstacles)
+
+
+def check(layout, config, arena_size, seed):
+    # Play the layout with the intercept bot. Returns the seconds it took to clear
+    # the level, or None if it ran out of time or lives.
+    game = CatchAndShootGame(seed=seed, config=_test_config(config), arena=Arena(*arena_size))
+    game.start_level(layout.number, layout)
+    player = InterceptPlayer(seed)
+    ticks = int(game.level_timer * game.physics_hz)  # The first timeout costs a life; count it a fail
+    while game.tick_count < ticks and not game.game_over:
+        action = player.decide(game)
+        if action is not None:
+            game.queue_input(action)
+        game.tick()
+        if game.current_level.number != layout.number:
+            break
+    if game.won or game.current_level.number != layout.number:
+        return game.tick_count * game.physics_dt
+    return None
+
+
+def plan_level(seed, config, arena_size, number, checks=CHECKS, attempts=ATTEMPTS):
+    # The layout for level `number` of the game with this seed and config: the
+    # first candidate the bot clears every time, or failing that the one it
+    # cleared most often. The level has as many obstacles as a game reaching it
+    # would have gathered on the way.
+    game = CatchAndShootGame(seed=0, config=_test_config(config), arena=Arena(*arena_size))
+    levels = [level_class(n)(game) for n in range(1, number + 1)]  # Parameters, with config overrides
+    level = levels[-1]
+    obstacle_count = sum(each.new_obstacles for each in levels)
+    best = None
+    for attempt in range(attempts):
+        rng = Stream(seed, LAYOUT, number, attempt)
+        layout = generate(level, obstacle_count, arena_size, rng)
+        layout.attempt = attempt
+        for k in range(checks):
+            seconds = check(layout, config, arena_size, rng.randint(0, 2**32 - 1))
+            if seconds is not None:
+                layout.clear_times.append(seconds)
+        if len(layout.clear_times) == checks:
+            layout.valid = True
+            return layout
+        if best is None or len(layout.clear_times) > len(best.clear_times):
+            best = layout
+    return best
+
+
+class LevelPlanner:
+    # Layouts for the levels of one game, made before they are needed and kept.
+    # With background=True they are made in a worker process, so the game loop
+    # does not wait for them; prepare() asks for one, layout() collects it and
+    # only blocks if it is not ready yet. Without a worker, layout() makes it there
+    # and then.
+    def __init__(self, seed, config, arena_size, background=True):
+        self.seed = seed
+        self.config = config
+        self.arena_size = arena_size
+        settings = config.get("levels", {})
+        self.checks = settings.get("checks", CHECKS)
+        self.attempts = settings.get("attempts", ATTEMPTS)
+        self.executor = None
+        if background:
+            # Spawned rather than forked, so the worker shares nothing with Tk
+            self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        self.pending = {}  # (number, arena size) -> Future
+        self.layouts = {}  # (number, arena size) -> Layout
+
+    def prepare(self, number, arena_size=None):
+        key = (number, arena_size or self.arena_size)
+        if self.executor is None or key in self.layouts or key in self.pending:
+            return
+        self.pending[key] = self.executor.submit(plan_level, self.seed, self.config, key[1], number,
+                                                 self.checks, self.attempts)
+
+    def layout(self, number, arena_size=None):
+        key = (number, arena_size or self.arena_size)
+        layout = self.layouts.get(key)
+        if layout is None:
+            future = self.pending.pop(key, None)
+            if future is not None:
+                layout = future.result()
+            else:
+                layout = plan_level(self.seed, self.config, key[1], number, self.checks, self.attempts)
+            self.layouts[key] = layout
+        return layout
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.pending.clear()
@@ -0,0 +1,168 @@
+import argparse
+import asyncio
+import errno
+import json
+import random
+import time
+
+from server import LatencyStats, ACTIONS
+
+# Load generator for server.py. Opens many concurrent client connections from one
+# process; each presses a random key every so often and rebuilds the game state
+# from the server's delta updates. Round trip time is measured from sending an
+# input to receiving the first update that acknowledges it.
+#
+# A fraction of the clients can be made slow readers, which exercise the
+# server's back-pressure: they only read one line every slow_delay seconds, and
+# keep a small stream buffer so the backlog stays in the socket.
+
+
+class LoadStats:
+    def __init__(self):
+        self.rtt = LatencyStats(window=100000)
+        self.slow_rtt = LatencyStats(window=100000)  # Slow readers lag by design, so kept apart
+        self.updates = 0
+        self.bytes = 0
+        self.games = 0
+        self.finished = 0
+        self.errors = 0
+        self.error_kinds = {}  # Exception name -> count
+        self.connected = 0
+        self.skipped = 0  # Server-side skipped updates, from each session's final stats
+
+    def error(self, exception):
+        self.errors += 1
+        name = type(exception).__name__
+        if isinstance(exception, OSError) and exception.errno:
+            name += " " + errno.errorcode.get(exception.errno, str(exception.errno))
+        self.error_kinds[name] = self.error_kinds.get(name, 0) + 1
+
+
+async def client(stats, host, port, unix, deadline, input_interval, slow_delay, rng):
+    limit = 1024 if slow_delay else 2**16
+    while time.perf_counter() < deadline:
+        try:
+            if unix:
+                reader, writer = await asyncio.open_unix_connection(unix, limit=limit)
+            else:
+                reader, writer = await asyncio.open_connection(host, port, limit=limit)
+        except OSError as e:
+            stats.error(e)
+            await asyncio.sleep(0.5 + rng.random())
+            continue
+        stats.connected += 1
+        stats.games += 1
+        try:
+            await asyncio.wait_for(play(stats, reader, writer, deadline, input_interval, slow_delay, rng),
+                                   deadline - time.perf_counter() + 10.0)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+            stats.error(e)
+        finally:
+            stats.connected -= 1
+            writer.close()
+
+
+async def play(stats, reader, writer, deadline, input_interval, slow_delay, rng):
+    rtt = stats.slow_rtt if slow_delay else stats.rtt
+    state = {}
+    sent = {}  # seq -> time sent, for inputs not yet acknowledged
+    presser = asyncio.create_task(press_keys(writer, sent, deadline, input_interval, rng))
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            received = time.perf_counter()
+            message = json.loads(line)
+            if "stats" in message:
+                stats.skipped += message["stats"]["skipped"]
+                return
+            stats.updates += 1
+            stats.bytes += len(line)
+            state.update(message)
+            ack = message.get("ack", -1)
+            if sent and min(sent) <= ack:
+                for seq in [seq for seq in sent if seq <= ack]:
+                    rtt.add(received - sent.pop(seq))
+            if message.get("over"):
+                stats.finished += 1
+                return
+            if slow_delay and received < deadline:
+                await asyncio.sleep(slow_delay)
+    finally:
+        presser.cancel()
+
+
+async def press_keys(writer, sent, deadline, input_interval, rng):
+    # Sends inputs until the deadline, then asks for the session's stats; play()
+    # returns when they arrive
+    seq = 0
+    while True:
+        delay = input_interval * (0.5 + rng.random())
+        now = time.perf_counter()
+        if now + delay >= deadline:
+            await asyncio.sleep(max(0.0, deadline - now))
+            writer.write(b"stats\n")
+            return
+        await asyncio.sleep(delay)
+        sent[seq] = time.perf_counter()
+        writer.write(f"{seq} {rng.choice(ACTIONS)}\n".encode())
+        seq += 1
+
+
+async def report(stats, interval):
+    last_updates = 0
+    while True:
+        await asyncio.sleep(interval)
+        rtt = stats.rtt.summary()
+        rate = (stats.updates - last_updates) / interval
+        last_updates = stats.updates
+        print(f"connected {stats.connected:6d}  updates/s {rate:9.0f}  rtt p50 {rtt['p50']:6.1f} ms  "
+              f"p99 {rtt['p99']:6.1f} ms  errors {stats.errors}", flush=True)
+
+
+async def run(args):
+    stats = LoadStats()
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    deadline = start + args.duration
+    reporter = asyncio.create_task(report(stats, args.report)) if args.report else None
+    tasks = []
+    for i in range(args.clients):
+        slow = args.slow_delay if rng.random() < args.slow else 0.0
+        tasks.append(asyncio.create_task(client(stats, args.host, args.port, args.unix, deadline,
+                                                args.input_interval, slow, random.Random(rng.random()))))
+        if i % 100 == 99:
+            await asyncio.sleep(0.05)  # Ramp up rather than flooding the listen backlog
+    await asyncio.gather(*tasks)
+    if reporter is not None:
+        reporter.cancel()
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.clients} clients for {elapsed:.1f} s: {stats.games} games, {stats.finished} finished, "
+          f"{stats.errors} errors {stats.error_kinds or ''}")
+    print(f"updates {stats.updates} ({stats.updates / elapsed:.0f}/s, "
+          f"{stats.bytes / max(1, stats.updates):.1f} bytes each), skipped by server {stats.skipped}")
+    for name, rtt in (("input round trip", stats.rtt.summary()), ("slow readers", stats.slow_rtt.summary())):
+        if rtt["count"]:
+            print(f"{name}: p50 {rtt['p50']:.1f} ms  p95 {rtt['p95']:.1f} ms  p99 {rtt['p99']:.1f} ms "
+                  f"over {rtt['count']} inputs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many clients of server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="connect to a Unix socket instead of TCP")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--input-interval", type=float, default=0.5, help="mean seconds between key presses")
+    parser.add_argument("--slow", type=float, default=0.0, help="fraction of clients that read slowly")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="seconds a slow client waits per line")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--report", type=float, default=5.0, help="seconds between progress lines (0 for none)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,43 @@
+from world import DEFAULT_ARENA
+
+SPEED = 400  # Pixels per second while an arrow key is held
+
+
 class Paddle:
-    def __init__(self, width, height, color, my_turtle):
+    # Position is kept as two plain fields; location reads and writes them as an
+    # (x, y) pair for older callers
+    __slots__ = ("width", "height", "x", "y", "vx", "color", "count", "arena")
+
+    def __init__(self, width, height, color, arena=None):
         self.width = width
         self.height = height
-        self.location = [0, 0]
+        self.x = 0
+        self.y = 0
+        self.vx = 0.0
         self.color = color
-        self.my_turtle = my_turtle
-        self.my_turtle.penup()
-        self.my_turtle.setheading(0)
-        self.my_turtle.hideturtle()
+        self.count = 0
+        self.arena = arena if arena is not None else DEFAULT_ARENA
+
+    @property
+    def location(self):
+        return (self.x, self.y)
+
+    @location.setter
+    def location(self, location):
+        self.x, self.y = location
 
     def set_location(self, location):
-        self.location = location
-        self.my_turtle.goto(self.location[0], self.location[1])
-
-    def draw(self):
-        self.my_turtle.color(self.color)
-        self.my_turtle.goto(self.location[0], self.location[1] - self.height/2)
-        self.my_turtle.forward(self.width/2)
-        self.my_turtle.pendown()
-        self.my_turtle.begin_fill()
-        for _ in range(2):
-            self.my_turtle.left(90)
-            self.my_turtle.forward(self.height)
-            self.my_turtle.left(90)
-            self.my_turtle.forward(self.width)
-        self.my_turtle.end_fill()
-        self.my_turtle.penup()
-        self.my_turtle.goto(self.location[0], self.location[1])
-
-    def clear(self):
-        self.my_turtle.clear()
+        self.x, self.y = location
+
+    def can_move(self, dx):
+        # Whether the paddle can slide by dx and stay inside the side walls
+        x = self.x + dx
+        return -self.arena.width <= x - self.width / 2 and x + self.width / 2 <= self.arena.width
+
+    def move(self, dt):
+        # Slide at vx for dt seconds, stopping at the side walls
+        half = self.width / 2
+        self.x = min(max(self.x + self.vx * dt, -self.arena.width + half), self.arena.width - half)
 
     def __str__(self):
         return "paddle"
@@ -0,0 +1,372 @@
+import argparse
+import math
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from ball_array import bounce_off_walls, move, resolve_collisions
+
+# Multi-core physics for stress scenes with tens of thousands of balls and
+# obstacles. The scene lives in one shared memory block as NumPy columns, and a
+# pool of worker processes advances it in lockstep:
+#
+#   - The arena is cut into vertical strips, one per worker, with boundaries at
+#     quantiles of the balls' x so each strip holds about as many balls.
+#   - Each tick a worker copies out the balls and obstacles in its strip plus a
+#     ghost border wide enough to hold everything that can reach the strip during
+#     the tick, and advances that copy with the same functions as
+#     SharedScene.step() uses on the whole scene.
+#   - A barrier, then each worker writes back only the rows it owns (those whose
+#     x was inside its strip at the start of the tick), then another barrier.
+#
+# Ghost rows are advanced by every worker that sees them, the same way each time,
+# so every ball and obstacle ends the tick exactly as the single-process step
+# leaves it, to the last bit.
+
+BALL_COLUMNS = (("x", np.float64), ("y", np.float64), ("vx", np.float64), ("vy", np.float64),
+                ("size", np.float64), ("mass", np.float64), ("count", np.int64), ("bounce_bottom", np.bool_))
+OBSTACLE_COLUMNS = (("x", np.float64), ("y", np.float64), ("vx", np.float64), ("vy", np.float64),
+                    ("width", np.float64), ("height", np.float64))
+AREA_PER_ENTITY = 2500  # Square pixels of arena per ball or obstacle in random scenes
+
+
+def _layout(balls, obstacles):
+    # Byte offset of every column in the shared block, 8-byte aligned
+    offsets = {}
+    offset = 0
+    for prefix, columns, n in (("ball_", BALL_COLUMNS, balls), ("obstacle_", OBSTACLE_COLUMNS, obstacles)):
+        for name, dtype in columns:
+            offsets[prefix + name] = (offset, dtype, n)
+            offset += -(-n * np.dtype(dtype).itemsize // 8) * 8
+    return offsets, max(offset, 8)
+
+
+def move_obstacles(x, y, vx, vy, width, height, dt, arena_width, arena_height):
+    # Move the obstacles and turn back those past a wall and still heading out
+    x += vx * dt
+    y += vy * dt
+    hit = ((x - width / 2 <= -arena_width) & (vx < 0)) | ((x + width / 2 >= arena_width) & (vx > 0))
+    vx[hit] = -vx[hit]
+    hit = ((y - height / 2 <= -arena_height) & (vy < 0)) | ((y + height / 2 >= arena_height) & (vy > 0))
+    vy[hit] = -vy[hit]
+
+
+def bounce_off_obstacles(balls, obstacles):
+    # Vectorized Ball.bounce_off_obstacle for every ball touching an obstacle and
+    # moving into it (relative to the obstacle). A ball touching several bounces off
+    # the one with the lowest index. Returns the number of bounces.
+    bx, by, bvx, bvy, size = balls["x"], balls["y"], balls["vx"], balls["vy"], balls["size"]
+    ox, oy, ovx, ovy = obstacles["x"], obstacles["y"], obstacles["vx"], obstacles["vy"]
+    hw = obstacles["width"] / 2
+    hh = obstacles["height"] / 2
+    if not len(bx) or not len(ox):
+        return 0
+
+    # Sweep along x: obstacles sorted by centre, each ball checked against those
+    # whose centre is within its radius plus the widest half-width
+    order = np.argsort(ox, kind="stable")
+    xs = ox[order]
+    reach = size.max() + hw.max()
+    first = np.searchsorted(xs, bx - reach, side="left")
+    last = np.searchsorted(xs, bx + reach, side="right")
+    ball_ids = []
+    obstacle_ids = []
+    b = np.flatnonzero(last > first)
+    k = 0
+    while len(b):
+        o = order[first[b] + k]
+        # Bounding boxes overlap
+        r = size[b]
+        close = (np.abs(bx[b] - ox[o]) <= r + hw[o]) & (np.abs(by[b] - oy[o]) <= r + hh[o])
+        ball_ids.append(b[close])
+        obstacle_ids.append(o[close])
+        k += 1
+        b = b[first[b] + k < last[b]]
+    if not ball_ids:
+        return 0
+    b = np.concatenate(ball_ids)
+    o = np.concatenate(obstacle_ids)
+
+    # collision.box_normal, for every candidate pair at once
+    px = bx[b] - ox[o]
+    py = by[b] - oy[o]
+    cx = np.clip(px, -hw[o], hw[o])
+    cy = np.clip(py, -hh[o], hh[o])
+    gx = px - cx
+    gy = py - cy
+    r = size[b]
+    touching = gx * gx + gy * gy <= r * r
+    b, o, px, py, gx, gy = b[touching], o[touching], px[touching], py[touching], gx[touching], gy[touching]
+    inside = (gx == 0) & (gy == 0)
+    length = np.hypot(gx, gy)
+    length[inside] = 1
+    face_x = hw[o] - np.abs(px) < hh[o] - np.abs(py)
+    nx = np.where(inside, np.where(face_x, np.where(px >= 0, 1.0, -1.0), 0.0), gx / length)
+    ny = np.where(inside, np.where(face_x, 0.0, np.where(py >= 0, 1.0, -1.0)), gy / length)
+
+    # collision.reflect, for the first obstacle each ball is moving into
+    dot = (bvx[b] - ovx[o]) * nx + (bvy[b] - ovy[o]) * ny
+    into = dot < 0
+    b, o, nx, ny, dot = b[into], o[into], nx[into], ny[into], dot[into]
+    order = np.lexsort((o, b))
+    b, nx, ny, dot = b[order], nx[order], ny[order], dot[order]
+    keep = np.ones(len(b), dtype=np.bool_)
+    keep[1:] = b[1:] != b[:-1]
+    b, nx, ny, dot = b[keep], nx[keep], ny[keep], dot[keep]
+    bvx[b] -= 2 * dot * nx
+    bvy[b] -= 2 * dot * ny
+    balls["count"][b] += 1
+    return len(b)
+
+
+def advance(balls, obstacles, dt, arena_width, arena_height):
+    # One tick of the stress scene on dicts of columns, in place: obstacles move,
+    # balls move and bounce off the walls, then off the obstacles, then off each other
+    move_obstacles(obstacles["x"], obstacles["y"], obstacles["vx"], obstacles["vy"],
+                   obstacles["width"], obstacles["height"], dt, arena_width, arena_height)
+    move(balls["x"], balls["y"], balls["vx"], balls["vy"], dt)
+    bounce_off_walls(balls["x"], balls["y"], balls["vx"], balls["vy"], balls["size"], balls["count"],
+                     balls["bounce_bottom"], arena_width, arena_height)
+    bounce_off_obstacles(balls, obstacles)
+    resolve_collisions(balls["x"], balls["y"], balls["vx"], balls["vy"], balls["mass"], balls["size"],
+                       balls["count"])
+
+
+class SharedScene:
+    # Balls and obstacles as columns of one multiprocessing.shared_memory block, so
+    # worker processes can work on them in place. scene.balls["x"] and so on are
+    # NumPy views of the block.
+    def __init__(self, balls, obstacles, arena_width, arena_height, name=None):
+        self.n_balls = balls
+        self.n_obstacles = obstacles
+        self.arena_width = arena_width
+        self.arena_height = arena_height
+        offsets, size = _layout(balls, obstacles)
+        self.owner = name is None  # The creator unlinks the block when done
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.balls = {}
+        self.obstacles = {}
+        for key, (offset, dtype, n) in offsets.items():
+            prefix, name = key.split("_", 1)
+            columns = self.balls if prefix == "ball" else self.obstacles
+            columns[name] = np.ndarray(n, dtype=dtype, buffer=self.shm.buf, offset=offset)
+
+    @classmethod
+    def random(cls, balls, obstacles, seed=0, area_per_entity=AREA_PER_ENTITY):
+        # A 4:3 arena with room for everything, balls of radius 2 to 6 and obstacles
+        # 10 to 30 wide, all moving
+        rng = np.random.default_rng(seed)
+        height = math.sqrt(max(1, balls + obstacles) * area_per_entity * 3 / 4) / 2
+        width = height * 4 / 3
+        scene = cls(balls, obstacles, width, height)
+        b = scene.balls
+        b["size"][:] = rng.uniform(2, 6, balls)
+        b["x"][:] = rng.uniform(-width + 6, width - 6, balls)
+        b["y"][:] = rng.uniform(-height + 6, height - 6, balls)
+        b["vx"][:] = rng.uniform(-100, 100, balls)
+        b["vy"][:] = rng.uniform(-100, 100, balls)
+        b["mass"][:] = 100 * b["size"]**2
+        b["count"][:] = 0
+        b["bounce_bottom"][:] = True
+        o = scene.obstacles
+        o["width"][:] = rng.uniform(10, 30, obstacles)
+        o["height"][:] = rng.uniform(4, 12, obstacles)
+        o["x"][:] = rng.uniform(-width + 15, width - 15, obstacles)
+        o["y"][:] = rng.uniform(-height + 6, height - 6, obstacles)
+        o["vx"][:] = rng.choice([-50.0, 50.0], obstacles)
+        o["vy"][:] = rng.choice([-30.0, 30.0], obstacles)
+        return scene
+
+    def step(self, dt):
+        # The single-process path: one tick of the whole scene
+        advance(self.balls, self.obstacles, dt, self.arena_width, self.arena_height)
+
+    def copy_state(self):
+        return ({name: column.copy() for name, column in self.balls.items()},
+                {name: column.copy() for name, column in self.obstacles.items()})
+
+    def same_state(self, other):
+        # Whether two scenes are bit-for-bit identical
+        return all(np.array_equal(a, b) for a, b in zip(self.balls.values(), other.balls.values())) and \
+            all(np.array_equal(a, b) for a, b in zip(self.obstacles.values(), other.obstacles.values()))
+
+    def close(self):
+        self.balls = {}
+        self.obstacles = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Control block shared with the workers: command, ticks to run, dt, then the strip
+# boundaries (workers + 1 of them, the outer two infinite)
+RUN, STOP = 1.0, 2.0
+
+
+class ParallelPhysics:
+    # Advances a SharedScene with a pool of worker processes, one strip each.
+    # run(ticks, dt) returns once every worker has finished the last tick.
+    def __init__(self, scene, workers=None):
+        self.scene = scene
+        self.workers = workers or multiprocessing.cpu_count()
+        self.control_shm = shared_memory.SharedMemory(create=True, size=8 * (4 + self.workers))
+        self.control = np.ndarray(4 + self.workers, dtype=np.float64, buffer=self.control_shm.buf)
+        self.tick_barrier = multiprocessing.Barrier(self.workers)
+        self.run_barrier = multiprocessing.Barrier(self.workers + 1)  # Workers and this process
+        args = (scene.shm.name, scene.n_balls, scene.n_obstacles, scene.arena_width, scene.arena_height,
+                self.control_shm.name, self.workers, self.tick_barrier, self.run_barrier)
+        self.processes = [multiprocessing.Process(target=_worker, args=(k,) + args, daemon=True)
+                          for k in range(self.workers)]
+        for process in self.processes:
+            process.start()
+
+    def balance(self):
+        # Strip boundaries at quantiles of the balls' x
+        x = self.scene.balls["x"]
+        bounds = np.quantile(x, np.arange(1, self.workers) / self.workers) if len(x) else \
+            np.zeros(self.workers - 1)
+        self.control[3] = -math.inf
+        self.control[4:3 + self.workers] = bounds
+        self.control[3 + self.workers] = math.inf
+
+    def run(self, ticks, dt):
+        self.balance()
+        self.control[0] = RUN
+        self.control[1] = ticks
+        self.control[2] = dt
+        self.run_barrier.wait()  # Go
+        self.run_barrier.wait()  # Done
+
+    def close(self):
+        if self.processes:
+            self.control[0] = STOP
+            self.run_barrier.wait()
+            for process in self.processes:
+                process.join()
+            self.processes = []
+        self.control = None
+        self.control_shm.close()
+        self.control_shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _worker(k, name, n_balls, n_obstacles, arena_width, arena_height, control_name, workers,
+            tick_barrier, run_barrier):
+    scene = SharedScene(n_balls, n_obstacles, arena_width, arena_height, name=name)
+    control_shm = shared_memory.SharedMemory(name=control_name)
+    control = np.ndarray(4 + workers, dtype=np.float64, buffer=control_shm.buf)
+    balls = scene.balls
+    obstacles = scene.obstacles
+    # Reach of a ball-ball and a ball-obstacle contact, which never changes
+    ball_reach = 2 * balls["size"].max(initial=0)
+    obstacle_reach = balls["size"].max(initial=0) + obstacles["width"].max(initial=0) / 2
+    try:
+        while True:
+            run_barrier.wait()
+            if control[0] == STOP:
+                return
+            ticks = int(control[1])
+            dt = control[2]
+            lo = control[3 + k]
+            hi = control[4 + k]
+            for _ in range(ticks):
+                _tick(balls, obstacles, lo, hi, dt, ball_reach, obstacle_reach, arena_width, arena_height,
+                      tick_barrier)
+            run_barrier.wait()
+    finally:
+        del balls, obstacles, control
+        scene.close()
+        control_shm.close()
+
+
+def _tick(balls, obstacles, lo, hi, dt, ball_reach, obstacle_reach, arena_width, arena_height, barrier):
+    bx = balls["x"]
+    ox = obstacles["x"]
+    # How far anything can move along x this tick, with a little slack for rounding
+    ball_drift = np.abs(balls["vx"]).max(initial=0) * dt
+    obstacle_drift = np.abs(obstacles["vx"]).max(initial=0) * dt
+    ball_margin = (ball_reach + 2 * ball_drift) * 1.001 + 1e-6
+    obstacle_margin = ball_margin + (obstacle_reach + ball_drift + obstacle_drift) * 1.001 + 1e-6
+
+    # Rows owned by this strip, and the ghosts around them. Ghost balls are balls
+    # that can touch an owned ball; ghost obstacles are those any of them can touch.
+    owned_balls = np.flatnonzero((bx >= lo) & (bx < hi))
+    local_balls = np.flatnonzero((bx >= lo - ball_margin) & (bx < hi + ball_margin))
+    owned_obstacles = np.flatnonzero((ox >= lo) & (ox < hi))
+    local_obstacles = np.flatnonzero((ox >= lo - obstacle_margin) & (ox < hi + obstacle_margin))
+    local_b = {name: column[local_balls] for name, column in balls.items()}
+    local_o = {name: column[local_obstacles] for name, column in obstacles.items()}
+
+    advance(local_b, local_o, dt, arena_width, arena_height)
+    barrier.wait()  # Everyone has read the start-of-tick state
+
+    rows = np.searchsorted(local_balls, owned_balls)
+    for name, column in balls.items():
+        column[owned_balls] = local_b[name][rows]
+    rows = np.searchsorted(local_obstacles, owned_obstacles)
+    for name, column in obstacles.items():
+        column[owned_obstacles] = local_o[name][rows]
+    barrier.wait()  # Everyone has written the end-of-tick state
+
+
+def scaling(balls, obstacles, ticks, worker_counts, seed=0, dt=1 / 120, check=True):
+    # Time `ticks` ticks single-process, then with each worker count, checking the
+    # parallel results against the single-process ones
+    results = []
+    with SharedScene.random(balls, obstacles, seed) as reference:
+        start = time.perf_counter()
+        for _ in range(ticks):
+            reference.step(dt)
+        serial = time.perf_counter() - start
+        results.append({"workers": 0, "seconds": serial, "speedup": 1.0, "identical": True})
+        for workers in worker_counts:
+            with SharedScene.random(balls, obstacles, seed) as scene, ParallelPhysics(scene, workers) as physics:
+                start = time.perf_counter()
+                physics.run(ticks, dt)
+                elapsed = time.perf_counter() - start
+                identical = scene.same_state(reference) if check else None
+            results.append({"workers": workers, "seconds": elapsed, "speedup": serial / elapsed,
+                            "identical": identical})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmark for multi-core stress scene physics")
+    parser.add_argument("--balls", type=int, default=50000)
+    parser.add_argument("--obstacles", type=int, default=10000)
+    parser.add_argument("--ticks", type=int, default=60)
+    parser.add_argument("--workers", default=None,
+                        help="comma-separated worker counts (default: 1, 2, 4, ... up to all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-check", action="store_true", help="skip comparing against the single-process run")
+    args = parser.parse_args()
+    if args.workers:
+        counts = [int(w) for w in args.workers.split(",")]
+    else:
+        cores = multiprocessing.cpu_count()
+        counts = [1 << i for i in range(cores.bit_length()) if 1 << i < cores] + [cores]
+
+    results = scaling(args.balls, args.obstacles, args.ticks, counts, args.seed, check=not args.no_check)
+    print(f"{args.balls} balls, {args.obstacles} obstacles, {args.ticks} ticks")
+    for r in results:
+        label = "single process" if r["workers"] == 0 else f"{r['workers']:3d} workers"
+        same = "" if r["identical"] is None else ("  identical" if r["identical"] else "  DIFFERENT")
+        print(f"{label:15s} {r['seconds'] * 1e3 / args.ticks:9.2f} ms/tick  speedup {r['speedup']:5.2f}{same}")
+    if any(r["identical"] is False for r in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
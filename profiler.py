@@ -0,0 +1,103 @@
+import csv
+import json
+import math
+import time
+from collections import deque
+
+
+class FrameProfiler:
+    # Per-phase frame timing for the game loop. The loop calls begin_frame(), then
+    # mark(phase) after each piece of work, which charges the time since the previous
+    # mark to that phase, and end_frame(). A phase marked several times in a frame
+    # (e.g. physics when a frame runs two ticks) is summed.
+    #
+    # The game only calls into a profiler when one is attached, so a game without
+    # one pays a single `is not None` check per phase.
+    def __init__(self, window=600, overlay=False, overlay_interval=0.5):
+        self.window = window  # Frames kept for the rolling percentiles and export
+        self.frames = deque(maxlen=window)
+        self.phases = []  # Phase names in the order they were first seen
+        self.current = {}
+        self.frame_start = None
+        self.last = None
+        self.frame_count = 0
+
+        self.overlay = overlay  # Draw the summary on screen
+        self.overlay_interval = overlay_interval
+        self.overlay_time = 0.0
+
+    def begin_frame(self):
+        self.frame_start = self.last = time.perf_counter()
+        self.current = {}
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        if self.last is not None:
+            self.current[phase] = self.current.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        self.current["frame"] = time.perf_counter() - self.frame_start
+        for phase in self.current:
+            if phase not in self.phases:
+                self.phases.append(phase)
+        self.frames.append(self.current)
+        self.frame_count += 1
+        self.current = {}
+        self.frame_start = self.last = None
+
+    def samples(self, phase):
+        return [frame.get(phase, 0.0) for frame in self.frames]
+
+    def percentiles(self, phase, points=(50, 95, 99)):
+        # Nearest-rank percentiles over the rolling window, in seconds
+        values = sorted(self.samples(phase))
+        if not values:
+            return {f"p{p}": math.nan for p in points}
+        return {f"p{p}": values[max(0, math.ceil(p / 100 * len(values)) - 1)] for p in points}
+
+    def summary(self):
+        result = {}
+        for phase in self.phases:
+            values = self.samples(phase)
+            stats = self.percentiles(phase)
+            stats["mean"] = sum(values) / len(values) if values else math.nan
+            result[phase] = stats
+        return result
+
+    def overlay_lines(self):
+        # Summary text for the on-screen overlay, or None if it was refreshed too recently
+        now = time.perf_counter()
+        if now - self.overlay_time < self.overlay_interval:
+            return None
+        self.overlay_time = now
+        lines = ["phase         p50    p95    p99 (ms)"]
+        for phase, stats in self.summary().items():
+            lines.append(f"{phase:10s} {stats['p50'] * 1e3:6.2f} {stats['p95'] * 1e3:6.2f} {stats['p99'] * 1e3:6.2f}")
+        return lines
+
+    def export_csv(self, path):
+        # One row per frame in the window, one column per phase, in seconds
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame"] + [f"{phase}_s" for phase in self.phases])
+            first = self.frame_count - len(self.frames)
+            for i, frame in enumerate(self.frames):
+                writer.writerow([first + i] + [frame.get(phase, 0.0) for phase in self.phases])
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "frames": self.frame_count,
+                "window": len(self.frames),
+                "summary": self.summary(),
+                "samples": {phase: self.samples(phase) for phase in self.phases},
+            }, f, indent=2)
+
+    def export(self, path):
+        if path.endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_json(path)
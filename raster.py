@@ -0,0 +1,460 @@
+import numpy as np
+from replay import ReplayPlayer
+from vector_env import OBSTACLE_HEIGHT, OBSTACLE_WIDTH, PADDLE_HEIGHT, PADDLE_WIDTH
+from world import Arena
+
+# Offscreen drawing of the game into NumPy framebuffers, without Tk. Frames are
+# palette-indexed uint8 arrays (one byte per pixel, an index into the renderer's
+# palette) so they can go straight into a GIF; rgb() expands them to RGB.
+
+MARGIN = 10  # Arena units drawn outside the walls, so the border is fully visible
+BORDER_WIDTH = 10  # Same pen size as TurtleRenderer's border
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+GRAY = (128, 128, 128)
+
+# Colors of VectorEnv games, which have no color attributes; same as CatchAndShootGame
+PADDLE_COLOR = (255, 0, 0)
+SHOOTER_COLOR = (255, 0, 0)
+TARGET_COLOR = (0, 255, 0)
+OBSTACLE_COLOR = (0, 0, 255)
+AIM_COLOR = (0, 160, 0)  # Same as TurtleRenderer's aim assist
+
+# 3x5 bitmap font, one string of rows per character. Text is drawn upper-case.
+FONT = {
+    "A": ".#. #.# ### #.# #.#", "B": "##. #.# ##. #.# ##.", "C": ".## #.. #.. #.. .##",
+    "D": "##. #.# #.# #.# ##.", "E": "### #.. ##. #.. ###", "F": "### #.. ##. #.. #..",
+    "G": ".## #.. #.# #.# .##", "H": "#.# #.# ### #.# #.#", "I": "### .#. .#. .#. ###",
+    "J": "..# ..# ..# #.# .#.", "K": "#.# #.# ##. #.# #.#", "L": "#.. #.. #.. #.. ###",
+    "M": "#.# ### ### #.# #.#", "N": "##. #.# #.# #.# #.#", "O": ".#. #.# #.# #.# .#.",
+    "P": "##. #.# ##. #.. #..", "Q": ".#. #.# #.# ##. .##", "R": "##. #.# ##. #.# #.#",
+    "S": ".## #.. .#. ..# ##.", "T": "### .#. .#. .#. .#.", "U": "#.# #.# #.# #.# ###",
+    "V": "#.# #.# #.# #.# .#.", "W": "#.# #.# ### ### #.#", "X": "#.# #.# .#. #.# #.#",
+    "Y": "#.# #.# .#. .#. .#.", "Z": "### ..# .#. #.. ###",
+    "0": "### #.# #.# #.# ###", "1": ".#. ##. .#. .#. ###", "2": "##. ..# .#. #.. ###",
+    "3": "##. ..# .#. ..# ##.", "4": "#.# #.# ### ..# ..#", "5": "### #.. ##. ..# ##.",
+    "6": ".## #.. ### #.# ###", "7": "### ..# .#. .#. .#.", "8": "### #.# ### #.# ###",
+    "9": "### #.# ### ..# ##.", ":": "... .#. ... .#. ...", ".": "... ... ... ... .#.",
+    "-": "... ... ### ... ...", "(": ".#. #.. #.. #.. .#.", ")": ".#. ..# ..# ..# .#.",
+    "/": "..# ..# .#. #.. #..", "%": "#.# ..# .#. #.. #.#", "_": "... ... ... ... ###",
+}
+GLYPHS = {char: np.array([[c == "#" for c in row] for row in rows.split()]) for char, rows in FONT.items()}
+BLANK = np.zeros((5, 3), dtype=np.bool_)
+
+
+class RasterRenderer:
+    # Draws a CatchAndShootGame (or a whole VectorEnv) into NumPy framebuffers. It
+    # has the same interface as TurtleRenderer, so a game can be given one instead.
+    #
+    # The frame and the background with the border baked in are allocated once
+    # and reused; a frame starts as a copy of the background. The background is
+    # only redrawn when the arena is resized.
+    def __init__(self, arena=None, scale=0.5):
+        self.arena = arena if arena is not None else Arena()
+        self.scale = scale
+        self.closed = False
+        self.palette = []  # RGB of each palette index
+        self.color_index = {}
+        for color in (WHITE, BLACK, GRAY, PADDLE_COLOR, TARGET_COLOR, OBSTACLE_COLOR, AIM_COLOR):
+            self.index(color)
+        self.circles = {}  # radius in pixels -> boolean mask
+        self.rings = {}  # Same, one pixel wide outlines
+        self.text_cache = {}  # (text, pixel size) -> boolean mask
+        self.polygon_masks = {}  # (Polygon outline, scale) -> (mask, row offset, column offset)
+        self.overlay_lines = None
+        self.batch = None
+        self.batch_rgb = None
+        self._allocate()
+
+    def _allocate(self):
+        s = self.scale
+        self.width = int(round(2 * (self.arena.width + MARGIN) * s))
+        self.height = int(round(2 * (self.arena.height + MARGIN) * s))
+        self.arena_version = self.arena.version
+        self.background = np.full((self.height, self.width), self.index(WHITE), dtype=np.uint8)
+        self.frame = self.background.copy()
+        self.rgb_frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.batch = None
+        self._draw_border(self.background)
+
+    def index(self, color):
+        # Palette index of an RGB color, adding it if it is new
+        color = tuple(int(c) for c in color)
+        i = self.color_index.get(color)
+        if i is None:
+            if len(self.palette) == 256:
+                raise ValueError("palette is full")
+            i = len(self.palette)
+            self.palette.append(color)
+            self.color_index[color] = i
+            self.palette_array = np.array(self.palette, dtype=np.uint8)
+        return i
+
+    # Arena coordinates (origin in the middle, y up) to pixel columns and rows
+    def _col(self, x):
+        return int(round((x + self.arena.width + MARGIN) * self.scale))
+
+    def _row(self, y):
+        return int(round((self.arena.height + MARGIN - y) * self.scale))
+
+    def _fill(self, buf, x0, y0, x1, y1, c):
+        # Fill the arena-space rectangle with corners (x0, y0) and (x1, y1)
+        buf[max(0, self._row(y1)):max(0, self._row(y0)), max(0, self._col(x0)):max(0, self._col(x1))] = c
+
+    def _blit(self, buf, mask, top, left, c):
+        # Set the pixels of a boolean mask placed with its corner at (top, left)
+        h, w = mask.shape
+        t = max(0, top)
+        l = max(0, left)
+        b = min(buf.shape[0], top + h)
+        r = min(buf.shape[1], left + w)
+        if t < b and l < r:
+            buf[t:b, l:r][mask[t - top:b - top, l - left:r - left]] = c
+
+    def _draw_border(self, buf):
+        w = self.arena.width
+        h = self.arena.height
+        half = BORDER_WIDTH / 2
+        c = self.index(BLACK)
+        self._fill(buf, -w - half, h - half, w + half, h + half, c)
+        self._fill(buf, -w - half, -h - half, w + half, -h + half, c)
+        self._fill(buf, -w - half, -h - half, -w + half, h + half, c)
+        self._fill(buf, w - half, -h - half, w + half, h + half, c)
+
+    def draw_rect(self, buf, x, y, width, height, color):
+        self._fill(buf, x - width / 2, y - height / 2, x + width / 2, y + height / 2, self.index(color))
+
+    def _disk(self, key):
+        mask = self.circles.get(key)
+        if mask is None:
+            reach = int(np.ceil(key))
+            yy, xx = np.ogrid[-reach:reach + 1, -reach:reach + 1]
+            mask = xx * xx + yy * yy <= key * key
+            self.circles[key] = mask
+        return mask
+
+    def draw_circle(self, buf, x, y, radius, color, outline=False):
+        key = round(radius * self.scale * 2) / 2
+        mask = self._disk(key)
+        if outline:
+            ring = self.rings.get(key)
+            if ring is None:
+                inner = self._disk(max(0.0, key - 1))
+                ring = mask.copy()
+                pad = (mask.shape[0] - inner.shape[0]) // 2
+                ring[pad:pad + inner.shape[0], pad:pad + inner.shape[1]] &= ~inner
+                self.rings[key] = ring
+            mask = ring
+        reach = mask.shape[0] // 2
+        self._blit(buf, mask, self._row(y) - reach, self._col(x) - reach, self.index(color))
+
+    def polygon_mask(self, outline):
+        # Boolean mask of the pixels inside a convex outline of points relative to
+        # its position, and where its corner goes relative to that position's pixel.
+        # A pixel counts if its centre is inside or within half a pixel of an edge, so
+        # thin segments still show as unbroken lines.
+        key = (outline, self.scale)
+        entry = self.polygon_masks.get(key)
+        if entry is None:
+            s = self.scale
+            cols = [x * s for x, _ in outline]
+            rows = [-y * s for _, y in outline]  # Rows grow downwards
+            top = int(np.floor(min(rows)))
+            left = int(np.floor(min(cols)))
+            yy, xx = np.ogrid[top:int(np.ceil(max(rows))) + 1, left:int(np.ceil(max(cols))) + 1]
+            mask = np.ones((yy.shape[0], xx.shape[1]), dtype=np.bool_)
+            n = len(outline)
+            for i in range(n):
+                c0, r0 = cols[i], rows[i]
+                c1, r1 = cols[(i + 1) % n], rows[(i + 1) % n]
+                length = np.hypot(c1 - c0, r1 - r0)
+                # Rows run downwards, so the inside of a counter-clockwise outline is
+                # where this cross product is negative
+                mask &= ((c1 - c0) * (yy - r0) - (r1 - r0) * (xx - c0)) / length <= 0.5
+            entry = (mask, top, left)
+            self.polygon_masks[key] = entry
+        return entry
+
+    def draw_polygon(self, buf, x, y, outline, color):
+        mask, top, left = self.polygon_mask(outline)
+        self._blit(buf, mask, self._row(y) + top, self._col(x) + left, self.index(color))
+
+    def text_mask(self, text, pixel):
+        # Boolean mask of text in the bitmap font, each font pixel pixel x pixel big
+        key = (text, pixel)
+        mask = self.text_cache.get(key)
+        if mask is None:
+            glyphs = []
+            for char in text.upper():
+                glyphs.append(GLYPHS.get(char, BLANK))
+                glyphs.append(np.zeros((5, 1), dtype=np.bool_))
+            mask = np.hstack(glyphs) if glyphs else np.zeros((5, 0), dtype=np.bool_)
+            mask = mask.repeat(pixel, axis=0).repeat(pixel, axis=1)
+            if len(self.text_cache) > 256:
+                self.text_cache.clear()
+            self.text_cache[key] = mask
+        return mask
+
+    def draw_text(self, buf, x, y, text, color, size=16):
+        # Like turtle.write: (x, y) is the bottom-left corner of the text
+        pixel = max(1, int(round(size / 5 * self.scale)))
+        mask = self.text_mask(text, pixel)
+        self._blit(buf, mask, self._row(y) - mask.shape[0], self._col(x), self.index(color))
+
+    def _begin(self):
+        if self.arena.version != self.arena_version:
+            self._allocate()
+
+    def draw(self, game, alpha=1.0):
+        # Draw the game's current state into self.frame
+        self._begin()
+        buf = self.frame
+        np.copyto(buf, self.background)
+        paddle = game.my_paddle
+        self.draw_rect(buf, paddle.x, paddle.y, paddle.width, paddle.height, paddle.color)
+        for b in game.world.balls():
+            x, y = game.render_position(b, alpha)
+            self.draw_circle(buf, x, y, b.size, b.color)
+        for obstacle in game.obstacles:
+            x, y = game.render_position(obstacle, alpha)
+            self.draw_rect(buf, x, y, obstacle.width, obstacle.height, obstacle.color)
+        for polygon in game.geometry.items:
+            self.draw_polygon(buf, polygon.x, polygon.y, polygon.outline, polygon.color)
+        self.draw_hud(buf, game.lives, game.level_score, game.level_timer)
+        if self.overlay_lines is not None:
+            self._draw_overlay(buf)
+        return buf
+
+    def draw_hud(self, buf, lives, score, level_timer):
+        w = self.arena.width
+        h = self.arena.height
+        self.draw_text(buf, -w + 45, h - 30, f"Lives: {lives}  Score: {score}", BLACK)
+        self.draw_text(buf, -w + 45, h - 60, f"Time: {int(level_timer)}s", BLACK)
+        if level_timer > 30:
+            self.draw_text(buf, -w + 45, h - 90, f"Bonus Time: {int(level_timer - 30)}s", BLACK)
+
+    def draw_overlay(self, lines):
+        # Kept and drawn on every following frame, as the turtle overlay stays on screen
+        self.overlay_lines = lines
+
+    def _draw_overlay(self, buf):
+        for i, line in enumerate(self.overlay_lines):
+            self.draw_text(buf, self.arena.width - 260, self.arena.height - 25 - 14 * i, line, GRAY, size=10)
+
+    def draw_aim(self, game, plan):
+        # Aim assist, drawn straight onto the frame draw() just made
+        if plan is None:
+            return
+        buf = self.frame
+        paddle = game.my_paddle
+        bottom = paddle.y + paddle.height
+        self._fill(buf, plan.paddle_x - 1, bottom, plan.paddle_x + 1, max(bottom, plan.y), self.index(AIM_COLOR))
+        size = game.target.size
+        self.draw_circle(buf, plan.x, plan.y, size, AIM_COLOR, outline=True)
+        self.draw_text(buf, plan.x + size + 5, plan.y, plan.label(), AIM_COLOR, size=10)
+
+    def draw_batch(self, env, hud=False):
+        # Draw every game of a VectorEnv into one (num_envs, height, width) indexed
+        # buffer, which is reused between calls
+        self._begin()
+        n = env.num_envs
+        if self.batch is None or self.batch.shape[0] != n:
+            self.batch = np.empty((n, self.height, self.width), dtype=np.uint8)
+        paddle_y = env._paddle_y()
+        for i in range(n):
+            buf = self.batch[i]
+            np.copyto(buf, self.background)
+            self.draw_rect(buf, env.paddle_x[i], paddle_y, PADDLE_WIDTH, PADDLE_HEIGHT, PADDLE_COLOR)
+            self.draw_circle(buf, env.shooter_x[i], env.shooter_y[i], env.shooter_size[i], SHOOTER_COLOR)
+            self.draw_circle(buf, env.target_x[i], env.target_y[i], env.target_radius[i], TARGET_COLOR)
+            for k in range(env.obstacle_count[i]):
+                self.draw_rect(buf, env.obstacle_x[i, k], env.obstacle_y[i, k],
+                               OBSTACLE_WIDTH, OBSTACLE_HEIGHT, OBSTACLE_COLOR)
+            if hud:
+                self.draw_hud(buf, env.lives[i], env.level_score[i], env.level_timer[i])
+        return self.batch
+
+    def rgb(self, indexed=None, out=None):
+        # Expand an indexed frame (by default the last one drawn) to RGB. The frame
+        # and the batch each expand into their own reused buffer.
+        if indexed is None:
+            indexed = self.frame
+        if out is None:
+            if indexed is self.frame:
+                out = self.rgb_frame
+            elif indexed is self.batch:
+                if self.batch_rgb is None or self.batch_rgb.shape[:3] != indexed.shape:
+                    self.batch_rgb = np.empty(indexed.shape + (3,), dtype=np.uint8)
+                out = self.batch_rgb
+        return np.take(self.palette_array, indexed, axis=0, out=out)
+
+    def bind_keys(self, game):
+        pass  # No window, no keyboard
+
+    def update(self):
+        pass
+
+    def poll_events(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def _lzw(pixels, bits):
+    # GIF image data: variable-width LZW codes, packed LSB first into sub-blocks of
+    # up to 255 bytes. Frames are mostly flat color, so they shrink a lot.
+    clear = 1 << bits
+    end = clear + 1
+    width = bits + 1
+    table = {}
+    get = table.get
+    next_code = end + 1
+    data = bytearray()
+    acc = clear  # Bits not yet written, starting with a clear code
+    count = width
+    it = iter(pixels.tobytes())
+    code = next(it)
+    for c in it:
+        key = code << 8 | c
+        found = get(key)
+        if found is not None:
+            code = found
+            continue
+        acc |= code << count
+        count += width
+        while count >= 8:
+            data.append(acc & 0xFF)
+            acc >>= 8
+            count -= 8
+        if next_code < 4096:
+            table[key] = next_code
+            next_code += 1
+            if next_code > 1 << width and width < 12:
+                width += 1
+        else:
+            # Table full: start over
+            acc |= clear << count
+            count += width
+            while count >= 8:
+                data.append(acc & 0xFF)
+                acc >>= 8
+                count -= 8
+            table.clear()
+            next_code = end + 1
+            width = bits + 1
+        code = c
+    acc |= (code | end << width) << count
+    count += 2 * width
+    while count > 0:
+        data.append(acc & 0xFF)
+        acc >>= 8
+        count -= 8
+
+    out = bytearray([bits])
+    for i in range(0, len(data), 255):
+        block = data[i:i + 255]
+        out.append(len(block))
+        out += block
+    out.append(0)
+    return out
+
+
+class GifWriter:
+    # Animated GIF from indexed frames. Each frame only stores the rectangle that
+    # changed since the previous one, and a frame identical to the previous one
+    # just lengthens it.
+    def __init__(self, path, width, height, fps=30):
+        self.file = open(path, "wb")
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.previous = None
+        self.pending = None  # (image bytes, start time in centiseconds)
+        self.frames = 0
+        self.file.write(b"GIF89a" + np.array([width, height], dtype="<u2").tobytes() + bytes([0, 0, 0]))
+        self.file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")  # Loop forever
+
+    def add_frame(self, indexed, palette):
+        now = round(self.frames * 100 / self.fps)
+        self.frames += 1
+        if self.previous is None:
+            top, left, bottom, right = 0, 0, self.height, self.width
+        else:
+            changed = indexed != self.previous
+            rows = np.flatnonzero(changed.any(axis=1))
+            if not len(rows):
+                return
+            cols = np.flatnonzero(changed.any(axis=0))
+            top, bottom = rows[0], rows[-1] + 1
+            left, right = cols[0], cols[-1] + 1
+        self._flush(now)
+        self.previous = indexed.copy()
+
+        bits = max(2, int(len(palette) - 1).bit_length())
+        table = np.zeros((1 << bits, 3), dtype=np.uint8)
+        table[:len(palette)] = palette
+        image = bytearray(b"\x2c")
+        image += np.array([left, top, right - left, bottom - top], dtype="<u2").tobytes()
+        image.append(0x80 | (bits - 1))  # Local color table
+        image += table.tobytes()
+        image += _lzw(indexed[top:bottom, left:right].ravel(), bits)
+        self.pending = (image, now)
+
+    def _flush(self, now):
+        if self.pending is not None:
+            image, start = self.pending
+            delay = max(1, now - start)
+            # Graphic control: leave the frame in place, delay in centiseconds
+            self.file.write(b"\x21\xf9\x04\x04" + np.array([delay], dtype="<u2").tobytes() + b"\x00\x00")
+            self.file.write(image)
+            self.pending = None
+
+    def close(self):
+        self._flush(round(self.frames * 100 / self.fps))
+        self.file.write(b"\x3b")
+        self.file.close()
+
+
+class RawVideoWriter:
+    # Headerless rgb24 frames, one after another. Convert with e.g.
+    #   ffmpeg -f rawvideo -pix_fmt rgb24 -s WIDTHxHEIGHT -r FPS -i clip.rgb clip.mp4
+    def __init__(self, path, width, height, fps=30):
+        self.file = open(path, "wb")
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.rgb = np.empty((height, width, 3), dtype=np.uint8)
+
+    def add_frame(self, indexed, palette):
+        np.take(palette, indexed, axis=0, out=self.rgb)
+        self.file.write(self.rgb.tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+def export_replay(replay, path, fps=30, scale=0.5, start=0, end=None):
+    # Render a Replay from tick `start` to `end` into a GIF, or raw rgb24 video if
+    # path does not end in .gif, as fast as it can be drawn. Returns the number of
+    # frames written.
+    renderer = RasterRenderer(Arena(*replay.arena_size), scale)
+    player = ReplayPlayer(replay, renderer)
+    game = player.game
+    writer_class = GifWriter if path.lower().endswith(".gif") else RawVideoWriter
+    writer = writer_class(path, renderer.width, renderer.height, fps)
+    end = replay.ticks if end is None else min(end, replay.ticks)
+    frames = 0
+    try:
+        player.seek(start)
+        while True:
+            renderer.draw(game)
+            writer.add_frame(renderer.frame, renderer.palette_array)
+            frames += 1
+            tick = start + round(frames * game.physics_hz / fps)
+            if tick > end or player.finished():
+                break
+            player.advance_to(tick)
+    finally:
+        writer.close()
+    return frames
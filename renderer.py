@@ -0,0 +1,262 @@
+import turtle
+from world import Arena
+
+# turtle's built-in "circle" and "square" shapes are 20 px across before stretching
+SHAPE_SIZE = 20
+HUD_FONT = ("Arial", 16, "bold")
+OVERLAY_FONT = ("Courier", 10, "normal")
+BORDER_MARGIN = 20  # Space kept between the border and the window edge when fitting
+
+
+class TurtleRenderer:
+    # Draws a CatchAndShootGame onto the turtle canvas. The game itself never
+    # imports turtle; the interactive front end plugs one of these in.
+    #
+    # Drawing is retained-mode: every entity gets its own turtle, shaped once and
+    # then only moved with goto. The border is drawn once, the HUD is only rewritten
+    # when its text changes, and the canvas is refreshed by a single update() call
+    # per frame.
+    #
+    # The arena is read from turtle once, here. With fit_window the field follows the
+    # window: a resize callback resizes the arena, which is the only time it changes.
+    def __init__(self, fit_window=False):
+        self.screen = turtle.Screen()
+        turtle.speed(0)
+        turtle.tracer(0, 0)
+        turtle.hideturtle()
+        turtle.colormode(255)
+
+        self.arena = Arena(turtle.screensize()[0], turtle.screensize()[1])
+        self.arena.add_listener(self._on_arena_resize)
+        self.closed = False  # Set once the user closes the window
+
+        self.sprites = {}  # id(entity) -> [entity, turtle, last drawn state]
+        self.polygon_shapes = {}  # Polygon outline -> name of the turtle shape registered for it
+        self.spare = []  # hidden turtles left over from removed entities
+        self.hud_turtle = self._new_turtle()
+        self.hud_text = None
+        self.overlay_turtle = None
+        self.aim_turtle = None
+        self.aim_drawn = None  # What the aim assist shows now, to skip redrawing it
+        self.border_turtle = None
+        self.border_drawn = False
+
+        if fit_window:
+            self.screen.getcanvas().bind("<Configure>", self._on_configure, add="+")
+
+    def _new_turtle(self):
+        if self.spare:
+            pen = self.spare.pop()
+            pen.clear()
+        else:
+            pen = turtle.Turtle()
+            pen.speed(0)
+            pen.penup()
+            pen.setheading(0)
+        pen.hideturtle()
+        return pen
+
+    def bind_keys(self, game):
+        self.screen.listen()
+        # Arrow keys are held: the game moves the paddle each tick one is down
+        self.screen.onkeypress(lambda: game.queue_input("left_down"), "Left")
+        self.screen.onkeyrelease(lambda: game.queue_input("left_up"), "Left")
+        self.screen.onkeypress(lambda: game.queue_input("right_down"), "Right")
+        self.screen.onkeyrelease(lambda: game.queue_input("right_up"), "Right")
+        self.screen.onkey(lambda: game.queue_input("shoot"), "space")
+
+    def _on_configure(self, event):
+        # Tk resize callback: fit the field inside the new window
+        width = max(100, event.width // 2 - BORDER_MARGIN)
+        height = max(100, event.height // 2 - BORDER_MARGIN)
+        self.arena.resize(width, height)
+
+    def _on_arena_resize(self, arena):
+        # Everything placed relative to the walls is drawn again next frame
+        self.border_drawn = False
+        self.hud_text = None
+
+    def draw_border(self):
+        if self.border_turtle is None:
+            self.border_turtle = self._new_turtle()
+        pen = self.border_turtle
+        pen.clear()
+        pen.goto(-self.arena.width, -self.arena.height)
+        pen.pensize(10)
+        pen.pendown()
+        pen.color((0, 0, 0))
+        for _ in range(2):
+            pen.forward(2 * self.arena.width)
+            pen.left(90)
+            pen.forward(2 * self.arena.height)
+            pen.left(90)
+        pen.penup()
+        self.border_drawn = True
+
+    def _sprite(self, entity, shape, width, height, x, y):
+        # Keep one turtle per entity and only touch it when something changed.
+        # shapesize stretches perpendicular to the heading first, so height comes first.
+        sprite = self.sprites.get(id(entity))
+        if sprite is None:
+            pen = self._new_turtle()
+            pen.shape(shape)
+            pen.showturtle()
+            sprite = [entity, pen, None, None, None]
+            self.sprites[id(entity)] = sprite
+        pen = sprite[1]
+        size = (width, height)
+        if sprite[2] != size:
+            pen.shapesize(height / SHAPE_SIZE, width / SHAPE_SIZE)
+            sprite[2] = size
+        if sprite[3] != entity.color:
+            pen.color(entity.color)
+            sprite[3] = entity.color
+        if sprite[4] != (x, y):
+            pen.goto(x, y)
+            sprite[4] = (x, y)
+        return sprite
+
+    def draw_paddle(self, paddle):
+        self._sprite(paddle, "square", paddle.width, paddle.height,
+                     paddle.x, paddle.y)
+
+    def draw_ball(self, ball, x, y):
+        self._sprite(ball, "circle", 2 * ball.size, 2 * ball.size, x, y)
+
+    def draw_obstacle(self, obstacle, x, y):
+        self._sprite(obstacle, "square", obstacle.width, obstacle.height, x, y)
+
+    def draw_polygon(self, polygon, x, y):
+        # Each distinct outline is registered as a turtle shape once; the sprite then
+        # only moves. turtle draws shape point (a, b) at (b, -a) from the turtle
+        # when it heads east, so the outline goes in as (-y, x).
+        name = self.polygon_shapes.get(polygon.outline)
+        if name is None:
+            name = "polygon" + str(len(self.polygon_shapes))
+            self.screen.register_shape(name, tuple((-py, px) for px, py in polygon.outline))
+            self.polygon_shapes[polygon.outline] = name
+        self._sprite(polygon, name, SHAPE_SIZE, SHAPE_SIZE, x, y)
+
+    def draw_hud(self, game):
+        # Rewrite the HUD only when lives, score or the whole-second timer change
+        timer = int(game.level_timer)
+        text = (game.lives, game.level_score, timer)
+        if text == self.hud_text:
+            return
+        self.hud_text = text
+
+        pen = self.hud_turtle
+        pen.clear()
+        pen.color("black")
+        # Display lives and score
+        pen.goto(-self.arena.width + 45, self.arena.height - 30)
+        pen.write(f"Lives: {game.lives}  Score: {game.level_score}", font=HUD_FONT)
+
+        # Display time remaining for the current level
+        pen.goto(-self.arena.width + 45, self.arena.height - 60)
+        pen.write(f"Time: {timer}s", font=HUD_FONT)
+
+        # Display bonus time if level_timer > 30
+        if game.level_timer > 30:
+            pen.goto(-self.arena.width + 45, self.arena.height - 90)
+            pen.write(f"Bonus Time: {int(game.level_timer - 30)}s", font=HUD_FONT)
+
+    def draw_overlay(self, lines):
+        # Profiler timings in the top-right corner
+        if self.overlay_turtle is None:
+            self.overlay_turtle = self._new_turtle()
+        pen = self.overlay_turtle
+        pen.clear()
+        pen.color("gray")
+        for i, line in enumerate(lines):
+            pen.goto(self.arena.width - 260, self.arena.height - 25 - 14 * i)
+            pen.write(line, font=OVERLAY_FONT)
+
+    def draw_aim(self, game, plan):
+        # Aim assist: the paddle position to fire from, where the shot will meet the
+        # target, and when to fire. plan is an intercept.Intercept, or None to clear.
+        if plan is None:
+            shown = None
+        else:
+            label = plan.label()
+            shown = (plan.paddle_x, round(plan.x), round(plan.y), label)
+        if shown == self.aim_drawn:
+            return
+        self.aim_drawn = shown
+        if self.aim_turtle is None:
+            self.aim_turtle = self._new_turtle()
+        pen = self.aim_turtle
+        pen.clear()
+        if plan is None:
+            return
+        paddle = game.my_paddle
+        size = game.target.size
+        pen.color((0, 160, 0))
+        pen.pensize(1)
+        pen.goto(plan.paddle_x, paddle.y + paddle.height)
+        pen.pendown()
+        pen.goto(plan.paddle_x, plan.y)
+        pen.penup()
+        pen.goto(plan.x, plan.y - size)
+        pen.pendown()
+        pen.circle(size)
+        pen.penup()
+        pen.goto(plan.x + size + 5, plan.y)
+        pen.write(label, font=OVERLAY_FONT)
+
+    def draw(self, game, alpha=1.0):
+        # alpha is how far the frame falls between the last two physics ticks
+        try:
+            self._draw(game, alpha)
+        except turtle.Terminator:
+            self.closed = True
+
+    def _draw(self, game, alpha):
+        if not self.border_drawn:
+            self.draw_border()
+
+        seen = set()
+        self.draw_paddle(game.my_paddle)
+        seen.add(id(game.my_paddle))
+        for b in game.world.balls():
+            x, y = game.render_position(b, alpha)
+            self.draw_ball(b, x, y)
+            seen.add(id(b))
+        for obstacle in game.obstacles:
+            x, y = game.render_position(obstacle, alpha)
+            self.draw_obstacle(obstacle, x, y)
+            seen.add(id(obstacle))
+        for polygon in game.geometry.items:
+            self.draw_polygon(polygon, polygon.x, polygon.y)
+            seen.add(id(polygon))
+
+        # Hide and recycle the turtles of entities that are gone
+        if len(seen) != len(self.sprites):
+            for key in [key for key in self.sprites if key not in seen]:
+                pen = self.sprites.pop(key)[1]
+                pen.hideturtle()
+                self.spare.append(pen)
+
+        self.draw_hud(game)
+
+    def update(self):
+        try:
+            turtle.update()
+        except turtle.Terminator:
+            self.closed = True
+
+    def poll_events(self):
+        # Let Tk deliver pending key presses (and window events) without redrawing
+        # the turtles, so input can be picked up more often than frames are drawn
+        try:
+            self.screen.getcanvas().update()
+        except (turtle.Terminator, turtle.TK.TclError):
+            self.closed = True
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            try:
+                turtle.bye()
+            except turtle.Terminator:
+                pass
@@ -0,0 +1,215 @@
+import argparse
+import json
+import struct
+import time
+
+from run_ball import CatchAndShootGame
+from world import Arena
+
+# File layout, all little-endian:
+#   header   magic, version, mode, physics_hz, arena width and height, seed,
+#            tick count, config length, input count
+#   config   UTF-8 JSON of the game's config dict
+#   inputs   one unsigned LEB128 varint per input: (ticks since previous input << 3) | action code
+# A 90 second game with a few hundred key presses fits in well under a kilobyte.
+MAGIC = b"CSRP"
+VERSION = 3
+ACTION_BITS = 3
+# Games recorded in versions 1 and 2 drew their random numbers from one
+# random.Random, and cannot be played back the same way since the game moved to
+# per-subsystem streams
+OLD_RNG_VERSIONS = (1, 2)
+HEADER = struct.Struct("<4sBBHddQIII")
+MODES = ("poll", "event")
+ACTIONS = ("left", "right", "shoot", "left_down", "left_up", "right_down", "right_up")
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Replay:
+    # Everything needed to reproduce a game exactly: the seed and settings it was
+    # created with, and the tick-stamped inputs it received.
+    def __init__(self, seed, inputs, ticks, config=None, mode="poll", physics_hz=120, arena_size=(400, 300)):
+        self.seed = seed
+        self.inputs = list(inputs)  # (tick, action), in tick order
+        self.ticks = ticks
+        self.config = config if config is not None else {}
+        self.mode = mode
+        self.physics_hz = physics_hz
+        self.arena_size = arena_size
+
+    @classmethod
+    def from_game(cls, game):
+        return cls(game.seed, game.input_log, game.tick_count, game.config,
+                   "event" if game.event_sim is not None else "poll", game.physics_hz,
+                   (game.arena.width, game.arena.height))
+
+    def to_bytes(self):
+        config = json.dumps(self.config, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        out = bytearray(HEADER.pack(MAGIC, VERSION, MODES.index(self.mode), self.physics_hz,
+                                    self.arena_size[0], self.arena_size[1], self.seed,
+                                    self.ticks, len(config), len(self.inputs)))
+        out += config
+        previous = 0
+        for tick, action in self.inputs:
+            _write_varint(out, (tick - previous) << ACTION_BITS | ACTIONS.index(action))
+            previous = tick
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, mode, physics_hz, width, height, seed, ticks, config_length, count = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a replay file")
+        if version in OLD_RNG_VERSIONS:
+            raise ValueError(f"replay version {version} was recorded with the old random number generator "
+                             "and cannot be reproduced")
+        if version != VERSION:
+            raise ValueError("unsupported replay version " + str(version))
+        pos = HEADER.size
+        config = json.loads(data[pos:pos + config_length].decode("utf-8"))
+        pos += config_length
+        inputs = []
+        tick = 0
+        for _ in range(count):
+            value, pos = _read_varint(data, pos)
+            tick += value >> ACTION_BITS
+            inputs.append((tick, ACTIONS[value & (1 << ACTION_BITS) - 1]))
+        return cls(seed, inputs, ticks, config, MODES[mode], physics_hz, (width, height))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    def new_game(self, renderer=None):
+        if renderer is not None:
+            # Play in the renderer's arena, at the size the game was recorded in
+            arena = renderer.arena
+            arena.resize(*self.arena_size)
+            if (arena.width, arena.height) != tuple(self.arena_size):
+                raise ValueError(f"replay was recorded in a {self.arena_size[0]}x{self.arena_size[1]} arena, "
+                                 f"the renderer's is {arena.width}x{arena.height}")
+        else:
+            arena = Arena(*self.arena_size)
+        return CatchAndShootGame(renderer=renderer, mode=self.mode, seed=self.seed,
+                                 physics_hz=self.physics_hz, config=self.config, arena=arena)
+
+
+class ReplayPlayer:
+    # Plays a Replay back through a fresh game, headless or onto a renderer.
+    def __init__(self, replay, renderer=None):
+        self.replay = replay
+        self.renderer = renderer
+        self.game = None
+        self.restart()
+
+    def restart(self):
+        if self.game is not None:
+            self.game.close()
+        self.game = self.replay.new_game(self.renderer)
+        self.next_input = 0
+
+    def advance_to(self, tick):
+        # Run forward to `tick`, feeding recorded inputs as their ticks come up
+        game = self.game
+        inputs = self.replay.inputs
+        end = min(tick, self.replay.ticks)
+        while game.tick_count < end and not game.game_over:
+            while self.next_input < len(inputs) and inputs[self.next_input][0] <= game.tick_count:
+                game.queue_input(inputs[self.next_input][1])
+                self.next_input += 1
+            game.tick()
+
+    def seek(self, tick):
+        # Jump to any tick. Seeking backwards replays from the start.
+        if tick < self.game.tick_count:
+            self.restart()
+        self.advance_to(tick)
+        return self.game
+
+    def finished(self):
+        return self.game.game_over or self.game.tick_count >= self.replay.ticks
+
+    def play(self, speed=1.0):
+        # speed=1 plays in realtime, speed=N plays N times faster, and speed=None (or no
+        # renderer) runs headless as fast as possible to the end
+        if speed is None or self.renderer is None:
+            self.advance_to(self.replay.ticks)
+            return self.game
+
+        game = self.game
+        frame_dt = 1.0 / game.render_hz
+        start_time = time.perf_counter()
+        start_tick = game.tick_count
+        while not self.finished() and not self.renderer.closed:
+            frame_start = time.perf_counter()
+            due = start_tick + int((frame_start - start_time) * speed * game.physics_hz)
+            self.advance_to(due)
+            game._redraw()
+            self.renderer.update()
+            time.sleep(max(0, frame_dt - (time.perf_counter() - frame_start)))
+        return game
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play back a Catch and Shoot replay")
+    parser.add_argument("path")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed multiplier")
+    parser.add_argument("--headless", action="store_true", help="run as fast as possible without a window")
+    parser.add_argument("--seek", type=int, default=0, metavar="TICK", help="start playback at this tick")
+    parser.add_argument("--export", metavar="PATH", help="render to a GIF (.gif) or raw rgb24 video instead")
+    parser.add_argument("--fps", type=int, default=30, help="frame rate of the exported clip")
+    parser.add_argument("--scale", type=float, default=0.5, help="pixels per arena unit in the exported clip")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.path)
+    if args.export:
+        from raster import export_replay
+        start = time.perf_counter()
+        frames = export_replay(replay, args.export, args.fps, args.scale, args.seek)
+        elapsed = time.perf_counter() - start
+        print(f"{frames} frames ({frames / args.fps:.1f} s of game) written to {args.export} "
+              f"in {elapsed:.1f} s")
+        return
+    renderer = None
+    if not args.headless:
+        from renderer import TurtleRenderer
+        renderer = TurtleRenderer()
+    player = ReplayPlayer(replay, renderer)
+    player.seek(args.seek)
+
+    start = time.perf_counter()
+    game = player.play(None if args.headless else args.speed)
+    elapsed = time.perf_counter() - start
+    print(f"tick {game.tick_count}/{replay.ticks}  lives {game.lives}  "
+          f"level {type(game.current_level).__name__}  score {game.level_score}  "
+          f"({elapsed * 1000:.1f} ms)")
+    if renderer is not None:
+        renderer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,212 @@
 import ball
+import math
 import paddle
-import turtle
 import random
+import struct
 import time
+from bvh import BVH
+from collision import advance_ball, polygon_contact
+from event_sim import KINDS, EventSimulation
+from intercept import solve_for_game
+from spatial_hash import SpatialHash
+from streams import LAYOUT, SPAWN, STEERING, Stream
+from telemetry import GAME_OVER, HIT, LEVEL, LIFE_LOST, MISS, OBSTACLE, TIMEOUT, WON
+from world import DEFAULT_ARENA, Arena, World
 
 class Level:
+    # Tunable difficulty. Subclasses override these, and a game's config dict can
+    # override them per level, e.g. {"Level2": {"target_size": 0.03}}.
+    target_size = 0.05  # Target radius as a fraction of the canvas width
+    target_speed = 0  # Target velocity components are drawn from [-target_speed, target_speed]
+    respawn_speed = 0  # Same, for the target's new velocity after each hit
+    score_threshold = 5  # Hits needed to clear the level
+    level_time = 30  # Seconds added to the level timer on entering the level
+    new_obstacles = 0  # Obstacles added on entering the level
+    obstacle_vx = 50  # Obstacle velocity components are +- these
+    obstacle_vy = 30
+    number = 0  # 1 for Level1 and so on; not a tunable
+
     def __init__(self, game):
         self.game = game
+        for name, value in game.config.get(type(self).__name__, {}).items():
+            if not hasattr(Level, name) and not hasattr(type(self), name):
+                raise ValueError(f"{type(self).__name__} has no parameter {name!r}")
+            setattr(self, name, value)
 
     def configure_target(self, target):
         raise NotImplementedError("Subclasses must implement this method")
 
     def update(self, dt):
-        self.game.shooter.move(dt)  # Move the shooter (ball)
-        self.game._redraw()  # Redraw everything
+        profiler = self.game.profiler
+        if self.game.event_sim is not None:
+            # Event mode: jump from one predicted collision to the next
+            self.game.event_sim.advance(dt)
+            if profiler is not None:
+                profiler.mark("events")
+            return
+
+        self.game._move_shooter(dt)  # Move the shooter (ball), bouncing off obstacles on the way
         self.game.target.move(dt)  # Move the target
-        self.game._check_wall_collision()  # Check for collisions with walls
+        if profiler is not None:
+            profiler.mark("move")
         self.game._check_collision()  # Check for collisions between shooter and target
         self.game._check_miss()  # Check if the ball missed
         self.game._paddle_collision()  # Check for collisions with paddle
-
-        # Check for obstacle collisions with the shooter (ball)
-        for obstacle in self.game.obstacles:
-            if self.game.shooter.check_collision_with_obstacle(obstacle):
-                print("Ball collided with obstacle!")
+        if profiler is not None:
+            profiler.mark("collisions")
 
 
 class Level1(Level):
+    number = 1
+
     def configure_target(self, target):
-        target.size = 0.05 * self.game.canvas_width  # Set a default size for the target
-        target.x = random.randint(-self.game.canvas_width //
-                                  2, self.game.canvas_width // 2)
-        target.y = random.randint(0, self.game.canvas_height // 2)
-        print(f"Level 1 target configured: size={target.size}, x={target.x}, y={target.y}")
+        target.size = self.target_size * self.game.canvas_width  # Set a default size for the target
+        target.x = self.game.spawn_rng.randint(-self.game.canvas_width //
+                                         2, self.game.canvas_width // 2)
+        target.y = self.game.spawn_rng.randint(0, self.game.canvas_height // 2)
 
     def update(self, dt):
         super().update(dt)
 
 
 class Level2(Level):
+    number = 2
+    target_size = 0.025
+    target_speed = 50
+    respawn_speed = 50
+    new_obstacles = 3
+
     def configure_target(self, target):
-        print("Configuring target for Level 2")
-        target.vx = random.uniform(-50, 50)
-        target.vy = random.uniform(-50, 50)
-        target.size = 0.025 * self.game.canvas_width
-        target.x = random.randint(-self.game.canvas_width //
-                                  2, self.game.canvas_width // 2)
-        target.y = random.randint(0, self.game.canvas_height // 2)
-        print(f"Target size set to: {target.size}")
+        target.vx = self.game.spawn_rng.uniform(-self.target_speed, self.target_speed)
+        target.vy = self.game.spawn_rng.uniform(-self.target_speed, self.target_speed)
+        target.size = self.target_size * self.game.canvas_width
+        target.x = self.game.spawn_rng.randint(-self.game.canvas_width //
+                                         2, self.game.canvas_width // 2)
+        target.y = self.game.spawn_rng.randint(0, self.game.canvas_height // 2)
 
     def update(self, dt):
         super().update(dt)
 
 
 class Level3(Level):
+    number = 3
+    target_size = 0.015
+    target_speed = 100
+    respawn_speed = 50
+    redirect_chance = 0.05  # Chance per update that the target changes direction
+    redirect_speed = 50
+    new_obstacles = 3
+
     def configure_target(self, target):
-        target.vx = random.uniform(-100, 100)
-        target.vy = random.uniform(-100, 100)
-        target.size = 0.015 * self.game.canvas_width
-        target.x = random.randint(-self.game.canvas_width //
-                                  2, self.game.canvas_width // 2)
-        target.y = random.randint(0, self.game.canvas_height // 2)
+        target.vx = self.game.spawn_rng.uniform(-self.target_speed, self.target_speed)
+        target.vy = self.game.spawn_rng.uniform(-self.target_speed, self.target_speed)
+        target.size = self.target_size * self.game.canvas_width
+        target.x = self.game.spawn_rng.randint(-self.game.canvas_width //
+                                         2, self.game.canvas_width // 2)
+        target.y = self.game.spawn_rng.randint(0, self.game.canvas_height // 2)
+
+    def __init__(self, game):
+        super().__init__(game)
+        self.countdown = None  # Updates left before the next change of direction
 
     def update(self, dt):
-        if random.random() < 0.05:  # 5% chance per update cycle to change direction
-            self.game.target.vx = random.uniform(-50, 50)
-            self.game.target.vy = random.uniform(-50, 50)
+        # Each update has redirect_chance of changing the target's direction. Rather
+        # than rolling for it every update, the wait until the next change is drawn
+        # once per change.
+        steering = self.game.steering_rng
+        if self.countdown is None:
+            self.countdown = steering.wait(self.redirect_chance)
+        if self.countdown == 0:
+            self.game.target.vx = steering.uniform(-self.redirect_speed, self.redirect_speed)
+            self.game.target.vy = steering.uniform(-self.redirect_speed, self.redirect_speed)
+            self.game._invalidate(self.game.target)
+            self.countdown = steering.wait(self.redirect_chance)
+        else:
+            self.countdown -= 1
         super().update(dt)
 
 
+class GeneratedLevel(Level3):
+    # Levels past Level3, for games whose config has a "levels" section (see
+    # layouts.py). level_class() makes one subclass per number, named Level4,
+    # Level5, ..., each a little harder than the one before. Their obstacles are
+    # those of Level3, moving faster.
+    pass
+
+
+LEVELS = (Level1, Level2, Level3)
+_GENERATED_LEVELS = {}
+
+
+def level_class(number):
+    # The Level subclass for level `number`, counting from 1
+    if number <= len(LEVELS):
+        return LEVELS[number - 1]
+    cls = _GENERATED_LEVELS.get(number)
+    if cls is None:
+        extra = number - len(LEVELS)
+        cls = type(f"Level{number}", (GeneratedLevel,), {
+            "number": number,
+            "target_size": max(0.008, Level3.target_size * 0.93 ** extra),
+            "target_speed": Level3.target_speed + 15 * extra,
+            "respawn_speed": Level3.respawn_speed + 10 * extra,
+            "redirect_chance": min(0.15, Level3.redirect_chance + 0.01 * extra),
+            "new_obstacles": 0,
+            "obstacle_vx": Level3.obstacle_vx + 10 * extra,
+            "obstacle_vy": Level3.obstacle_vy + 6 * extra,
+        })
+        _GENERATED_LEVELS[number] = cls
+    return cls
+
+# Held arrow keys. The renderer queues a *_down when a key goes down and a *_up when
+# it comes up; the paddle slides at paddle.SPEED for every tick the key was down at
+# any point, however often the OS repeats it. "left" and "right" still move the
+# paddle one 20 px step, for bots and older replays.
+LEFT_KEY = 1
+RIGHT_KEY = 2
+KEY_EVENTS = {
+    "left_down": (LEFT_KEY, True),
+    "left_up": (LEFT_KEY, False),
+    "right_down": (RIGHT_KEY, True),
+    "right_up": (RIGHT_KEY, False),
+}
+
+# Fixed layout of CatchAndShootGame.snapshot(), all little-endian:
+#   game       layout version, tick count, lives, score, level score and threshold,
+#              shots, hits, level number - 1, flags (shooter ready, game over, won,
+#              left and right arrow held),
+#              obstacle count, level timer, obstacle speed, event simulation time,
+#              arena width and height
+#   paddle     x, y, count
+#   balls      shooter then target: x, y, vx, vy, size, count
+#   obstacles  SNAPSHOT_OBSTACLES slots of x, y, vx, vy, width, height, count
+#   random     the seed, numbers drawn so far from its spawn, steering and layout
+#              streams, and the updates left before Level3's next change of
+#              direction (-1 if not drawn yet)
+#   events     how many predictions the event simulation has pending (0 in poll
+#              mode), then SNAPSHOT_EVENTS slots of SNAPSHOT_EVENT: time, kind, and
+#              the two bodies (0 paddle, 1 shooter, 2 target, 3 and up obstacles
+#              then level geometry, 65535 none). Slots past the count are left as
+#              they were.
+SNAPSHOT_VERSION = 3
+SNAPSHOT_OBSTACLES = 6  # Levels 2 and 3 add three each
+SNAPSHOT_EVENTS = 64  # At most about 30 predictions are live at once
+SNAPSHOT = struct.Struct("<IqiiiiiiBBBddddd" + "ddq" + "dddddq" * 2 + "ddddddq" * SNAPSHOT_OBSTACLES +
+                         "QQQQi" + "B")
+SNAPSHOT_EVENT = struct.Struct("<dBHH")
+SNAPSHOT_SIZE = SNAPSHOT.size + SNAPSHOT_EVENTS * SNAPSHOT_EVENT.size
+_EMPTY_OBSTACLE = (0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0)
+_NO_BODY = 0xFFFF
+
+SEGMENT_WIDTH = 4  # How thick a line segment Polygon is drawn
+GEOMETRY_COLOR = (90, 90, 90)
+
+
 class Obstacle:
-    def __init__(self, width, height, x, y, vx, vy, color):
+    __slots__ = ("width", "height", "x", "y", "vx", "vy", "color", "count", "arena")
+    normals = None  # An axis-aligned box; Polygon has its edge normals here
+
+    def __init__(self, width, height, x, y, vx, vy, color, arena=None):
         self.width = width
         self.height = height
         self.x = x
@@ -78,24 +214,36 @@ class Obstacle:
         self.vx = vx
         self.vy = vy
         self.color = color
+        self.count = 0
+        self.arena = arena if arena is not None else DEFAULT_ARENA
 
     def move(self, dt):
         self.x += self.vx * dt
         self.y += self.vy * dt
 
-    def draw(self):
-        turtle.penup()
-        turtle.goto(self.x - self.width / 2, self.y -
-                    self.height / 2)  # Bottom-left corner
-        turtle.pendown()
-        turtle.color(self.color)
-        turtle.begin_fill()
-        for _ in range(2):
-            turtle.forward(self.width)
-            turtle.left(90)
-            turtle.forward(self.height)
-            turtle.left(90)
-        turtle.end_fill()
+    def bounce_off_vertical_wall(self):
+        self.vx = -self.vx
+        self.count += 1
+
+    def bounce_off_horizontal_wall(self):
+        self.vy = -self.vy
+        self.count += 1
+
+    def time_to_hit_vertical_wall(self):
+        if self.vx > 0:
+            return max(0.0, (self.arena.width - self.x - self.width / 2) / self.vx)
+        elif self.vx < 0:
+            return max(0.0, (-self.arena.width - self.x + self.width / 2) / self.vx)
+        else:
+            return math.inf
+
+    def time_to_hit_horizontal_wall(self):
+        if self.vy > 0:
+            return max(0.0, (self.arena.height - self.y - self.height / 2) / self.vy)
+        elif self.vy < 0:
+            return max(0.0, (-self.arena.height - self.y + self.height / 2) / self.vy)
+        else:
+            return math.inf
 
     def check_collision(self, ball):
         # Check for collision with a ball
@@ -105,65 +253,256 @@ class Obstacle:
         )
 
 
+class Polygon(Obstacle):
+    # A convex polygon, or a line segment when given two points: a surface at an
+    # angle. points are its corners where it is now, in either winding order. They
+    # are kept relative to (x, y), the middle of its bounding box, so only x and y
+    # change as it moves, and width and height are that bounding box, which the
+    # broad phases and the wall checks use as they would an Obstacle's.
+    #
+    # The edges and their outward normals are worked out once here, for the swept
+    # collision in collision.py. A segment has two edges, one facing each way.
+    __slots__ = ("points", "edges", "normals", "outline")
+
+    def __init__(self, points, vx=0, vy=0, color=(0, 0, 255), arena=None):
+        if len(points) < 2:
+            raise ValueError("a polygon needs at least two points, not " + str(len(points)))
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        x = (min(xs) + max(xs)) / 2
+        y = (min(ys) + max(ys)) / 2
+        super().__init__(max(xs) - min(xs), max(ys) - min(ys), x, y, vx, vy, color, arena)
+
+        local = [(px - x, py - y) for px, py in points]
+        n = len(local)
+        if n > 2:
+            area = sum(local[i - 1][0] * local[i][1] - local[i][0] * local[i - 1][1] for i in range(n))
+            if area == 0:
+                raise ValueError("polygon corners all lie on one line")
+            if area < 0:
+                local.reverse()  # Counter-clockwise, so each outward normal is on the right
+        self.points = tuple(local)
+
+        edges = []
+        for i in range(n):
+            ax, ay = local[i]
+            bx, by = local[(i + 1) % n]
+            ex = bx - ax
+            ey = by - ay
+            length = math.hypot(ex, ey)
+            if length == 0:
+                raise ValueError("polygon has the same corner twice in a row")
+            if n > 2:
+                cx, cy = local[(i + 2) % n]
+                if ex * (cy - by) - ey * (cx - bx) < 0:
+                    raise ValueError("polygon is not convex")
+            edges.append((ax, ay, ex, ey, length * length, ey / length, -ex / length))
+        self.edges = tuple(edges)
+        self.normals = tuple((edge[5], edge[6]) for edge in edges)
+
+        # What the renderers fill: the polygon itself, or a segment drawn
+        # SEGMENT_WIDTH thick (it collides as a line of no thickness)
+        if n == 2:
+            nx, ny = self.normals[0]
+            half = SEGMENT_WIDTH / 2
+            (ax, ay), (bx, by) = local
+            self.outline = ((ax + nx * half, ay + ny * half), (bx + nx * half, by + ny * half),
+                            (bx - nx * half, by - ny * half), (ax - nx * half, ay - ny * half))
+        else:
+            self.outline = self.points
+
+    def corners(self):
+        # The corners where the polygon is now
+        return [(self.x + px, self.y + py) for px, py in self.points]
+
+    def check_collision(self, ball):
+        return polygon_contact(ball.x, ball.y, self)[0] <= ball.size * ball.size
+
+
 class CatchAndShootGame:
-    def __init__(self):
-        self.screen = turtle.Screen()
-        self.HZ = 120
+    def __init__(self, renderer=None, mode="poll", seed=None, physics_hz=120, render_hz=60, config=None,
+                 arena=None, profiler=None, aim_assist=False, telemetry=None):
+        # With no renderer the game runs headless: nothing here touches turtle,
+        # and the simulation is advanced by calling tick() (or step(dt)) directly.
+        #
+        # mode="poll" checks every object every frame; mode="event" predicts the
+        # next collision with an EventSimulation and only does work when one is due.
+        #
+        # All randomness comes from three streams seeded from seed (streams.py): target
+        # spawns, target steering and obstacle layout. The same seed and the same
+        # input log reproduce a game exactly.
+        #
+        # config overrides Level parameters by level name, e.g.
+        # {"Level3": {"target_size": 0.02, "redirect_chance": 0.1}}.
+        #
+        # profiler is an optional FrameProfiler that times each phase of the loop.
+        #
+        # aim_assist shows where to move and when to fire (intercept.py) on screen.
+        #
+        # telemetry is an optional Telemetry that records hits, misses, level changes
+        # and so on. The game never prints or does other I/O while it runs.
+        if mode not in ("poll", "event"):
+            raise ValueError("mode must be 'poll' or 'event', not " + repr(mode))
+        self.renderer = renderer
+        self.profiler = profiler
+        self.aim_assist = aim_assist
+        self.telemetry = telemetry
+        self.config = config if config is not None else {}
+        self.event_sim = None
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.spawn_rng = Stream(self.seed, SPAWN)
+        self.steering_rng = Stream(self.seed, STEERING)
+        self.layout_rng = Stream(self.seed, LAYOUT)
+
+        # Physics runs at a fixed rate; rendering runs at its own, lower rate
+        self.physics_hz = physics_hz
+        self.render_hz = render_hz
+        self.physics_dt = 1.0 / physics_hz
+        self.max_ticks_per_frame = 8  # Beyond this the loop drops time instead of catching up
+        self.tick_count = 0
+        self.pending_inputs = []
+        self.input_log = []  # (tick, action) for every input applied, key events coalesced per tick
+        self.keys_held = 0  # LEFT_KEY / RIGHT_KEY bits of the arrow keys down now
+        self.keys_pressed = 0  # Keys that went down during the tick being processed
+        self.previous_positions = {}  # id(body) -> (x, y) before the last tick
         self.lives = 3
         self.score = 0
         self.shooter_ready = True
+        self.game_over = False
         self.level_score = 0
-        self.level_score_threshold = 5  # Initial score threshold for Level 1
         self.current_level = Level1(self)  # Set initial level
+        self.level_score_threshold = self.current_level.score_threshold
+        self.last_level = len(LEVELS)  # Clearing this level wins the game
+        self.planner = None
 
-        # Define canvas dimensions
-        self.canvas_width = self.screen.window_width()
-        self.canvas_height = self.screen.window_height()
+        # Running totals, for evaluating difficulty
+        self.shots = 0
+        self.hits = 0
+        self.won = False
 
-        self.obstacles = []  # List of obstacles
+        # Define canvas dimensions
+        if arena is None:
+            arena = renderer.arena if renderer is not None else Arena()
+        self.arena = arena
+        self.arena.add_listener(self._on_arena_resize)
+
+        self.world = World(self.arena, None)
+        self.obstacle_grid = SpatialHash(cell_size=64)  # Broad phase for obstacle checks
+        self.obstacle_speed = 0  # Largest |vx| + |vy| of any obstacle, to widen grid queries
         self.initialize_obstacles()
 
-        # Add a level timer
-        self.level_timer = 30
-
-        turtle.speed(0)
-        turtle.tracer(0, 0)
-        turtle.hideturtle()
-        turtle.colormode(255)
+        # Fixed level geometry from the config: a list of shapes, each a list of
+        # corners, e.g. {"geometry": [[[-200, 0], [-120, 60]], [[80, 40], [160, 40], [120, 100]]]}
+        # for a line segment and a triangle. The shot bounces off them like obstacles.
+        self.set_geometry(self.config.get("geometry", ()))
 
-        self.canvas_width = turtle.screensize()[0]
-        self.canvas_height = turtle.screensize()[1]
+        # Add a level timer
+        self.level_timer = self.current_level.level_time
 
         self.initialize_paddle()
         self.initialize_balls()
 
+        # With a "levels" section in the config, e.g. {"levels": {"last": 6}}, the
+        # layout of each level after the first is generated and checked to be
+        # playable ahead of time (layouts.py). Interactive games do that in a
+        # background process while the current level is played.
+        levels = self.config.get("levels")
+        if levels is not None:
+            from layouts import LevelPlanner  # layouts plays test games, so imports this module
+            self.last_level = levels.get("last", len(LEVELS))
+            self.planner = LevelPlanner(self.seed, self.config, (self.arena.width, self.arena.height),
+                                        background=renderer is not None)
+            if self.last_level > 1:
+                self.planner.prepare(2)
+
+        if mode == "event":
+            self.event_sim = EventSimulation(self.world, on_ball_hit=self._on_ball_hit,
+                                             on_paddle_hit=self._on_paddle_hit,
+                                             on_miss=self._on_miss,
+                                             on_obstacle_hit=self._on_obstacle_hit,
+                                             resting=self._shooter_resting)
+
+    @property
+    def canvas_width(self):
+        return self.arena.width
+
+    @property
+    def canvas_height(self):
+        return self.arena.height
+
+    @property
+    def my_paddle(self):
+        return self.world.paddle
+
+    @property
+    def shooter(self):
+        return self.world.shooter
+
+    @property
+    def target(self):
+        return self.world.target
+
+    @property
+    def obstacles(self):
+        return self.world.obstacles
+
+    @property
+    def geometry(self):
+        return self.world.geometry
+
     def initialize_obstacles(self):
-        if isinstance(self.current_level, Level2) or isinstance(self.current_level, Level3):
-            # Add obstacles for Level 2 and Level 3
-            for _ in range(3):  # Add three obstacles
-                width = 50
-                height = 20
-                x = random.randint(-self.canvas_width // 2 +
-                                   width, self.canvas_width // 2 - width)
-                y = random.randint(-self.canvas_height // 2 +
-                                   height, self.canvas_height // 2 - height)
-                vx = random.choice([-50, 50])
-                vy = random.choice([-30, 30])
-                color = (0, 0, 255)
-                self.obstacles.append(
-                    Obstacle(width, height, x, y, vx, vy, color))
+        # Add the level's new obstacles to those already there (three each for
+        # Level 2 and Level 3)
+        level = self.current_level
+        for _ in range(level.new_obstacles):
+            width = 50
+            height = 20
+            x = self.layout_rng.randint(-self.canvas_width // 2 +
+                                        width, self.canvas_width // 2 - width)
+            y = self.layout_rng.randint(-self.canvas_height // 2 +
+                                        height, self.canvas_height // 2 - height)
+            vx = self.layout_rng.choice([-level.obstacle_vx, level.obstacle_vx])
+            vy = self.layout_rng.choice([-level.obstacle_vy, level.obstacle_vy])
+            color = (0, 0, 255)
+            self.add_obstacle(Obstacle(width, height, x, y, vx, vy, color, arena=self.arena))
+
+    def apply_layout(self, layout):
+        # Put the target and obstacles where a layouts.Layout says, in place of the
+        # obstacles there were
+        target = self.target
+        target.x, target.y, target.vx, target.vy, target.size = layout.target
+        obstacles = self.obstacles
+        while obstacles:
+            self.obstacle_grid.remove(obstacles.pop())
+        self.obstacle_speed = 0
+        for width, height, x, y, vx, vy in layout.obstacles:
+            self.add_obstacle(Obstacle(width, height, x, y, vx, vy, (0, 0, 255), arena=self.arena))
+        if self.event_sim is not None:
+            self.event_sim.reset()
+
+    def set_geometry(self, shapes):
+        # Replace the level geometry with Polygons for shapes (lists of corners)
+        polygons = [Polygon(points, color=GEOMETRY_COLOR, arena=self.arena) for points in shapes]
+        self.world.geometry = BVH(polygons)
+        if self.event_sim is not None:
+            self.event_sim.reset()
+
+    def add_obstacle(self, obstacle):
+        self.obstacles.append(obstacle)
+        self.obstacle_grid.update_box(obstacle)
+        self.obstacle_speed = max(self.obstacle_speed, abs(obstacle.vx) + abs(obstacle.vy))
+        self._invalidate(obstacle)
 
     def initialize_paddle(self):
-        tom = turtle.Turtle()
-        self.my_paddle = paddle.Paddle(100, 25, (255, 0, 0), tom)
+        self.world.paddle = paddle.Paddle(100, 25, (255, 0, 0), arena=self.arena)
         self.my_paddle.set_location([0, -self.canvas_height + 60])
 
     def initialize_balls(self):
         ball_radius = 0.025 * self.canvas_width
-        self.shooter = ball.Ball(
-            ball_radius, self.my_paddle.location[0], self.my_paddle.location[1] + self.my_paddle.height, 0, 0, (255, 0, 0), ball_type="shooter")
-        self.target = ball.Ball(ball_radius, 0, 0, 0, 0,
-                                (0, 255, 0), ball_type="target")
+        self.world.shooter = ball.Ball(
+            ball_radius, self.my_paddle.x, self.my_paddle.y + self.my_paddle.height, 0, 0, (255, 0, 0), ball_type="shooter", arena=self.arena)
+        self.world.target = ball.Ball(ball_radius, 0, 0, 0, 0,
+                                      (0, 255, 0), ball_type="target", arena=self.arena)
 
         # Ensure shooter is ready at game start
         self.shooter_ready = True
@@ -176,212 +515,222 @@ class CatchAndShootGame:
         elif isinstance(self.current_level, Level3):
             self.current_level.configure_target(self.target)
 
-    def _draw_border(self):
-        turtle.penup()
-        turtle.goto(-self.canvas_width, -self.canvas_height)
-        turtle.pensize(10)
-        turtle.pendown()
-        turtle.color((0, 0, 0))
-        for _ in range(2):
-            turtle.forward(2 * self.canvas_width)
-            turtle.left(90)
-            turtle.forward(2 * self.canvas_height)
-            turtle.left(90)
-
-    def _redraw(self):
-        turtle.clear()
-        self.my_paddle.clear()
-        self._draw_border()
-        self.my_paddle.draw()
-        self.shooter.draw()
-        self.target.draw()
-
-        for obstacle in self.obstacles:
-            obstacle.draw()
-
-        # Display lives and score
-        turtle.penup()
-        # Position for score
-        turtle.goto(-self.canvas_width + 45, self.canvas_height - 30)
-        turtle.color("black")
-        turtle.write(f"Lives: {self.lives}  Score: {self.level_score}", font=("Arial", 16, "bold"))
-
-        # Display time remaining for the current level
-        turtle.goto(-self.canvas_width + 45,
-                    self.canvas_height - 60)  # Position for time
-        turtle.color("black")
-        turtle.write(f"Time: {int(self.level_timer)}s",
-                     font=("Arial", 16, "bold"))
-
-        # Display bonus time if level_timer > 30
-        if self.level_timer > 30:
-            # Position for bonus
-            turtle.goto(-self.canvas_width + 45, self.canvas_height - 90)
-            turtle.write(f"Bonus Time: {int(self.level_timer - 30)}s", font=("Arial", 16, "bold"))
-
-        turtle.update()
+    def _invalidate(self, *bodies):
+        # Tell the event simulation that these bodies were moved from outside it
+        if self.event_sim is not None:
+            for body in bodies:
+                self.event_sim.invalidate(body)
+
+    def _redraw(self, alpha=1.0):
+        if self.renderer is not None:
+            self.renderer.draw(self, alpha)
+            if self.aim_assist:
+                self.renderer.draw_aim(self, solve_for_game(self))
+            if self.profiler is not None and self.profiler.overlay:
+                lines = self.profiler.overlay_lines()
+                if lines is not None:
+                    self.renderer.draw_overlay(lines)
+
+    def _emit(self, kind, a=0.0, b=0.0):
+        # Record a game event, if telemetry is attached
+        if self.telemetry is not None:
+            self.telemetry.emit(self.tick_count, kind, self.current_level.number - 1, a, b)
 
     def _update_timer(self, dt):
         self.level_timer -= dt
         if self.level_timer <= 0:
-            print("Time's up!")
+            self._emit(TIMEOUT, self.lives - 1, self.level_score)
             self.lives -= 1
+            self._emit(LIFE_LOST, self.lives, self.level_timer)
             if self.lives <= 0:
-                print("Game Over")
-                turtle.bye()
+                self._emit(GAME_OVER, self.shots, self.hits)
+                self.game_over = True
             else:
                 self.reset_level()
 
     def next_level(self):
-        print(f"Transitioning from {type(self.current_level).__name__}")
-
         # Preserve remaining time and add to the next level
         remaining_time = self.level_timer
 
-        if isinstance(self.current_level, Level1):
-            self.current_level = Level2(self)
-            self.level_score_threshold = 5  # Set new threshold for Level 2
-        elif isinstance(self.current_level, Level2):
-            self.current_level = Level3(self)
-            self.level_score_threshold = 5  # Set new threshold for Level 3
-        elif isinstance(self.current_level, Level3):
-            print("Congratulations! You finished all levels!")
-            turtle.bye()  # End the game
+        number = self.current_level.number + 1
+        if number > self.last_level:
+            self.won = True
+            self._emit(WON, self.shots, self.hits)
+            self.game_over = True  # End the game
+            return
+        if self.planner is not None:
+            layout = self.planner.layout(number, (self.arena.width, self.arena.height))
+            if number < self.last_level:
+                self.planner.prepare(number + 1)
+            self.start_level(number, layout, remaining_time)
             return
 
+        self.current_level = level_class(number)(self)
         self.level_score = 0
+        self.level_score_threshold = self.current_level.score_threshold  # Set new threshold
 
         self.current_level.configure_target(self.target)
-        print(f"Transitioned to {type(self.current_level).__name__}.")
-        print(f"Target size: {self.target.size}, Next threshold: {self.level_score_threshold}")
+        self._invalidate(self.target)
 
-        self.level_timer = remaining_time + 30
+        self.level_timer = remaining_time + self.current_level.level_time
+        self._emit(LEVEL, self.level_timer, self.hits)
 
         self.initialize_obstacles()
 
+    def start_level(self, number, layout, carry_time=0.0):
+        # Enter level `number` laid out as a layouts.Layout, with carry_time seconds
+        # left over from the last level
+        self.current_level = level_class(number)(self)
+        self.level_score = 0
+        self.level_score_threshold = self.current_level.score_threshold
+        self.apply_layout(layout)
+        self.level_timer = carry_time + self.current_level.level_time
+        self._emit(LEVEL, self.level_timer, self.hits)
+
+    def close(self):
+        # Stop any background level generation, and stop following the arena, which
+        # may be shared with the next game
+        if self.planner is not None:
+            self.planner.close()
+        self.arena.remove_listener(self._on_arena_resize)
+
     def reset_level(self):
         self.level_score = 0
         self.shooter_ready = True
-        self.shooter.x = self.my_paddle.location[0]
-        self.shooter.y = self.my_paddle.location[1] + self.my_paddle.height
+        self.shooter.x = self.my_paddle.x
+        self.shooter.y = self.my_paddle.y + self.my_paddle.height
         self.shooter.vx = 0
         self.shooter.vy = 0
         self.current_level.configure_target(self.target)
+        self._invalidate(self.shooter, self.target)
 
     def _check_miss(self):
-        if self.shooter.y < -self.canvas_height:  # Check if the ball is below the screen
-            self.lives -= 1  # Deduct a life
+        # The side and top walls are bounced off in Ball.check_walls as the balls
+        # move; the shooter is not bounced off the floor, reaching it is a miss
+        if self.shooter.y - self.shooter.size <= -self.canvas_height:  # Check if the ball reached the bottom
+            self._on_miss(self.shooter)
 
-            if self.lives <= 0:
-                print("Game Over")
-                turtle.bye()  # End the game
-            else:
-                # Reset the shooter (ball) to the paddle position
-                self.shooter_ready = True
-                self.shooter.x = self.my_paddle.location[0]
-                self.shooter.y = self.my_paddle.location[1] + \
-                    self.my_paddle.height
-                self.shooter.vx = 0
-                self.shooter.vy = 0
+    def _on_miss(self, shooter):
+        self.lives -= 1  # Deduct a life
+        self._emit(MISS, shooter.x, self.lives)
+        self._emit(LIFE_LOST, self.lives, self.level_timer)
+
+        if self.lives <= 0:
+            self._emit(GAME_OVER, self.shots, self.hits)
+            self.game_over = True  # End the game
+
+        # Reset the shooter (ball) to the paddle position. This happens on game over
+        # too, so the event simulation does not see it fall through the floor again.
+        self.shooter_ready = not self.game_over
+        self.shooter.x = self.my_paddle.x
+        self.shooter.y = self.my_paddle.y + \
+            self.my_paddle.height
+        self.shooter.vx = 0
+        self.shooter.vy = 0
+        self._invalidate(self.shooter)
 
     def _check_collision(self):
         if self.shooter.distance(self.target) <= self.shooter.size + self.target.size:
-            self.level_score += 1  # Increase level score, not the global score
-
-            # Respawn the target at a random position
-            self.target.x = random.randint(-self.canvas_width //
-                                           2, self.canvas_width // 2)
-            self.target.y = random.randint(0, self.canvas_height // 2)
-
-            # Update target velocity only for Level 2 and Level 3
-            if isinstance(self.current_level, (Level2, Level3)):
-                min_speed = 10  # Minimum speed for target
-                previous_vx, previous_vy = self.target.vx, self.target.vy
-                while True:
-                    self.target.vx = random.uniform(-50, 50)
-                    self.target.vy = random.uniform(-50, 50)
-
-                    # Enforce minimum speed constraint
-                    if abs(self.target.vx) < min_speed:
-                        self.target.vx = min_speed if self.target.vx >= 0 else -min_speed
-                    if abs(self.target.vy) < min_speed:
-                        self.target.vy = min_speed if self.target.vy >= 0 else -min_speed
-
-                    # Ensure the new velocity is not the same as the previous one
-                    if (self.target.vx, self.target.vy) != (previous_vx, previous_vy):
-                        break
-                print(f"New target velocity: vx={self.target.vx}, vy={self.target.vy}")
-            else:  # For Level 1, ensure the target is stationary
-                self.target.vx = 0
-                self.target.vy = 0
-
-            # Reset shooter to paddle after successful hit
-            self.shooter_ready = True
-            self.shooter.x = self.my_paddle.location[0]
-            self.shooter.y = self.my_paddle.location[1] + self.my_paddle.height
-            self.shooter.vx = 0
-            self.shooter.vy = 0
+            self._on_ball_hit(self.shooter, self.target)
+
+    def _on_ball_hit(self, shooter, target):
+        self.level_score += 1  # Increase level score, not the global score
+        self.hits += 1
+        self._emit(HIT, target.x, target.y)
+
+        # Respawn the target at a random position
+        self.target.x = self.spawn_rng.randint(-self.canvas_width //
+                                               2, self.canvas_width // 2)
+        self.target.y = self.spawn_rng.randint(0, self.canvas_height // 2)
+
+        # Update target velocity only for levels with a moving target (Level 2 and Level 3)
+        speed = self.current_level.respawn_speed
+        if speed > 0:
+            min_speed = 10  # Minimum speed for target
+            previous_vx, previous_vy = self.target.vx, self.target.vy
+            while True:
+                self.target.vx = self.spawn_rng.uniform(-speed, speed)
+                self.target.vy = self.spawn_rng.uniform(-speed, speed)
+
+                # Enforce minimum speed constraint
+                if abs(self.target.vx) < min_speed:
+                    self.target.vx = min_speed if self.target.vx >= 0 else -min_speed
+                if abs(self.target.vy) < min_speed:
+                    self.target.vy = min_speed if self.target.vy >= 0 else -min_speed
+
+                # Ensure the new velocity is not the same as the previous one
+                if (self.target.vx, self.target.vy) != (previous_vx, previous_vy):
+                    break
+        else:  # For Level 1, ensure the target is stationary
+            self.target.vx = 0
+            self.target.vy = 0
+
+        # Reset shooter to paddle after successful hit
+        self.shooter_ready = True
+        self.shooter.x = self.my_paddle.x
+        self.shooter.y = self.my_paddle.y + self.my_paddle.height
+        self.shooter.vx = 0
+        self.shooter.vy = 0
+        self._invalidate(self.shooter, self.target)
 
-            # Check for level score threshold
-            if self.level_score >= self.level_score_threshold:
-                print(f"Level score reached {self.level_score}, moving to the next level!")
-                self.next_level()
+        # Check for level score threshold
+        if self.level_score >= self.level_score_threshold:
+            self.next_level()
 
     def _paddle_collision(self):
         if (
             not self.shooter_ready and
-            self.my_paddle.location[1] <= self.shooter.y <= self.my_paddle.location[1] +
+            self.my_paddle.y <= self.shooter.y <= self.my_paddle.y +
                 self.my_paddle.height
-            and abs(self.shooter.x - self.my_paddle.location[0]) <= self.my_paddle.width / 2
+            and abs(self.shooter.x - self.my_paddle.x) <= self.my_paddle.width / 2
         ):
-            self.shooter_ready = True
-            self.shooter.vx = 0
-            self.shooter.vy = 0
-            self.shooter.x = self.my_paddle.location[0]
-            self.shooter.y = self.my_paddle.location[1] + self.my_paddle.height
+            self._on_paddle_hit(self.shooter)
 
-    def _check_wall_collision(self):
-        window_width = self.canvas_width // 2
-        window_height = self.canvas_height // 2
+    def _shooter_resting(self, b):
+        # The shot waiting to be fired sits on the paddle; nothing knocks it off
+        return b is self.shooter and self.shooter_ready
 
-        # Check if shooter hits left or right vertical walls
-        if self.shooter.x - self.shooter.size <= -window_width or self.shooter.x + self.shooter.size >= window_width:
-            self.shooter.vx = -self.shooter.vx
-
-        # Check if shooter hits the top wall (bounces back)
-        if self.shooter.y + self.shooter.size >= window_height:
-            self.shooter.vy = -self.shooter.vy  # Bounces back on top wall
-
-        # **Do NOT bounce off bottom**. Instead, we handle the miss in another method.
-        if self.shooter.y - self.shooter.size <= -window_height:  # Shooter has fallen below the screen
-            self._check_miss()
-
-        # Check for target collisions with walls (for target object)
-        if self.target.x - self.target.size <= -window_width or self.target.x + self.target.size >= window_width:
-            self.target.vx = -self.target.vx
-
-        if self.target.y - self.target.size <= -window_height or self.target.y + self.target.size >= window_height:
-            self.target.vy = -self.target.vy
+    def _on_paddle_hit(self, shooter):
+        if self.shooter_ready:
+            return
+        self.shooter_ready = True
+        self.shooter.vx = 0
+        self.shooter.vy = 0
+        self.shooter.x = self.my_paddle.x
+        self.shooter.y = self.my_paddle.y + self.my_paddle.height
+        self._invalidate(self.shooter)
+
+    def _on_arena_resize(self, arena):
+        # The window was resized. Keep the paddle on the bottom and pull anything left
+        # outside the new walls back in (1 px clear, so it is not bounced every tick).
+        paddle = self.my_paddle
+        if paddle is None:
+            return
+        half = paddle.width / 2
+        paddle.x = min(max(paddle.x, -arena.width + half), arena.width - half)
+        paddle.y = -arena.height + 60
+        for b in self.world.balls():
+            inset = b.size + 1
+            b.x = min(max(b.x, -arena.width + inset), arena.width - inset)
+            b.y = min(max(b.y, -arena.height + inset), arena.height - inset)
+        if self.shooter_ready:
+            self.shooter.x = paddle.x
+            self.shooter.y = paddle.y + paddle.height
+        for obstacle in self.obstacles:
+            half_w = obstacle.width / 2 + 1
+            half_h = obstacle.height / 2 + 1
+            obstacle.x = min(max(obstacle.x, -arena.width + half_w), arena.width - half_w)
+            obstacle.y = min(max(obstacle.y, -arena.height + half_h), arena.height - half_h)
+            self.obstacle_grid.update_box(obstacle)
+        self._invalidate(paddle, *self.world.balls(), *self.obstacles)
 
     def _check_obstacle_collision(self, dt):
+        # Move the obstacles and bounce them off the walls. The shooter was already
+        # swept through their start-of-step positions by _move_shooter.
         for obstacle in self.obstacles:
             # Move the obstacle
             obstacle.move(dt)
 
-            # Calculate the next position of the ball
-            next_x = self.shooter.x + self.shooter.vx * dt
-            next_y = self.shooter.y + self.shooter.vy * dt
-
-            # Check for collision between the ball's next position and the obstacle
-            if (
-                    abs(next_x - obstacle.x) <= (self.shooter.size + obstacle.width / 2) and
-                    abs(next_y - obstacle.y) <= (self.shooter.size + obstacle.height / 2)
-            ):
-                # Reverse the shooter's direction on collision
-                self.shooter.vx = -self.shooter.vx
-                self.shooter.vy = -self.shooter.vy
-                break  # Exit after handling one collision
-
             # Handle obstacle bouncing off walls
             if obstacle.x - obstacle.width / 2 <= -self.canvas_width or obstacle.x + obstacle.width / 2 >= self.canvas_width:
                 obstacle.vx = -obstacle.vx
@@ -389,28 +738,67 @@ class CatchAndShootGame:
             if obstacle.y - obstacle.height / 2 <= -self.canvas_height or obstacle.y + obstacle.height / 2 >= self.canvas_height:
                 obstacle.vy = -obstacle.vy
 
+            self.obstacle_grid.update_box(obstacle)
+
+    def _move_shooter(self, dt):
+        # Continuous collision: sweep the shooter through the obstacles over the whole
+        # step, so it cannot tunnel through one or stick in it at low tick rates.
+        # A shot waiting to be fired stays on the paddle instead.
+        shooter = self.shooter
+        if self.shooter_ready:
+            shooter.x = self.my_paddle.x
+            shooter.y = self.my_paddle.y + self.my_paddle.height
+            return
+        reach = shooter.size + self.obstacle_speed * dt
+        end_x = shooter.x + shooter.vx * dt
+        end_y = shooter.y + shooter.vy * dt
+        left = min(shooter.x, end_x) - reach
+        bottom = min(shooter.y, end_y) - reach
+        right = max(shooter.x, end_x) + reach
+        top = max(shooter.y, end_y) + reach
+        nearby = self.obstacle_grid.query(left, bottom, right, top)
+        if self.geometry:
+            nearby += self.geometry.query(left, bottom, right, top)
+        for obstacle in advance_ball(shooter, nearby, dt):
+            self._on_obstacle_hit(shooter, obstacle)
+        shooter.check_walls()
+
+    def _on_obstacle_hit(self, shooter, obstacle):
+        self._emit(OBSTACLE, shooter.x, shooter.y)
+
     def move_left(self):
-        if (self.my_paddle.location[0] - self.my_paddle.width / 2 - 20) >= -self.canvas_width:
-            self.my_paddle.set_location(
-                [self.my_paddle.location[0] - 20, self.my_paddle.location[1]])
-            if self.shooter_ready:
-                self.shooter.x = self.my_paddle.location[0]
-                self.shooter.y = self.my_paddle.location[1] + \
-                    self.my_paddle.height
+        if self.my_paddle.can_move(-20):
+            self.my_paddle.x -= 20
+            self._on_paddle_moved()
 
     def move_right(self):
-        if (self.my_paddle.location[0] + self.my_paddle.width / 2 + 20) <= self.canvas_width:
-            self.my_paddle.set_location(
-                [self.my_paddle.location[0] + 20, self.my_paddle.location[1]])
-            if self.shooter_ready:
-                self.shooter.x = self.my_paddle.location[0]
-                self.shooter.y = self.my_paddle.location[1] + \
-                    self.my_paddle.height
+        if self.my_paddle.can_move(20):
+            self.my_paddle.x += 20
+            self._on_paddle_moved()
+
+    def _slide_paddle(self, held):
+        # Move the paddle for one tick of the arrow keys in `held`
+        my_paddle = self.my_paddle
+        my_paddle.vx = paddle.SPEED * ((held & RIGHT_KEY != 0) - (held & LEFT_KEY != 0))
+        if my_paddle.vx:
+            x = my_paddle.x
+            my_paddle.move(self.physics_dt)
+            if my_paddle.x != x:
+                self._on_paddle_moved()
+
+    def _on_paddle_moved(self):
+        # A shot waiting to be fired sits on the paddle and moves with it
+        self._invalidate(self.my_paddle)
+        if self.shooter_ready:
+            self.shooter.x = self.my_paddle.x
+            self.shooter.y = self.my_paddle.y + \
+                self.my_paddle.height
+            self._invalidate(self.shooter)
 
     def check_game_over(self):
-        if self.lives <= 0:
-            print("Game Over")
-            turtle.bye()
+        if self.lives <= 0 and not self.game_over:
+            self._emit(GAME_OVER, self.shots, self.hits)
+            self.game_over = True
 
     def shoot(self):
         if self.shooter_ready:
@@ -418,46 +806,343 @@ class CatchAndShootGame:
             self.shooter_ready = False
 
             # Position the ball slightly above the paddle before shooting
-            self.shooter.y = self.my_paddle.location[
-                1] + self.my_paddle.height + self.shooter.size  # Position it above the paddle
+            self.shooter.y = self.my_paddle.y + self.my_paddle.height + self.shooter.size  # Position it above the paddle
 
             # Set the velocity to move the ball upwards
             self.shooter.vy = 500
             self.shooter.vx = 0
+            self.shots += 1
+            self._invalidate(self.shooter)
+
+    def queue_input(self, action):
+        # Inputs are queued and applied at the start of the next tick, so when they
+        # take effect does not depend on when the key event arrived mid-frame
+        self.pending_inputs.append(action)
+
+    def apply_input(self, action):
+        if action == "left":
+            self.move_left()
+        elif action == "right":
+            self.move_right()
+        elif action == "shoot":
+            self.shoot()
+        elif action in KEY_EVENTS:
+            key, down = KEY_EVENTS[action]
+            if down:
+                self.keys_held |= key
+                self.keys_pressed |= key
+            else:
+                self.keys_held &= ~key
+        else:
+            raise ValueError("unknown input " + repr(action))
+
+    def step(self, dt):
+        # Advance the simulation by dt seconds. Safe to call without a renderer.
+        profiler = self.profiler
+        self._update_timer(dt)  # Update level timer
+        if profiler is not None:
+            profiler.mark("timer")
+        self.current_level.update(dt=dt)  # Move balls and check every collision
+        if self.event_sim is None:
+            self._check_obstacle_collision(dt)  # Move obstacles and bounce them off the walls
+            if profiler is not None:
+                profiler.mark("obstacles")
+
+        # Check for game over
+        self.check_game_over()
+
+    def tick(self):
+        # One fixed physics step, with the inputs queued since the last one
+        held = self.keys_held
+        for action in self.pending_inputs:
+            if action not in KEY_EVENTS:
+                self.input_log.append((self.tick_count, action))
+            self.apply_input(action)
+        self.pending_inputs.clear()
+        pressed = self.keys_pressed
+        if pressed or held != self.keys_held:
+            self._log_keys(held, pressed)
+            self.keys_pressed = 0
+        self._slide_paddle(held | pressed)
+        if self.profiler is not None:
+            self.profiler.mark("input")
+
+        # Headless games never interpolate, so skip remembering positions
+        if self.renderer is not None:
+            positions = self.previous_positions
+            positions.clear()
+            for body in self.world.balls():
+                positions[id(body)] = (body.x, body.y)
+            for obstacle in self.obstacles:
+                positions[id(obstacle)] = (obstacle.x, obstacle.y)
+
+        self.step(self.physics_dt)
+        self.tick_count += 1
+
+    def _log_keys(self, held, pressed):
+        # Record only what the tick's key events changed, so key repeat does not fill
+        # the log. Replaying these gives the same keys held and pressed.
+        for key, name in ((LEFT_KEY, "left"), (RIGHT_KEY, "right")):
+            was = held & key
+            now = self.keys_held & key
+            if now and not was:
+                self.input_log.append((self.tick_count, name + "_down"))
+            elif was and not now:
+                self.input_log.append((self.tick_count, name + "_up"))
+            elif pressed & key and not was:
+                # Pressed and released within the tick
+                self.input_log.append((self.tick_count, name + "_down"))
+                self.input_log.append((self.tick_count, name + "_up"))
+
+    def simulate(self, ticks, input_log=()):
+        # Run headless for up to `ticks` ticks, feeding inputs from a (tick, action)
+        # log such as another game's input_log. Stops early on game over.
+        inputs = sorted(input_log, key=lambda entry: entry[0])
+        k = 0
+        end = self.tick_count + ticks
+        while self.tick_count < end and not self.game_over:
+            while k < len(inputs) and inputs[k][0] <= self.tick_count:
+                self.queue_input(inputs[k][1])
+                k += 1
+            self.tick()
+
+    def snapshot(self, out=None):
+        # Pack the whole simulation state, RNG included, into SNAPSHOT_SIZE bytes laid
+        # out as SNAPSHOT. Pass a writable buffer (a bytearray, or a slice of a bigger
+        # one) as out to fill it in place; otherwise a new bytearray is returned.
+        # Take snapshots between ticks: queued inputs are not part of the state.
+        obstacles = self.obstacles
+        if len(obstacles) > SNAPSHOT_OBSTACLES:
+            raise ValueError(f"snapshot holds at most {SNAPSHOT_OBSTACLES} obstacles, not {len(obstacles)}")
+        if out is None:
+            out = bytearray(SNAPSHOT_SIZE)
+        paddle = self.my_paddle
+        shooter = self.shooter
+        target = self.target
+        values = [SNAPSHOT_VERSION, self.tick_count, self.lives, self.score, self.level_score,
+                  self.level_score_threshold, self.shots, self.hits, self.current_level.number - 1,
+                  self.shooter_ready | self.game_over << 1 | self.won << 2 | self.keys_held << 3, len(obstacles),
+                  self.level_timer, self.obstacle_speed, self.event_sim.t if self.event_sim is not None else 0.0,
+                  self.arena.width, self.arena.height,
+                  paddle.x, paddle.y, paddle.count,
+                  shooter.x, shooter.y, shooter.vx, shooter.vy, shooter.size, shooter.count,
+                  target.x, target.y, target.vx, target.vy, target.size, target.count]
+        for obstacle in obstacles:
+            values += (obstacle.x, obstacle.y, obstacle.vx, obstacle.vy, obstacle.width, obstacle.height,
+                       obstacle.count)
+        values += _EMPTY_OBSTACLE * (SNAPSHOT_OBSTACLES - len(obstacles))
+        countdown = getattr(self.current_level, "countdown", None)
+        values += (self.seed, self.spawn_rng.drawn, self.steering_rng.drawn, self.layout_rng.drawn,
+                   countdown if countdown is not None else -1)
+
+        events = self.event_sim.pending() if self.event_sim is not None else []
+        if len(events) > SNAPSHOT_EVENTS:
+            raise ValueError(f"snapshot holds at most {SNAPSHOT_EVENTS} events, not {len(events)}")
+        values.append(len(events))
+        SNAPSHOT.pack_into(out, 0, *values)
+        if events:
+            index = {id(body): i for i, body in enumerate((paddle, shooter, target, *obstacles,
+                                                           *self.geometry.items))}
+            offset = SNAPSHOT.size
+            for event in events:
+                SNAPSHOT_EVENT.pack_into(out, offset, event.time, KINDS.index(event.kind), index[id(event.a)],
+                                         index[id(event.b)] if event.b is not None else _NO_BODY)
+                offset += SNAPSHOT_EVENT.size
+        return out
+
+    def restore(self, buffer):
+        # Return to a snapshot() of this game, or of another game with the same config.
+        # The paddle, balls and obstacles are updated in place, so whatever is drawing
+        # them carries on. Queued inputs are dropped and input_log is cut back to the
+        # snapshot's tick, so a replay saved afterwards follows the restored timeline.
+        values = SNAPSHOT.unpack_from(buffer)
+        if values[0] != SNAPSHOT_VERSION:
+            raise ValueError(f"snapshot layout version {values[0]}, expected {SNAPSHOT_VERSION}")
+        (_, self.tick_count, self.lives, self.score, self.level_score, self.level_score_threshold,
+         self.shots, self.hits, level, flags, count, self.level_timer, self.obstacle_speed,
+         event_time, width, height) = values[:16]
+        self.shooter_ready = bool(flags & 1)
+        self.game_over = bool(flags & 2)
+        self.won = bool(flags & 4)
+        self.keys_held = flags >> 3 & (LEFT_KEY | RIGHT_KEY)
+        self.keys_pressed = 0
+        if self.current_level.number != level + 1:
+            self.current_level = level_class(level + 1)(self)
+        if width != self.arena.width or height != self.arena.height:
+            self.arena.resize(width, height)  # Before the bodies, which it would clamp
+
+        paddle = self.my_paddle
+        paddle.x = values[16]
+        paddle.y = values[17]
+        paddle.count = values[18]
+        shooter = self.shooter
+        target = self.target
+        shooter.x, shooter.y, shooter.vx, shooter.vy, shooter.size, shooter.count = values[19:25]
+        target.x, target.y, target.vx, target.vy, target.size, target.count = values[25:31]
+
+        obstacles = self.obstacles
+        while len(obstacles) > count:
+            self.obstacle_grid.remove(obstacles.pop())
+        while len(obstacles) < count:
+            obstacles.append(Obstacle(50, 20, 0, 0, 0, 0, (0, 0, 255), arena=self.arena))
+        i = 31
+        for obstacle in obstacles:
+            (obstacle.x, obstacle.y, obstacle.vx, obstacle.vy, obstacle.width, obstacle.height,
+             obstacle.count) = values[i:i + 7]
+            self.obstacle_grid.update_box(obstacle)
+            i += 7
+
+        i = 31 + 7 * SNAPSHOT_OBSTACLES
+        if values[i] != self.seed:
+            # A snapshot of another game: take its streams too
+            self.seed = values[i]
+            self.spawn_rng = Stream(self.seed, SPAWN)
+            self.steering_rng = Stream(self.seed, STEERING)
+            self.layout_rng = Stream(self.seed, LAYOUT)
+        self.spawn_rng.seek(values[i + 1])
+        self.steering_rng.seek(values[i + 2])
+        self.layout_rng.seek(values[i + 3])
+        if isinstance(self.current_level, Level3):
+            self.current_level.countdown = values[i + 4] if values[i + 4] >= 0 else None
+
+        self.pending_inputs.clear()
+        log = self.input_log
+        while log and log[-1][0] >= self.tick_count:
+            log.pop()
+        self.previous_positions.clear()
+        if self.event_sim is not None:
+            bodies = (paddle, shooter, target, *obstacles, *self.geometry.items)
+            events = []
+            for time, kind, a, b in SNAPSHOT_EVENT.iter_unpack(
+                    memoryview(buffer)[SNAPSHOT.size:SNAPSHOT.size + values[-1] * SNAPSHOT_EVENT.size]):
+                events.append((time, KINDS[kind], bodies[a], bodies[b] if b != _NO_BODY else None))
+            self.event_sim.load(event_time, events)
+
+    def render_position(self, body, alpha):
+        # Where to draw body when the render falls `alpha` of the way between the
+        # last two ticks
+        previous = self.previous_positions.get(id(body))
+        if previous is None:
+            return body.x, body.y
+        dx = body.x - previous[0]
+        dy = body.y - previous[1]
+        # A reset or respawn jumps further than a tick of motion could; don't smear it
+        reach = 2 * (abs(body.vx) + abs(body.vy)) * self.physics_dt + 1
+        if abs(dx) + abs(dy) > reach:
+            return body.x, body.y
+        return previous[0] + dx * alpha, previous[1] + dy * alpha
 
     def run(self):
-        self.screen.listen()
-        self.screen.onkey(self.move_left, "Left")
-        self.screen.onkey(self.move_right, "Right")
-        self.screen.onkey(self.shoot, "space")
-
-        last_time = time.time()  # Track the last update time
-
-        try:
-            while True:
-                # Calculate the time delta since the last frame
-                current_time = time.time()
-                dt = current_time - last_time
-                last_time = current_time
-
-                # Update game logic with calculated `dt`
-                self._check_collision()  # Check ball collisions with other objects
-                self._check_wall_collision()  # Check ball-wall collisions
-                self._check_obstacle_collision(dt)  # Check for ball-obstacle collisions
-                self._update_timer(dt)  # Update level timer based on real elapsed time
-                self.current_level.update(dt=dt)  # Update current level logic with `dt`
-
-                # Redraw the game state
-                turtle.update()
-
-                # Check for game over
-                self.check_game_over()
-
-                # Limit frame rate (optional, adjust as needed)
-                time.sleep(max(0, (1.0 / self.HZ) - (time.time() - current_time)))
-        except turtle.Terminator:
-            pass
-
-# Run the game
-game = CatchAndShootGame()
-game.run()
+        self.renderer.bind_keys(self)
+
+        render_dt = 1.0 / self.render_hz
+        accumulator = 0.0
+        last_time = time.perf_counter()  # Track the last update time
+
+        profiler = self.profiler
+        while not self.game_over and not self.renderer.closed:
+            current_time = time.perf_counter()
+            accumulator += current_time - last_time
+            last_time = current_time
+            if profiler is not None:
+                profiler.begin_frame()
+
+            # Run as many fixed ticks as the elapsed time calls for. If rendering fell
+            # so far behind that this would take more than max_ticks_per_frame ticks,
+            # skip the rest rather than spiralling.
+            ticks = 0
+            while accumulator >= self.physics_dt and not self.game_over:
+                if ticks == self.max_ticks_per_frame:
+                    accumulator = 0.0
+                    break
+                self.tick()
+                accumulator -= self.physics_dt
+                ticks += 1
+
+            # Redraw the game state, with a single canvas update per frame
+            self._redraw(accumulator / self.physics_dt)
+            if profiler is not None:
+                profiler.mark("redraw")
+            self.renderer.update()
+            if profiler is not None:
+                profiler.mark("present")
+
+            # Sleep until the next frame is due
+            time.sleep(max(0, render_dt - (time.perf_counter() - current_time)))
+            if profiler is not None:
+                profiler.mark("sleep")
+                profiler.end_frame()
+
+        self.renderer.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    from renderer import TurtleRenderer
+
+    parser = argparse.ArgumentParser(description="Catch and Shoot")
+    parser.add_argument("--seed", type=int, default=None, help="seed for a reproducible game")
+    parser.add_argument("--record", metavar="PATH", help="save a replay of the game to PATH")
+    parser.add_argument("--profile", action="store_true", help="show per-phase frame timings on screen")
+    parser.add_argument("--profile-out", metavar="PATH", help="save frame timings to PATH (.csv or .json)")
+    parser.add_argument("--fit-window", action="store_true", help="resize the field with the window")
+    parser.add_argument("--aim-assist", action="store_true", help="show where and when to shoot")
+    parser.add_argument("--telemetry", metavar="PATH",
+                        help="log game events to PATH (.jsonl for JSON lines, - for stdout, else binary)")
+    parser.add_argument("--sample", action="append", default=[], metavar="EVENT=N",
+                        help="log only one in N of an event, e.g. obstacle=10")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="run the game loop on asyncio")
+    parser.add_argument("--levels", type=int, metavar="N",
+                        help="play N levels (past 3 they are generated), each laid out ahead of time and "
+                             "checked to be playable")
+    parser.add_argument("--geometry", metavar="PATH",
+                        help="add level geometry from a JSON file: a list of shapes, each a list of "
+                             "[x, y] corners (two for a line segment)")
+    args = parser.parse_args()
+    if args.fit_window and args.record:
+        # A replay stores one arena size, so a field that changes mid-game cannot be replayed
+        parser.error("--fit-window cannot be used with --record")
+
+    profiler = None
+    if args.profile or args.profile_out:
+        from profiler import FrameProfiler
+        profiler = FrameProfiler(overlay=args.profile)
+
+    telemetry = None
+    if args.telemetry:
+        from telemetry import Telemetry
+        telemetry = Telemetry()
+        for item in args.sample:
+            event, every = item.split("=", 1)
+            telemetry.set_sample(event, int(every))
+        telemetry.start(args.telemetry)
+
+    config = {}
+    if args.levels:
+        config["levels"] = {"last": args.levels}
+    if args.geometry:
+        import json
+        with open(args.geometry) as f:
+            config["geometry"] = json.load(f)
+
+    # Run the game
+    game = CatchAndShootGame(renderer=TurtleRenderer(fit_window=args.fit_window), seed=args.seed, config=config,
+                             profiler=profiler, aim_assist=args.aim_assist, telemetry=telemetry)
+    if args.use_async:
+        import asyncio
+        from async_loop import AsyncGameLoop
+        asyncio.run(AsyncGameLoop(game).run())
+    else:
+        game.run()
+
+    if args.profile_out:
+        profiler.export(args.profile_out)
+
+    game.close()
+    if telemetry is not None:
+        telemetry.close()
+
+    if args.record:
+        from replay import Replay
+        Replay.from_game(game).save(args.record)
@@ -0,0 +1,335 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import socket
+import time
+from collections import deque
+
+from run_ball import CatchAndShootGame
+
+# Wire protocol, one line per message in each direction:
+#   client -> server  "<seq> left|right|shoot"   an input, applied at the next tick
+#                     "<seq> left_down|left_up|right_down|right_up"
+#                                                an arrow key going down or up; the
+#                                                paddle slides while one is held
+#                     "stats"                    ask for this session's metrics
+#   server -> client  JSON objects. The first is a full state with the session id;
+#                     after that, each tick sends only the fields that changed since
+#                     the last update the client was actually sent, with "t" (tick)
+#                     and "ack" (highest input seq applied). A finished game sends
+#                     "over", after which the server sends nothing more and
+#                     ignores input; the client closes the connection.
+ACTIONS = ("left", "right", "shoot", "left_down", "left_up", "right_down", "right_up")
+
+
+# Fields of a state update, in the order Session.state() lists them. Obstacle
+# positions follow as o0, o1, ...; positions are sent to a tenth of a pixel.
+FIELDS = ("px", "sx", "sy", "ready", "tx", "ty", "tr", "lives", "score", "level", "timer", "n")
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+
+class LatencyStats:
+    # Rolling window of latency samples in seconds, with nearest-rank percentiles
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentiles(self, points=(50, 95, 99)):
+        values = sorted(self.samples)
+        if not values:
+            return {f"p{p}": math.nan for p in points}
+        return {f"p{p}": values[max(0, math.ceil(p / 100 * len(values)) - 1)] for p in points}
+
+    def summary(self):
+        result = {name: value * 1000 for name, value in self.percentiles().items()}  # in ms
+        result["count"] = self.count
+        return result
+
+
+class Session:
+    # One client's game and connection state
+    def __init__(self, session_id, game, writer):
+        self.id = session_id
+        self.game = game
+        self.writer = writer
+        self.sent = []  # State values as of the last update written
+        self.inputs = []  # (seq, action, time received) waiting for the next tick
+        self.ack = -1
+        self.input_latency = LatencyStats()  # Input received -> applied by a tick
+        self.updates = 0
+        self.skipped = 0  # Updates held back because the client was not reading
+        self.dropped = 0  # Inputs dropped because too many were waiting for a tick
+        self.stalled_since = None
+        self.bytes = 0
+        self.finished = False
+        self.closed = False
+
+    def state(self):
+        game = self.game
+        shooter = game.shooter
+        target = game.target
+        obstacles = game.obstacles
+        values = [round(game.my_paddle.x, 1), round(shooter.x, 1), round(shooter.y, 1),
+                  game.shooter_ready, round(target.x, 1), round(target.y, 1), round(target.size, 1),
+                  game.lives, game.level_score, type(game.current_level).__name__, int(game.level_timer),
+                  len(obstacles)]
+        for obstacle in obstacles:
+            values.append([round(obstacle.x, 1), round(obstacle.y, 1)])
+        return values
+
+    def delta(self):
+        # Fields that differ from what the client last received. Comparing flat
+        # lists keeps this cheap when most fields have not changed.
+        values = self.state()
+        sent = self.sent
+        changed = {}
+        for i, value in enumerate(values):
+            if i >= len(sent) or sent[i] != value:
+                changed[FIELDS[i] if i < len(FIELDS) else f"o{i - len(FIELDS)}"] = value
+        self.sent = values
+        return changed
+
+    def send(self, message):
+        data = (_encode(message) + "\n").encode()
+        self.writer.write(data)
+        self.bytes += len(data)
+        self.updates += 1
+
+    def metrics(self):
+        return {
+            "id": self.id,
+            "tick": self.game.tick_count,
+            "input_latency_ms": self.input_latency.summary(),
+            "updates": self.updates,
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "bytes": self.bytes,
+        }
+
+
+class GameServer:
+    # Hosts many headless CatchAndShootGame sessions in one process. A single
+    # asyncio task ticks every session on absolute deadlines, then writes each
+    # client a delta update.
+    #
+    # Writes never block the tick. A client with more than max_buffer bytes queued
+    # is skipped for that tick (back-pressure). Its changes pile up in its next
+    # delta, because deltas are taken against what it was last sent. A client
+    # that stays stalled for max_stall seconds is disconnected.
+    #
+    # Updates are small, so the kernel's socket buffer alone could hold minutes of
+    # them before anything queued up here. send_buffer caps it (SO_SNDBUF), so a
+    # client that stops reading is noticed within a second or two.
+    #
+    # Reading is bounded too: at most max_inputs inputs wait for a tick, and a line
+    # past the stream limit closes that client's session.
+    def __init__(self, physics_hz=30, mode="poll", config=None, seed=None, max_buffer=16 * 1024,
+                 max_stall=5.0, send_buffer=8 * 1024, max_inputs=64):
+        self.physics_hz = physics_hz
+        self.mode = mode
+        self.config = config if config is not None else {}
+        self.rng = random.Random(seed)
+        self.max_buffer = max_buffer
+        self.max_stall = max_stall
+        self.send_buffer = send_buffer
+        self.max_inputs = max_inputs
+        self.sessions = {}
+        self.next_id = 0
+        self.ticks = 0
+        self.tick_time = LatencyStats()  # Wall time of one tick of every session
+        self.input_latency = LatencyStats(window=10000)  # Every session's, for the server-wide view
+        self.late_ticks = 0  # Ticks dropped because a round ran past its deadline
+        self.finished = 0
+
+    def new_game(self):
+        return CatchAndShootGame(mode=self.mode, seed=self.rng.randrange(2**32),
+                                 physics_hz=self.physics_hz, config=self.config)
+
+    async def handle_client(self, reader, writer):
+        sock = writer.get_extra_info("socket")
+        if sock is not None and self.send_buffer:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+        session = Session(self.next_id, self.new_game(), writer)
+        self.next_id += 1
+        self.sessions[session.id] = session
+        message = session.delta()
+        message["id"] = session.id
+        message["t"] = session.game.tick_count
+        session.send(message)
+        try:
+            while not session.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                parts = line.split()
+                if session.finished:
+                    continue
+                if parts == [b"stats"]:
+                    session.send({"stats": session.metrics()})
+                elif len(parts) == 2 and parts[0].isdigit() and parts[1].decode() in ACTIONS:
+                    if len(session.inputs) >= self.max_inputs:
+                        # Flooding faster than the ticks can apply: drop, and never ack, the extra
+                        session.dropped += 1
+                    else:
+                        session.inputs.append((int(parts[0]), parts[1].decode(), time.perf_counter()))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except (ValueError, asyncio.LimitOverrunError):
+            # A line longer than the stream limit, or bytes that are not text
+            pass
+        finally:
+            self.close_session(session)
+
+    def close_session(self, session):
+        if session.closed:
+            return
+        session.closed = True
+        self.sessions.pop(session.id, None)
+        try:
+            session.writer.close()
+        except ConnectionError:
+            pass
+
+    def end_session(self, session):
+        # Stop ticking a finished game. Half-closing, rather than closing, means
+        # key presses still in flight from the client cannot reset the connection
+        # and lose the final update.
+        session.finished = True
+        self.finished += 1
+        self.sessions.pop(session.id, None)
+        if session.writer.can_write_eof():
+            session.writer.write_eof()
+        else:
+            self.close_session(session)
+
+    def tick_session(self, session, now):
+        if session.writer.is_closing():
+            # The client went away since the last tick
+            self.close_session(session)
+            return
+        game = session.game
+        if not game.game_over:
+            for seq, action, received in session.inputs:
+                game.queue_input(action)
+                session.ack = max(session.ack, seq)
+                session.input_latency.add(now - received)
+                self.input_latency.add(now - received)
+            session.inputs = []
+            game.tick()
+
+        if session.writer.transport.get_write_buffer_size() > self.max_buffer:
+            # The client is not keeping up: hold its updates back
+            session.skipped += 1
+            if session.stalled_since is None:
+                session.stalled_since = now
+            elif now - session.stalled_since > self.max_stall:
+                self.close_session(session)
+            return
+        session.stalled_since = None
+
+        message = session.delta()
+        message["t"] = game.tick_count
+        message["ack"] = session.ack
+        if game.game_over:
+            message["over"] = True
+            message["won"] = game.won
+        session.send(message)
+        if game.game_over:
+            self.end_session(session)
+
+    def tick_all(self):
+        start = time.perf_counter()
+        for session in list(self.sessions.values()):
+            self.tick_session(session, start)
+        self.ticks += 1
+        self.tick_time.add(time.perf_counter() - start)
+
+    async def run_ticks(self):
+        loop = asyncio.get_running_loop()
+        dt = 1.0 / self.physics_hz
+        deadline = loop.time()
+        while True:
+            now = loop.time()
+            if now < deadline:
+                await asyncio.sleep(deadline - now)
+                continue
+            # A round that overran drops the ticks it missed instead of bunching them
+            behind = int((now - deadline) / dt)
+            if behind:
+                self.late_ticks += behind
+                deadline += behind * dt
+            self.tick_all()
+            deadline += dt
+            # Yield every round, even when behind, or no client is read or written
+            # until the rounds catch up
+            await asyncio.sleep(0)
+
+    def metrics(self):
+        return {
+            "sessions": len(self.sessions),
+            "finished": self.finished,
+            "ticks": self.ticks,
+            "late_ticks": self.late_ticks,
+            "tick_ms": self.tick_time.summary(),
+            "input_latency_ms": self.input_latency.summary(),
+        }
+
+    async def report(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            metrics = self.metrics()
+            tick = metrics["tick_ms"]
+            latency = metrics["input_latency_ms"]
+            print(f"sessions {metrics['sessions']:6d}  tick p50 {tick['p50']:7.2f} ms  p99 {tick['p99']:7.2f} ms  "
+                  f"input p99 {latency['p99']:6.1f} ms  late ticks {metrics['late_ticks']}  "
+                  f"finished {metrics['finished']}", flush=True)
+
+    async def serve(self, host="127.0.0.1", port=8765, unix=None, report_interval=5.0):
+        if unix:
+            server = await asyncio.start_unix_server(self.handle_client, unix, backlog=4096)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port, backlog=4096)
+        tasks = [asyncio.create_task(self.run_ticks())]
+        if report_interval:
+            tasks.append(asyncio.create_task(self.report(report_interval)))
+        async with server:
+            try:
+                await server.serve_forever()
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host headless Catch and Shoot sessions over sockets")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--hz", type=int, default=30, help="physics ticks per second for every session")
+    parser.add_argument("--mode", choices=("poll", "event"), default="poll")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-buffer", type=int, default=16 * 1024,
+                        help="bytes queued to a client before its updates are held back")
+    parser.add_argument("--send-buffer", type=int, default=8 * 1024,
+                        help="kernel send buffer per client (SO_SNDBUF), 0 for the system default")
+    parser.add_argument("--max-inputs", type=int, default=64,
+                        help="inputs a client may have waiting for the next tick; more are dropped")
+    parser.add_argument("--report", type=float, default=5.0, help="seconds between metric lines (0 for none)")
+    args = parser.parse_args()
+
+    server = GameServer(args.hz, args.mode, seed=args.seed, max_buffer=args.max_buffer,
+                        send_buffer=args.send_buffer, max_inputs=args.max_inputs)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix, args.report))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
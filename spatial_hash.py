@@ -0,0 +1,109 @@
+import math
+
+
+class SpatialHash:
+    # Uniform-grid broad phase. Every item is filed under each cell its bounding box
+    # covers, so a query only has to look at the items in the cells it overlaps.
+    # update() only touches the grid when an item moves into a different set of cells.
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}  # (column, row) -> list of items
+        self.ranges = {}  # id(item) -> (item, (col0, row0, col1, row1))
+
+        # Broad-phase statistics: pairs a brute-force loop would have tested,
+        # against the pairs that were actually handed to the narrow phase
+        self.pairs_considered = 0
+        self.pairs_tested = 0
+
+    def _cell_range(self, left, bottom, right, top):
+        size = self.cell_size
+        return (math.floor(left / size), math.floor(bottom / size),
+                math.floor(right / size), math.floor(top / size))
+
+    def _add(self, item, cell_range):
+        col0, row0, col1, row1 = cell_range
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                self.cells.setdefault((col, row), []).append(item)
+
+    def _discard(self, item, cell_range):
+        col0, row0, col1, row1 = cell_range
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                bucket = self.cells[(col, row)]
+                bucket.remove(item)
+                if not bucket:
+                    del self.cells[(col, row)]
+
+    def clear(self):
+        self.cells = {}
+        self.ranges = {}
+
+    def update(self, item, left, bottom, right, top):
+        # Insert item, or move it if it is already in the grid
+        cell_range = self._cell_range(left, bottom, right, top)
+        entry = self.ranges.get(id(item))
+        if entry is not None:
+            if entry[1] == cell_range:
+                return
+            self._discard(item, entry[1])
+        self._add(item, cell_range)
+        self.ranges[id(item)] = (item, cell_range)
+
+    def update_box(self, item):
+        # Convenience for centre / width / height boxes such as Obstacle
+        self.update(item, item.x - item.width / 2, item.y - item.height / 2,
+                    item.x + item.width / 2, item.y + item.height / 2)
+
+    def update_ball(self, b):
+        self.update(b, b.x - b.size, b.y - b.size, b.x + b.size, b.y + b.size)
+
+    def remove(self, item):
+        entry = self.ranges.pop(id(item), None)
+        if entry is not None:
+            self._discard(item, entry[1])
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def query(self, left, bottom, right, top):
+        # Items whose cells overlap the box, each listed once
+        col0, row0, col1, row1 = self._cell_range(left, bottom, right, top)
+        found = {}
+        cells = self.cells
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                bucket = cells.get((col, row))
+                if bucket:
+                    for item in bucket:
+                        found[id(item)] = item
+        self.pairs_considered += len(self.ranges)
+        self.pairs_tested += len(found)
+        return list(found.values())
+
+    def query_ball(self, b):
+        return self.query(b.x - b.size, b.y - b.size, b.x + b.size, b.y + b.size)
+
+    def pairs(self):
+        # Candidate pairs among the items themselves (e.g. many balls), each pair once
+        seen = set()
+        result = []
+        for bucket in self.cells.values():
+            for i in range(len(bucket)):
+                for j in range(i + 1, len(bucket)):
+                    a, b = bucket[i], bucket[j]
+                    key = (id(a), id(b)) if id(a) < id(b) else (id(b), id(a))
+                    if key not in seen:
+                        seen.add(key)
+                        result.append((a, b))
+        n = len(self.ranges)
+        self.pairs_considered += n * (n - 1) // 2
+        self.pairs_tested += len(result)
+        return result
+
+    def stats(self):
+        return {"pairs_considered": self.pairs_considered, "pairs_tested": self.pairs_tested}
+
+    def reset_stats(self):
+        self.pairs_considered = 0
+        self.pairs_tested = 0
@@ -0,0 +1,79 @@
+import math
+import numpy as np
+
+# Random streams, one per subsystem of a game, so that what one subsystem draws
+# never shifts what another gets. Respawns do not change when Level3 next turns,
+# and a new obstacle layout does not change either. Each stream is its own PCG64
+# generator, keyed by the game's seed and the stream's key below, and draws
+# uniform numbers in bulk into a table that the game then reads one at a time.
+SPAWN = 0  # Where the target appears and how fast it moves off
+STEERING = 1  # When and how Level3's target changes direction
+LAYOUT = 2  # Where obstacles go and how they move
+
+BLOCK = 512  # Numbers drawn from the generator at a time
+NEVER = 2**31 - 1  # wait() for an event with no chance of happening
+
+
+def generator(seed, *key):
+    # A NumPy Generator for stream `key` of seed, for code that draws whole arrays
+    # at a time (VectorEnv). seed may be None for fresh entropy, or a sequence of ints.
+    return np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed, spawn_key=key)))
+
+
+class Stream:
+    # Uniform numbers in [0, 1) from stream `key` of seed, with the few helpers of
+    # random.Random that the game uses. drawn counts the numbers handed out so far;
+    # seek(drawn) goes back (or forward) to any count, so that one integer is the
+    # whole state of a stream.
+    def __init__(self, seed, *key, block=BLOCK):
+        self.seed_sequence = np.random.SeedSequence(seed, spawn_key=key)
+        self.block = block
+        self.start = None  # Count at the first number in table; None until seek() draws it
+        self.seek(0)
+
+    @property
+    def drawn(self):
+        return self.start + self.pos
+
+    def seek(self, drawn):
+        # Each number takes one 64-bit output of the generator, so it can jump
+        # straight to the start of the block holding `drawn`
+        start = drawn - drawn % self.block
+        if start == self.start:
+            self.pos = drawn - start  # Still in the table already drawn
+            return
+        bit_generator = np.random.PCG64(self.seed_sequence)
+        bit_generator.advance(start)
+        self.generator = np.random.Generator(bit_generator)
+        self.start = start
+        self.table = self.generator.random(self.block).tolist()
+        self.pos = drawn - start
+
+    def random(self):
+        pos = self.pos
+        if pos == self.block:
+            self.start += self.block
+            self.table = self.generator.random(self.block).tolist()
+            pos = 0
+        self.pos = pos + 1
+        return self.table[pos]
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+    def randint(self, a, b):
+        # An integer from a to b inclusive
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, options):
+        return options[int(self.random() * len(options))]
+
+    def wait(self, chance):
+        # How many tries fail before the first success, when each succeeds with
+        # this chance: a geometric draw from a single number, in place of one draw
+        # per try
+        if chance <= 0:
+            return NEVER
+        if chance >= 1:
+            return 0
+        return min(NEVER, int(math.log(1.0 - self.random()) / math.log(1.0 - chance)))
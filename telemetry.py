@@ -0,0 +1,177 @@
+import json
+import struct
+import sys
+import threading
+
+# Structured game events. The game loop packs each event into a preallocated ring
+# buffer (a few hundred nanoseconds, no allocation, no I/O); a background thread
+# drains the buffer every so often and writes it out as JSON lines or as a binary
+# log of the raw records.
+#
+# If the writer falls a whole buffer behind, the oldest records are overwritten
+# rather than the loop waiting, and the writer counts them as lost.
+
+EVENTS = ("hit", "miss", "obstacle", "level", "life_lost", "timeout", "game_over", "won")
+HIT, MISS, OBSTACLE, LEVEL, LIFE_LOST, TIMEOUT, GAME_OVER, WON = range(len(EVENTS))
+
+# What the two numbers of each event are
+FIELDS = {
+    "hit": ("x", "y"),  # Where the target was hit
+    "miss": ("x", "lives"),  # Where the shot fell through the floor, lives left
+    "obstacle": ("x", "y"),  # Where the shot bounced off an obstacle
+    "level": ("timer", "hits"),  # Level timer on entering the level, total hits so far
+    "life_lost": ("lives", "timer"),  # Lives left, level timer
+    "timeout": ("lives", "score"),  # Lives left, level score when the time ran out
+    "game_over": ("shots", "hits"),
+    "won": ("shots", "hits"),
+}
+
+# One record: tick, event, level index (0 for Level1), two event-specific numbers
+RECORD = struct.Struct("<qBB6xdd")
+# Start of a binary log: magic, format version, record size
+LOG_HEADER = struct.Struct("<4sHH")
+LOG_MAGIC = b"CSTL"
+LOG_VERSION = 1
+
+
+def decode(record):
+    # A packed record as a dict, as written to JSON lines
+    tick, kind, level, a, b = record
+    name = EVENTS[kind]
+    first, second = FIELDS[name]
+    return {"tick": tick, "event": name, "level": level, first: a, second: b}
+
+
+class Telemetry:
+    # Event stream for one game. emit() is the only call the game loop makes.
+    #
+    # sample maps event names to N to keep only one in every N of that event
+    # (e.g. {"obstacle": 10}). Counters always count every event.
+    def __init__(self, capacity=4096, sample=None):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity * RECORD.size)
+        self.written = 0  # Records ever packed; the next goes in slot written % capacity
+        self.read = 0  # Records ever handed out by drain()
+        self.lost = 0  # Overwritten before drain() got to them
+        self.counts = [0] * len(EVENTS)
+        self.every = [1] * len(EVENTS)
+        for name, every in (sample or {}).items():
+            self.set_sample(name, every)
+        self.writer = None
+
+    def set_sample(self, event, every):
+        if event not in EVENTS:
+            raise ValueError(f"unknown event {event!r}, expected one of {', '.join(EVENTS)}")
+        if every < 1:
+            raise ValueError("sample rate must be 1 or more, not " + repr(every))
+        self.every[EVENTS.index(event)] = int(every)
+
+    def emit(self, tick, kind, level, a=0.0, b=0.0):
+        count = self.counts[kind] + 1
+        self.counts[kind] = count
+        if count % self.every[kind]:
+            return
+        RECORD.pack_into(self.buffer, self.written % self.capacity * RECORD.size, tick, kind, level, a, b)
+        self.written += 1
+
+    def counters(self):
+        counters = dict(zip(EVENTS, self.counts))
+        counters["recorded"] = self.written
+        counters["lost"] = self.lost
+        return counters
+
+    def drain(self):
+        # Packed records written since the last call, oldest first. Safe to call from
+        # another thread while the game keeps emitting.
+        end = self.written
+        start = max(self.read, end - self.capacity)
+        chunk = self._copy(start, end)
+        # Anything emitted during the copy may have overwritten its first records,
+        # counting one more that emit() may have packed but not yet counted
+        overwritten = self.written + 1 - self.capacity - start
+        if overwritten > 0:
+            chunk = chunk[overwritten * RECORD.size:]
+            start += overwritten
+        self.lost += start - self.read
+        self.read = end
+        return chunk
+
+    def recent(self, n=20):
+        # The last n records still in the buffer, decoded, oldest first
+        end = self.written
+        chunk = self._copy(max(0, end - min(n, self.capacity)), end)
+        return [decode(record) for record in RECORD.iter_unpack(chunk)]
+
+    def _copy(self, start, end):
+        if start >= end:
+            return b""
+        size = RECORD.size
+        first = start % self.capacity * size
+        last = end % self.capacity * size
+        if first < last:
+            return bytes(self.buffer[first:last])
+        return bytes(self.buffer[first:]) + bytes(self.buffer[:last])
+
+    def start(self, path, interval=0.1):
+        # Write events to path in the background: JSON lines if it ends in .jsonl
+        # (or is "-" for stdout), otherwise a binary log readable with read_log()
+        if self.writer is not None:
+            raise RuntimeError("telemetry is already being written")
+        self.writer = TelemetryWriter(self, path, interval)
+        self.writer.start()
+        return self
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer = None
+
+
+class TelemetryWriter(threading.Thread):
+    def __init__(self, telemetry, path, interval=0.1):
+        super().__init__(name="telemetry-writer", daemon=True)
+        self.telemetry = telemetry
+        self.path = path
+        self.interval = interval
+        self.binary = not (path == "-" or path.lower().endswith(".jsonl"))
+        self.stopping = threading.Event()
+
+    def run(self):
+        if self.path == "-":
+            self._write_all(sys.stdout)
+            return
+        with open(self.path, "wb" if self.binary else "w") as f:
+            if self.binary:
+                f.write(LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION, RECORD.size))
+            self._write_all(f)
+
+    def _write_all(self, f):
+        while True:
+            stopping = self.stopping.wait(self.interval)
+            chunk = self.telemetry.drain()  # One more drain after stop() for the last events
+            if chunk:
+                if self.binary:
+                    f.write(chunk)
+                else:
+                    f.write("".join(json.dumps(decode(record)) + "\n" for record in RECORD.iter_unpack(chunk)))
+                f.flush()
+            if stopping:
+                return
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+
+def read_log(path):
+    # Yield the events of a binary log written by Telemetry.start() as dicts
+    with open(path, "rb") as f:
+        magic, version, size = LOG_HEADER.unpack(f.read(LOG_HEADER.size))
+        if magic != LOG_MAGIC or version != LOG_VERSION or size != RECORD.size:
+            raise ValueError(f"{path} is not a version {LOG_VERSION} telemetry log")
+        while True:
+            chunk = f.read(RECORD.size * 1024)
+            if not chunk:
+                return
+            for record in RECORD.iter_unpack(chunk[:len(chunk) - len(chunk) % RECORD.size]):
+                yield decode(record)
@@ -0,0 +1,35 @@
+import pytest
+from evaluate import ScriptedPlayer
+from run_ball import CatchAndShootGame
+
+
+def _play(game, player, ticks):
+    for _ in range(ticks):
+        if game.game_over:
+            return
+        action = player.decide(game)
+        if action is not None:
+            game.queue_input(action)
+        game.tick()
+
+
+@pytest.mark.parametrize("mode", ["poll", "event"])
+def test_restore_continues_the_saved_run_exactly(mode):
+    # Play on from a restored snapshot and from the uninterrupted game, with the
+    # same inputs; every later snapshot must match byte for byte
+    game = CatchAndShootGame(mode=mode, seed=7)
+    _play(game, ScriptedPlayer(3), 600)
+    saved = bytes(game.snapshot())
+
+    expected = []
+    player = ScriptedPlayer(5)
+    for _ in range(20):
+        _play(game, player, 60)
+        expected.append(bytes(game.snapshot()))
+
+    restored = CatchAndShootGame(mode=mode, seed=7)
+    restored.restore(saved)
+    player = ScriptedPlayer(5)
+    for i, snapshot in enumerate(expected):
+        _play(restored, player, 60)
+        assert bytes(restored.snapshot()) == snapshot, f"differs {60 * (i + 1)} ticks after the restore"
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from run_ball import CatchAndShootGame, Obstacle
+from vector_env import NOOP, VectorEnv
+
+
+@pytest.mark.parametrize("mode", ["poll", "event"])
+def test_shot_between_two_converging_obstacles(mode):
+    game = CatchAndShootGame(seed=1, mode=mode)
+    shooter = game.shooter
+    game.shooter_ready = False
+    shooter.x, shooter.y, shooter.vx, shooter.vy = 0.0, 0.0, 0.0, 1.0
+    game._invalidate(shooter)
+    game.add_obstacle(Obstacle(50, 20, -36, 0, 50, 0, (0, 0, 255), arena=game.arena))
+    game.add_obstacle(Obstacle(50, 20, 36, 0, -50, 0, (0, 0, 255), arena=game.arena))
+    for _ in range(240):
+        game.step(1 / 120)
+        # Neither pumped up by bouncing between the two nor stuck in them
+        assert abs(shooter.vx) <= 100
+    left, right = game.obstacles[-2:]
+    assert left.vx < 0 < right.vx
+
+
+def test_vector_env_shot_between_two_converging_obstacles():
+    env = VectorEnv(1, config={"Level1": {"new_obstacles": 2}})
+    env.reset(seeds=1)
+    env.shooter_ready[:] = False
+    env.shooter_x[:] = 0
+    env.shooter_y[:] = 0
+    env.shooter_vx[:] = 0
+    env.shooter_vy[:] = 1
+    env.obstacle_x[0, :2] = [-36, 36]
+    env.obstacle_y[0, :2] = 0
+    env.obstacle_vx[0, :2] = [50, -50]
+    env.obstacle_vy[0, :2] = 0
+    for _ in range(240):
+        env.step(np.array([NOOP]))
+        assert abs(env.shooter_vx[0]) <= 100
+    assert env.obstacle_vx[0, 0] < 0 < env.obstacle_vx[0, 1]
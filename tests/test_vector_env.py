@@ -0,0 +1,27 @@
+import numpy as np
+from vector_env import NOOP, VectorEnv
+
+
+def test_ready_shot_stays_on_paddle_next_to_moving_obstacle():
+    env = VectorEnv(4, config={"Level1": {"new_obstacles": 3}})
+    env.reset(seeds=1)
+    # Drive an obstacle straight through where the resting shot sits
+    paddle_y = env._paddle_y()
+    env.obstacle_x[:, 0] = env.paddle_x - 60
+    env.obstacle_y[:, 0] = paddle_y + 25
+    env.obstacle_vx[:, 0] = 300
+    env.obstacle_vy[:, 0] = 0
+    for _ in range(60):
+        env.step(np.full(4, NOOP))
+        assert env.shooter_ready.all()
+        assert np.array_equal(env.shooter_x, env.paddle_x)
+        assert (env.shooter_vx == 0).all() and (env.shooter_vy == 0).all()
+
+
+def test_ready_shots_never_move():
+    env = VectorEnv(200, config={"Level1": {"new_obstacles": 3}})
+    env.reset(seeds=2)
+    for _ in range(600):
+        env.step(np.full(200, NOOP))
+        ready = env.shooter_ready
+        assert (env.shooter_vx[ready] == 0).all() and (env.shooter_vy[ready] == 0).all()
@@ -0,0 +1,512 @@
+import numpy as np
+from run_ball import Level1, Level2, Level3
+from streams import LAYOUT, SPAWN, STEERING, generator
+from world import DEFAULT_ARENA
+
+# Actions, by index
+ACTIONS = ("noop", "left", "right", "shoot")
+NOOP, LEFT, RIGHT, SHOOT = range(4)
+
+LEVELS = (Level1, Level2, Level3)
+OBSTACLE_WIDTH = 50
+OBSTACLE_HEIGHT = 20
+PADDLE_WIDTH = 100
+PADDLE_HEIGHT = 25
+PADDLE_STEP = 20
+SHOOT_SPEED = 500
+MIN_RESPAWN_SPEED = 10
+
+
+def _uniform_sign(rng, n, magnitude):
+    return np.where(rng.random(n) < 0.5, -magnitude, magnitude)
+
+
+def _sweep(px, py, dx, dy, hw, hh, r, horizon):
+    # Vectorized collision.sweep_circle_box. p is the circle centre relative to the
+    # box, d the velocity relative to the box. Returns (t, nx, ny) arrays with
+    # t = inf where there is no contact within horizon.
+    t = np.full(px.shape, np.inf)
+    nx = np.zeros(px.shape)
+    ny = np.zeros(px.shape)
+
+    # Already touching or overlapping: counts only if moving further in
+    cx = np.clip(px, -hw, hw)
+    cy = np.clip(py, -hh, hh)
+    ox = px - cx
+    oy = py - cy
+    touching = ox * ox + oy * oy <= r * r
+    inside = (ox == 0) & (oy == 0)
+    length = np.hypot(ox, oy)
+    length[length == 0] = 1
+    face_x = hw - np.abs(px) < hh - np.abs(py)
+    tnx = np.where(inside, np.where(face_x, np.where(px >= 0, 1.0, -1.0), 0.0), ox / length)
+    tny = np.where(inside, np.where(face_x, 0.0, np.where(py >= 0, 1.0, -1.0)), oy / length)
+    now = touching & (dx * tnx + dy * tny < 0)
+    t[now] = 0.0
+    nx[now] = tnx[now]
+    ny[now] = tny[now]
+
+    # Ray against the box grown by r on every side
+    ex = hw + r
+    ey = hh + r
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t1 = (-ex - px) / dx
+        t2 = (ex - px) / dx
+        tx_enter = np.where(dx == 0, np.where(np.abs(px) > ex, np.inf, -np.inf), np.minimum(t1, t2))
+        tx_exit = np.where(dx == 0, np.inf, np.maximum(t1, t2))
+        t1 = (-ey - py) / dy
+        t2 = (ey - py) / dy
+        ty_enter = np.where(dy == 0, np.where(np.abs(py) > ey, np.inf, -np.inf), np.minimum(t1, t2))
+        ty_exit = np.where(dy == 0, np.inf, np.maximum(t1, t2))
+    t_enter = np.maximum(np.maximum(tx_enter, ty_enter), 0.0)
+    entering = ~touching & (t_enter <= np.minimum(tx_exit, ty_exit)) & (t_enter <= horizon)
+    t_enter = np.where(entering, t_enter, 0.0)
+
+    qx = px + dx * t_enter
+    qy = py + dy * t_enter
+    top_bottom = entering & (np.abs(qx) <= hw)
+    sides = entering & ~top_bottom & (np.abs(qy) <= hh)
+    t[top_bottom] = t_enter[top_bottom]
+    ny[top_bottom] = np.where(qy[top_bottom] > 0, 1.0, -1.0)
+    t[sides] = t_enter[sides]
+    nx[sides] = np.where(qx[sides] > 0, 1.0, -1.0)
+
+    # Corner region: hit the quarter circle around the box corner, or miss entirely
+    corner = entering & ~top_bottom & ~sides
+    if corner.any():
+        mx = px - np.copysign(hw, qx)
+        my = py - np.copysign(hh, qy)
+        a = dx * dx + dy * dy
+        b = mx * dx + my * dy
+        c = mx * mx + my * my - r * r
+        disc = b * b - a * c
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tc = (-b - np.sqrt(disc)) / a
+        corner &= (disc >= 0) & (tc >= 0) & (tc <= horizon)
+        t[corner] = tc[corner]
+        nx[corner] = (mx[corner] + dx[corner] * tc[corner]) / r[corner]
+        ny[corner] = (my[corner] + dy[corner] * tc[corner]) / r[corner]
+    return t, nx, ny
+
+
+class VectorEnv:
+    # N independent Catch and Shoot games stepped in lockstep, for training and
+    # evaluating bots. Every game's state is a row of NumPy arrays and each step
+    # advances all of them with one batched update; nothing here touches turtle.
+    #
+    # The rules are those of CatchAndShootGame in poll mode at its fixed tick:
+    # levels and their config overrides, the shooter swept against moving obstacles,
+    # wall bounces, misses, paddle catches, the level timer and level transitions.
+    # The random draws come from three NumPy generators for the whole batch, one
+    # each for target spawns, target steering and obstacle layout, as in the game
+    # (streams.py). The same seeds and actions reproduce a batch exactly, but not a
+    # single game.
+    #
+    # step(actions) takes one action index per game (see ACTIONS), runs one physics
+    # tick and returns (observations, rewards, dones, infos). A hit is worth +1 and
+    # a lost life -1. A game that ends is reset straight away, so its observation is
+    # already the first of its next game; infos["won"] says how the finished one
+    # ended.
+    def __init__(self, num_envs, config=None, physics_hz=120, arena=None):
+        self.num_envs = num_envs
+        self.config = config if config is not None else {}
+        self.physics_dt = 1.0 / physics_hz
+        self.arena = arena if arena is not None else DEFAULT_ARENA
+
+        # Level parameters as arrays indexed by level, with config overrides applied
+        # by the Level classes themselves
+        levels = [cls(self) for cls in LEVELS]
+        self.target_size = np.array([level.target_size for level in levels], dtype=np.float64)
+        self.target_speed = np.array([level.target_speed for level in levels], dtype=np.float64)
+        self.respawn_speed = np.array([level.respawn_speed for level in levels], dtype=np.float64)
+        self.score_threshold = np.array([level.score_threshold for level in levels])
+        self.level_time = np.array([level.level_time for level in levels], dtype=np.float64)
+        self.redirect_chance = np.array([getattr(level, "redirect_chance", 0.0) for level in levels])
+        self.redirect_speed = np.array([getattr(level, "redirect_speed", 0.0) for level in levels])
+        self.new_obstacles = np.array([level.new_obstacles for level in levels])
+        self.obstacle_speed_x = np.array([level.obstacle_vx for level in levels], dtype=np.float64)
+        self.obstacle_speed_y = np.array([level.obstacle_vy for level in levels], dtype=np.float64)
+        self.max_obstacles = int(self.new_obstacles.sum())  # Every level's, by the last one
+
+        n = num_envs
+        self.paddle_x = np.zeros(n)
+        self.shooter_x = np.zeros(n)
+        self.shooter_y = np.zeros(n)
+        self.shooter_vx = np.zeros(n)
+        self.shooter_vy = np.zeros(n)
+        self.shooter_size = np.zeros(n)
+        self.shooter_ready = np.ones(n, dtype=np.bool_)
+        self.target_x = np.zeros(n)
+        self.target_y = np.zeros(n)
+        self.target_vx = np.zeros(n)
+        self.target_vy = np.zeros(n)
+        self.target_radius = np.zeros(n)
+        self.obstacle_x = np.zeros((n, self.max_obstacles))
+        self.obstacle_y = np.zeros((n, self.max_obstacles))
+        self.obstacle_vx = np.zeros((n, self.max_obstacles))
+        self.obstacle_vy = np.zeros((n, self.max_obstacles))
+        self.obstacle_count = np.zeros(n, dtype=np.int64)
+        self.lives = np.zeros(n, dtype=np.int64)
+        self.level = np.zeros(n, dtype=np.int64)
+        self.level_score = np.zeros(n, dtype=np.int64)
+        self.level_timer = np.zeros(n)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.slots = np.arange(self.max_obstacles)
+
+        self._seed(None)
+        self.reset()
+
+    def reset(self, seeds=None):
+        # Start every game over. seeds is an int or a sequence of ints, and seeds
+        # the generators behind every random draw, auto-resets included.
+        if seeds is not None:
+            self._seed(seeds)
+        self._reset_envs(np.arange(self.num_envs))
+        return self.observations()
+
+    def _seed(self, seeds):
+        self.spawn_rng = generator(seeds, SPAWN)
+        self.steering_rng = generator(seeds, STEERING)
+        self.layout_rng = generator(seeds, LAYOUT)
+
+    def _reset_envs(self, idx):
+        width = self.arena.width
+        self.paddle_x[idx] = 0
+        self.shooter_size[idx] = 0.025 * width
+        self.obstacle_count[idx] = 0
+        self.obstacle_x[idx] = 0
+        self.obstacle_y[idx] = 0
+        self.obstacle_vx[idx] = 0
+        self.obstacle_vy[idx] = 0
+        self.lives[idx] = 3
+        self.level[idx] = 0
+        self.level_score[idx] = 0
+        self.level_timer[idx] = self.level_time[0]
+        self.ticks[idx] = 0
+        self.target_vx[idx] = 0
+        self.target_vy[idx] = 0
+        self._catch_shooter(idx)
+        self._configure_target(idx)
+        self._add_obstacles(idx)
+
+    def _paddle_y(self):
+        return -self.arena.height + 60
+
+    def _catch_shooter(self, idx):
+        # Back onto the paddle, ready to shoot
+        self.shooter_ready[idx] = True
+        self.shooter_x[idx] = self.paddle_x[idx]
+        self.shooter_y[idx] = self._paddle_y() + PADDLE_HEIGHT
+        self.shooter_vx[idx] = 0
+        self.shooter_vy[idx] = 0
+
+    def _spawn_target(self, idx):
+        width = self.arena.width
+        height = self.arena.height
+        self.target_x[idx] = self.spawn_rng.integers(-width // 2, width // 2 + 1, len(idx))
+        self.target_y[idx] = self.spawn_rng.integers(0, height // 2 + 1, len(idx))
+
+    def _configure_target(self, idx):
+        # Level.configure_target: Level1 only places the target, later levels also
+        # give it a random velocity
+        level = self.level[idx]
+        moving = idx[level > 0]
+        speed = self.target_speed[self.level[moving]]
+        self.target_vx[moving] = self.spawn_rng.uniform(-speed, speed)
+        self.target_vy[moving] = self.spawn_rng.uniform(-speed, speed)
+        self.target_radius[idx] = self.target_size[level] * self.arena.width
+        self._spawn_target(idx)
+
+    def _add_obstacles(self, idx):
+        # Level.new_obstacles more for each game, at the speeds of the level it is
+        # entering
+        width = self.arena.width
+        height = self.arena.height
+        rng = self.layout_rng
+        level = self.level[idx]
+        count = self.new_obstacles[level]
+        for k in range(count.max(initial=0)):
+            adding = count > k
+            games = idx[adding]
+            slot = self.obstacle_count[games]
+            self.obstacle_x[games, slot] = rng.integers(-width // 2 + OBSTACLE_WIDTH,
+                                                        width // 2 - OBSTACLE_WIDTH + 1, len(games))
+            self.obstacle_y[games, slot] = rng.integers(-height // 2 + OBSTACLE_HEIGHT,
+                                                        height // 2 - OBSTACLE_HEIGHT + 1, len(games))
+            self.obstacle_vx[games, slot] = _uniform_sign(rng, len(games), self.obstacle_speed_x[level[adding]])
+            self.obstacle_vy[games, slot] = _uniform_sign(rng, len(games), self.obstacle_speed_y[level[adding]])
+            self.obstacle_count[games] += 1
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        dt = self.physics_dt
+        width = self.arena.width
+        height = self.arena.height
+        paddle_y = self._paddle_y()
+        rewards = np.zeros(self.num_envs)
+        done = np.zeros(self.num_envs, dtype=np.bool_)
+        won = np.zeros(self.num_envs, dtype=np.bool_)
+        self.ticks += 1
+
+        # Inputs: move_left / move_right / shoot
+        half = PADDLE_WIDTH / 2
+        for action, step in ((LEFT, -PADDLE_STEP), (RIGHT, PADDLE_STEP)):
+            x = self.paddle_x + step
+            moved = (actions == action) & (x - half >= -width) & (x + half <= width)
+            self.paddle_x[moved] = x[moved]
+            carried = moved & self.shooter_ready
+            self.shooter_x[carried] = self.paddle_x[carried]
+        shot = (actions == SHOOT) & self.shooter_ready
+        self.shooter_ready[shot] = False
+        self.shooter_y[shot] = paddle_y + PADDLE_HEIGHT + self.shooter_size[shot]
+        self.shooter_vx[shot] = 0
+        self.shooter_vy[shot] = SHOOT_SPEED
+
+        # Level timer: every tick past zero costs a life
+        self.level_timer -= dt
+        expired = self.level_timer <= 0
+        if expired.any():
+            self.lives[expired] -= 1
+            rewards[expired] -= 1
+            done |= expired & (self.lives <= 0)
+            idx = np.flatnonzero(expired & (self.lives > 0))
+            self.level_score[idx] = 0
+            self._catch_shooter(idx)
+            self._configure_target(idx)
+
+        # Level3's target changes direction at random
+        redirect = self.steering_rng.random(self.num_envs) < self.redirect_chance[self.level]
+        if redirect.any():
+            speed = self.redirect_speed[self.level[redirect]]
+            self.target_vx[redirect] = self.steering_rng.uniform(-speed, speed)
+            self.target_vy[redirect] = self.steering_rng.uniform(-speed, speed)
+
+        self._move_shooter(dt)
+        self._move_target(dt)
+
+        # Shooter against target
+        dx = self.shooter_x - self.target_x
+        dy = self.shooter_y - self.target_y
+        reach = self.shooter_size + self.target_radius
+        hit = dx * dx + dy * dy <= reach * reach
+        if hit.any():
+            idx = np.flatnonzero(hit)
+            self._on_ball_hit(idx, won, done)
+            rewards[idx] += 1
+
+        # Shooter reaching the bottom is a miss
+        missed = self.shooter_y - self.shooter_size <= -height
+        if missed.any():
+            self.lives[missed] -= 1
+            rewards[missed] -= 1
+            done |= missed & (self.lives <= 0)
+            idx = np.flatnonzero(missed)
+            self._catch_shooter(idx)
+            self.shooter_ready[idx] = self.lives[idx] > 0
+
+        # Paddle catches a falling shooter
+        caught = ~self.shooter_ready & (paddle_y <= self.shooter_y) & \
+            (self.shooter_y <= paddle_y + PADDLE_HEIGHT) & \
+            (np.abs(self.shooter_x - self.paddle_x) <= PADDLE_WIDTH / 2)
+        if caught.any():
+            self._catch_shooter(np.flatnonzero(caught))
+
+        self._move_obstacles(dt)
+
+        done |= self.lives <= 0
+        infos = {"won": won & done, "ticks": self.ticks.copy(), "level": self.level.copy()}
+        if done.any():
+            self._reset_envs(np.flatnonzero(done))
+        return self.observations(), rewards, done, infos
+
+    def _move_shooter(self, dt):
+        # CatchAndShootGame._move_shooter: sweep the shooter through the obstacles at
+        # their start-of-tick positions, bouncing at each time of impact, then bounce
+        # it off the side and top walls. A shot still on the paddle stays pinned to it.
+        ready = self.shooter_ready
+        self.shooter_x[ready] = self.paddle_x[ready]
+        self.shooter_y[ready] = self._paddle_y() + PADDLE_HEIGHT
+        self.shooter_vx[ready] = 0
+        self.shooter_vy[ready] = 0
+        active = self.slots < self.obstacle_count[:, None]
+        idx = np.flatnonzero(~ready & (self.obstacle_count > 0))
+        no_obstacles = np.flatnonzero(~ready & (self.obstacle_count == 0))
+        self.shooter_x[no_obstacles] += self.shooter_vx[no_obstacles] * dt
+        self.shooter_y[no_obstacles] += self.shooter_vy[no_obstacles] * dt
+
+        elapsed = np.zeros(len(idx))
+        remaining = np.full(len(idx), dt)
+        for _ in range(4):  # max_substeps, as in collision.advance_ball
+            if not len(idx):
+                break
+            ox = self.obstacle_x[idx] + self.obstacle_vx[idx] * elapsed[:, None]
+            oy = self.obstacle_y[idx] + self.obstacle_vy[idx] * elapsed[:, None]
+            vx = self.shooter_vx[idx]
+            vy = self.shooter_vy[idx]
+            t, nx, ny = _sweep(self.shooter_x[idx, None] - ox, self.shooter_y[idx, None] - oy,
+                               vx[:, None] - self.obstacle_vx[idx], vy[:, None] - self.obstacle_vy[idx],
+                               OBSTACLE_WIDTH / 2, OBSTACLE_HEIGHT / 2,
+                               np.broadcast_to(self.shooter_size[idx, None], ox.shape), remaining[:, None])
+            t[~active[idx]] = np.inf
+            first = np.argmin(t, axis=1)
+            rows = np.arange(len(idx))
+            t = t[rows, first]
+            hit = t != np.inf
+
+            # No more contacts: finish the step
+            free = ~hit
+            self.shooter_x[idx[free]] += vx[free] * remaining[free]
+            self.shooter_y[idx[free]] += vy[free] * remaining[free]
+
+            idx, first, t = idx[hit], first[hit], t[hit]
+            nx, ny = nx[rows[hit], first], ny[rows[hit], first]
+            vx, vy = vx[hit], vy[hit]
+            self.shooter_x[idx] += vx * t
+            self.shooter_y[idx] += vy * t
+            elapsed = elapsed[hit] + t
+            remaining = remaining[hit] - t
+
+            # Reflect relative to the obstacle, only if moving into it
+            ovx = self.obstacle_vx[idx, first]
+            ovy = self.obstacle_vy[idx, first]
+            dot = (vx - ovx) * nx + (vy - ovy) * ny
+            into = dot < 0
+            self.shooter_vx[idx] = np.where(into, vx - 2 * dot * nx, vx)
+            self.shooter_vy[idx] = np.where(into, vy - 2 * dot * ny, vy)
+            self._release_squeeze(idx, first, nx, ny, elapsed)
+        # A shooter still wedged after max_substeps stops for the rest of the tick
+
+        self._bounce_off_walls(self.shooter_x, self.shooter_y, self.shooter_vx, self.shooter_vy,
+                               self.shooter_size, bottom=False)
+
+    def _release_squeeze(self, idx, slot, nx, ny, elapsed):
+        # collision.release_squeeze: an obstacle closing on a wall or another obstacle
+        # with the shooter pinned between them bounces back
+        width = self.arena.width
+        height = self.arena.height
+        room = 2 * self.shooter_size[idx] + 1
+        ox = self.obstacle_x[idx, slot] + self.obstacle_vx[idx, slot] * elapsed
+        oy = self.obstacle_y[idx, slot] + self.obstacle_vy[idx, slot] * elapsed
+        ovx = self.obstacle_vx[idx, slot]
+        ovy = self.obstacle_vy[idx, slot]
+        horizontal = np.abs(nx) >= np.abs(ny)
+        flip_x = horizontal & (((nx > 0) & (ovx > 0) & (width - (ox + OBSTACLE_WIDTH / 2) <= room)) |
+                               ((nx < 0) & (ovx < 0) & ((ox - OBSTACLE_WIDTH / 2) + width <= room)))
+        flip_y = ~horizontal & (((ny > 0) & (ovy > 0) & (height - (oy + OBSTACLE_HEIGHT / 2) <= room)) |
+                                ((ny < 0) & (ovy < 0) & ((oy - OBSTACLE_HEIGHT / 2) + height <= room)))
+        self.obstacle_vx[idx[flip_x], slot[flip_x]] *= -1
+        self.obstacle_vy[idx[flip_y], slot[flip_y]] *= -1
+
+        # The same between two obstacles: every other obstacle on the far side of the
+        # shooter, level with it and closing in, takes the place of the wall
+        walled = flip_x | flip_y
+        idx, slot, horizontal, elapsed, room = idx[~walled], slot[~walled], horizontal[~walled], \
+            elapsed[~walled], room[~walled]
+        if not len(idx):
+            return
+        side = np.where(horizontal, np.sign(nx[~walled]), np.sign(ny[~walled]))[:, None]
+        hor = horizontal[:, None]
+        ox = self.obstacle_x[idx] + self.obstacle_vx[idx] * elapsed[:, None]
+        oy = self.obstacle_y[idx] + self.obstacle_vy[idx] * elapsed[:, None]
+        rows = np.arange(len(idx))
+        box_v = np.where(horizontal, ovx[~walled], ovy[~walled])[:, None]
+        other_v = np.where(hor, self.obstacle_vx[idx], self.obstacle_vy[idx])
+        along = np.where(hor, ox, oy)
+        box_along = along[rows, slot][:, None]
+        ball_along = np.where(horizontal, self.shooter_x[idx], self.shooter_y[idx])[:, None]
+        across = np.where(hor, np.abs(self.shooter_y[idx, None] - oy), np.abs(self.shooter_x[idx, None] - ox))
+        size = self.shooter_size[idx, None]
+        level = across < np.where(hor, OBSTACLE_HEIGHT / 2, OBSTACLE_WIDTH / 2) + size
+        gap = side * (along - box_along) - np.where(hor, OBSTACLE_WIDTH, OBSTACLE_HEIGHT)
+        squeezed = (self.slots < self.obstacle_count[idx, None]) & (self.slots != slot[:, None]) & level & \
+            (side * (along - ball_along) > 0) & (gap <= room[:, None]) & (side * (box_v - other_v) > 0)
+        if not squeezed.any():
+            return
+        flip_box = squeezed.any(axis=1) & (box_v[:, 0] * side[:, 0] > 0)
+        flip_other = squeezed & (other_v * side < 0)
+        box_x = flip_box & horizontal
+        box_y = flip_box & ~horizontal
+        self.obstacle_vx[idx[box_x], slot[box_x]] *= -1
+        self.obstacle_vy[idx[box_y], slot[box_y]] *= -1
+        rows, cols = np.nonzero(flip_other & hor)
+        self.obstacle_vx[idx[rows], cols] *= -1
+        rows, cols = np.nonzero(flip_other & ~hor)
+        self.obstacle_vy[idx[rows], cols] *= -1
+
+    def _bounce_off_walls(self, x, y, vx, vy, size, bottom):
+        # Ball.check_walls, for whole columns
+        width = self.arena.width
+        height = self.arena.height
+        side = (x - size <= -width) | (x + size >= width)
+        vx[side] = -vx[side]
+        flip = y + size >= height
+        if bottom:
+            flip |= y - size <= -height
+        vy[flip] = -vy[flip]
+
+    def _move_target(self, dt):
+        self.target_x += self.target_vx * dt
+        self.target_y += self.target_vy * dt
+        self._bounce_off_walls(self.target_x, self.target_y, self.target_vx, self.target_vy,
+                               self.target_radius, bottom=True)
+
+    def _move_obstacles(self, dt):
+        active = self.slots < self.obstacle_count[:, None]
+        self.obstacle_x += self.obstacle_vx * dt
+        self.obstacle_y += self.obstacle_vy * dt
+        width = self.arena.width
+        height = self.arena.height
+        side = active & ((self.obstacle_x - OBSTACLE_WIDTH / 2 <= -width) |
+                         (self.obstacle_x + OBSTACLE_WIDTH / 2 >= width))
+        self.obstacle_vx[side] = -self.obstacle_vx[side]
+        flip = active & ((self.obstacle_y - OBSTACLE_HEIGHT / 2 <= -height) |
+                         (self.obstacle_y + OBSTACLE_HEIGHT / 2 >= height))
+        self.obstacle_vy[flip] = -self.obstacle_vy[flip]
+
+    def _on_ball_hit(self, idx, won, done):
+        # CatchAndShootGame._on_ball_hit and next_level
+        self.level_score[idx] += 1
+        self._spawn_target(idx)
+        speed = self.respawn_speed[self.level[idx]]
+        vx = self.spawn_rng.uniform(-speed, speed)
+        vy = self.spawn_rng.uniform(-speed, speed)
+        vx = np.where(np.abs(vx) < MIN_RESPAWN_SPEED, np.where(vx >= 0, MIN_RESPAWN_SPEED, -MIN_RESPAWN_SPEED), vx)
+        vy = np.where(np.abs(vy) < MIN_RESPAWN_SPEED, np.where(vy >= 0, MIN_RESPAWN_SPEED, -MIN_RESPAWN_SPEED), vy)
+        self.target_vx[idx] = np.where(speed > 0, vx, 0.0)
+        self.target_vy[idx] = np.where(speed > 0, vy, 0.0)
+        self._catch_shooter(idx)
+
+        cleared = idx[self.level_score[idx] >= self.score_threshold[self.level[idx]]]
+        last = cleared[self.level[cleared] == len(LEVELS) - 1]
+        won[last] = True
+        done[last] = True
+        advance = cleared[self.level[cleared] < len(LEVELS) - 1]
+        if len(advance):
+            self.level[advance] += 1
+            self.level_score[advance] = 0
+            self._configure_target(advance)
+            self.level_timer[advance] += self.level_time[self.level[advance]]
+            self._add_obstacles(advance)
+
+    def observations(self):
+        # A dict of arrays with one row per game
+        count = self.obstacle_count[:, None]
+        active = self.slots < count
+        obstacles = np.zeros((self.num_envs, self.max_obstacles, 4))
+        obstacles[..., 0] = self.obstacle_x
+        obstacles[..., 1] = self.obstacle_y
+        obstacles[..., 2] = OBSTACLE_WIDTH
+        obstacles[..., 3] = OBSTACLE_HEIGHT
+        obstacles[~active] = 0  # Empty slots are all zeros
+        return {
+            "paddle_x": self.paddle_x.copy(),
+            "shooter": np.stack([self.shooter_x, self.shooter_y, self.shooter_vx, self.shooter_vy], axis=1),
+            "shooter_ready": self.shooter_ready.copy(),
+            "target": np.stack([self.target_x, self.target_y, self.target_vx, self.target_vy,
+                                self.target_radius], axis=1),
+            "obstacles": obstacles,  # x, y, width, height
+            "lives": self.lives.copy(),
+            "level": self.level.copy(),
+            "level_score": self.level_score.copy(),
+            "timer": self.level_timer.copy(),
+        }
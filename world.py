@@ -0,0 +1,55 @@
+from bvh import BVH
+
+
+class Arena:
+    # Half-extents of the playing field. The field is centred on the origin like the
+    # turtle canvas, so x runs from -width to width and y from -height to height.
+    #
+    # One Arena is shared by the game and everything in it, and every wall check
+    # reads these two numbers. They only change through resize(), which the
+    # renderer calls from its window-resize callback; listeners are told so they
+    # can fix up anything placed relative to the walls.
+    def __init__(self, width=400, height=300):
+        self.width = width
+        self.height = height
+        self.version = 0  # Bumped on every resize
+        self.listeners = []
+
+    def add_listener(self, callback):
+        # callback(arena) is called after every resize
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self.listeners.remove(callback)
+
+    def resize(self, width, height):
+        if width == self.width and height == self.height:
+            return
+        self.width = width
+        self.height = height
+        self.version += 1
+        for callback in self.listeners:
+            callback(self)
+
+    def __str__(self):
+        return "arena " + str(self.width) + "x" + str(self.height)
+
+
+# Arena for balls, obstacles and paddles made without one (benchmarks, tools), so
+# that each does not carry its own. The game always passes its own arena.
+DEFAULT_ARENA = Arena()
+
+
+class World:
+    # Pure-Python model of everything the physics touches. Nothing in here knows
+    # about turtle, so a level can be stepped without a display.
+    def __init__(self, arena, paddle, shooter=None, target=None):
+        self.arena = arena
+        self.paddle = paddle
+        self.shooter = shooter
+        self.target = target
+        self.obstacles = []
+        self.geometry = BVH()  # Fixed level geometry (Polygons), in a tree for the broad phase
+
+    def balls(self):
+        return [b for b in (self.shooter, self.target) if b is not None]